@@ -2,7 +2,8 @@ from django.contrib import admin
 from leaflet.admin import LeafletGeoAdmin
 from Impact.models import (
     AffectedGrazingLand, AffectedPopulation, ImpactedGDP, AffectedCrops,
-    AffectedLivestock, AffectedRoads, DisplacedPopulation,SectorData,SectorForecast,WaterBodies,RiverSection
+    AffectedLivestock, AffectedRoads, DisplacedPopulation,SectorData,SectorForecast,SectorForecastRun,WaterBodies,RiverSection,DataVersion,
+    AdminUnit,
 )
 
 class BaseImpactAdmin(LeafletGeoAdmin):
@@ -14,32 +15,46 @@ class BaseImpactAdmin(LeafletGeoAdmin):
         'MAX_ZOOM': 18,
     }
 
+class ImpactLayerAdmin(BaseImpactAdmin):
+    """The impact layers are views over AdminUnit and ImpactValue; they are loaded by syncD_shapefiles only."""
+    list_display = ['name_1', 'gid_0', 'forecast_date', 'flood_perc']
+    list_filter = ['forecast_date', 'gid_0']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(AffectedPopulation)
-class AffectedPopulationAdmin(BaseImpactAdmin):
+class AffectedPopulationAdmin(ImpactLayerAdmin):
     pass
 
 @admin.register(ImpactedGDP)
-class ImpactedGDPAdmin(BaseImpactAdmin):
+class ImpactedGDPAdmin(ImpactLayerAdmin):
     pass
 
 @admin.register(AffectedCrops)
-class AffectedCropsAdmin(BaseImpactAdmin):
+class AffectedCropsAdmin(ImpactLayerAdmin):
     pass
 
 @admin.register(AffectedGrazingLand)
-class AffectedGrazingLandAdmin(BaseImpactAdmin):
+class AffectedGrazingLandAdmin(ImpactLayerAdmin):
     pass
 
 @admin.register(AffectedLivestock)
-class AffectedLivestockAdmin(BaseImpactAdmin):
+class AffectedLivestockAdmin(ImpactLayerAdmin):
     pass
 
 @admin.register(AffectedRoads)
-class AffectedRoadsAdmin(BaseImpactAdmin):
+class AffectedRoadsAdmin(ImpactLayerAdmin):
     pass
 
 @admin.register(DisplacedPopulation)
-class DisplacedPopulationAdmin(BaseImpactAdmin):
+class DisplacedPopulationAdmin(ImpactLayerAdmin):
     pass
 
 @admin.register(SectorData)
@@ -52,6 +67,11 @@ class SectorForecastAdmin(BaseImpactAdmin):
     list_display = ['sector', 'model_type', 'time_point']
     search_fields = ['sector', 'model_type', 'time_point']
 
+@admin.register(SectorForecastRun)
+class SectorForecastRunAdmin(admin.ModelAdmin):
+    list_display = ['sector', 'model_type', 'run_time', 'start_time', 'step']
+    list_filter = ['model_type']
+
 @admin.register(WaterBodies)
 class WaterBodiesAdmin(BaseImpactAdmin):
     list_display = ['name_of_wa', 'type_of_wa']
@@ -62,3 +82,12 @@ class RiverSectionAdmin(BaseImpactAdmin):
     search_fields = ['sec_name', 'basin']
     list_filter = ['basin']
 
+@admin.register(DataVersion)
+class DataVersionAdmin(admin.ModelAdmin):
+    list_display = ['dataset', 'version', 'updated_at']
+
+@admin.register(AdminUnit)
+class AdminUnitAdmin(BaseImpactAdmin):
+    list_display = ['gid_0', 'name_0', 'name_1', 'engtype_1']
+    search_fields = ['name_0', 'name_1']
+    list_filter = ['gid_0']
@@ -0,0 +1,29 @@
+"""
+``COPY ... FROM STDIN`` loading shared by the forecast and impact ingests.
+"""
+import io
+
+from django.db import connection
+
+# Bytes handed to psycopg per COPY write call
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def copy_rows(cursor, table, columns, frame):
+    """
+    Stream ``frame`` into ``table`` with ``COPY ... FROM STDIN``.
+
+    ``cursor`` is a Django cursor on the psycopg 3 backend. Rows are rendered
+    to CSV in an in-memory buffer and written in ``COPY_CHUNK_SIZE`` pieces;
+    missing values become NULL. Returns the number of rows copied.
+    """
+    quote = connection.ops.quote_name
+    buffer = io.StringIO()
+    frame[columns].to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+
+    sql = f"COPY {quote(table)} ({', '.join(quote(c) for c in columns)}) FROM STDIN WITH (FORMAT csv)"
+    with cursor.cursor.copy(sql) as copy:
+        while chunk := buffer.read(COPY_CHUNK_SIZE):
+            copy.write(chunk)
+    return len(frame)
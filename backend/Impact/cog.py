@@ -0,0 +1,84 @@
+"""
+Cloud-Optimized GeoTIFF output for the rasters published to MapServer.
+
+Published rasters are rewritten with GDAL's COG driver: internally tiled,
+DEFLATE (or ZSTD) compressed with a horizontal or floating-point predictor,
+and carrying nearest-neighbour overviews so low-zoom WMS requests read a
+small pyramid level instead of decoding the full-resolution image.
+Nearest-neighbour keeps the class values of alert and hazard maps intact.
+"""
+import logging
+import os
+import shutil
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+COG_BLOCK_SIZE = 512
+# Compression level used for each supported codec
+COMPRESSION_LEVELS = {
+    'DEFLATE': 9,
+    'ZSTD': 15,
+}
+
+
+def cog_options(dtype, compress=None):
+    """Creation options of the COG driver for a raster of ``dtype``."""
+    compress = (compress or config('COG_COMPRESSION', default='DEFLATE')).upper()
+    predictor = 3 if np.issubdtype(np.dtype(dtype), np.floating) else 2
+    if compress not in COMPRESSION_LEVELS:
+        raise ValueError(f"Unsupported COG compression {compress}; use one of {', '.join(COMPRESSION_LEVELS)}")
+    return {
+        'COMPRESS': compress,
+        'PREDICTOR': predictor,
+        'LEVEL': COMPRESSION_LEVELS[compress],
+        'BLOCKSIZE': COG_BLOCK_SIZE,
+        'OVERVIEWS': 'AUTO',
+        'OVERVIEW_RESAMPLING': 'NEAREST',
+        'RESAMPLING': 'NEAREST',
+        'BIGTIFF': 'IF_SAFER',
+        'NUM_THREADS': 'ALL_CPUS',
+    }
+
+
+def write_cog(src_path, dst_path, compress=None):
+    """
+    Rewrite ``src_path`` (any GDAL-readable raster, VRTs included) as a COG at ``dst_path``.
+
+    The output is written next to the target and renamed into place, so
+    MapServer never reads a partial file. Returns ``dst_path``.
+    """
+    with rasterio.open(src_path) as src:
+        options = cog_options(src.dtypes[0], compress)
+
+    partial = f"{dst_path}.part"
+    try:
+        rasterio.shutil.copy(src_path, partial, driver='COG', **options)
+        os.replace(partial, dst_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    logger.info(f"Wrote COG {dst_path} ({os.path.getsize(dst_path) / 1e6:.2f} MB, {options['COMPRESS']})")
+    return dst_path
+
+
+def publish_raster(src_path, dst_path, compress=None):
+    """
+    Publish ``src_path`` to ``dst_path`` as a COG, falling back to a plain copy.
+
+    Returns True when the COG was written, False when the file was copied
+    unchanged because the COG conversion failed.
+    """
+    try:
+        write_cog(src_path, dst_path, compress)
+        return True
+    except Exception as e:
+        logger.warning(f"COG conversion of {src_path} failed ({e}); copying it unchanged")
+        partial = f"{dst_path}.part"
+        shutil.copyfile(src_path, partial)
+        os.replace(partial, dst_path)
+        return False
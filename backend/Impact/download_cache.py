@@ -0,0 +1,187 @@
+"""
+Persistent, content-addressed cache of files fetched over SFTP.
+
+A remote file is identified by its path, size and modification time, all
+read with a single ``stat``. When that identity is already in the index
+the local copy is reused and no bytes cross the link. Blobs are stored
+under the SHA-256 of their content, so identical files reached through
+different paths are kept once. The least recently used blobs are evicted
+when the cache grows past its size limit. The index is only changed under
+an exclusive ``flock`` on ``index.lock``, so several processes (the
+scheduled commands) can share one cache directory.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from decouple import config
+
+from Impact.sftp import Transfer
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadCache:
+    """
+    Reuse earlier downloads of unchanged remote files.
+
+    The directory, size limit and checksum verification default to the
+    ``SFTP_CACHE_DIR``, ``SFTP_CACHE_MAX_BYTES`` and ``SFTP_CACHE_VERIFY``
+    environment variables. With verification on, a cached blob is re-hashed
+    before reuse and fetched again if it no longer matches.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, verify=None):
+        self.directory = directory or config(
+            'SFTP_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'sftp_cache'),
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else config(
+            'SFTP_CACHE_MAX_BYTES', default=2 * 1024 ** 3, cast=int,
+        )
+        self.verify = verify if verify is not None else config('SFTP_CACHE_VERIFY', default=False, cast=bool)
+        self.objects_dir = os.path.join(self.directory, 'objects')
+        self.index_path = os.path.join(self.directory, 'index.json')
+        self.lock_path = os.path.join(self.directory, 'index.lock')
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    @staticmethod
+    def key(remote_path, attrs):
+        return f"{remote_path}|{attrs.st_size}|{int(attrs.st_mtime)}"
+
+    @contextmanager
+    def _locked(self):
+        """Hold the index for this thread and, through ``flock``, for this process."""
+        with self._lock, open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.objects_dir, digest)
+
+    def _lookup(self, key, size):
+        """Path of a usable cached blob for ``key``, or None."""
+        with self._locked():
+            digest = self._read_index().get(key)
+        if digest is None:
+            return None
+        blob = self._blob_path(digest)
+        try:
+            if os.path.getsize(blob) != size:
+                return None
+            if self.verify and file_sha256(blob) != digest:
+                logger.warning(f"Cached copy of {key} failed verification, fetching again")
+                return None
+            # The blob mtime is the LRU clock
+            os.utime(blob, None)
+        except FileNotFoundError:
+            # Evicted by another process since the index was read
+            return None
+        return blob
+
+    def _store(self, key, local_path):
+        digest = file_sha256(local_path)
+        blob = self._blob_path(digest)
+        if not os.path.exists(blob):
+            # Dot-prefixed so eviction skips blobs still being written
+            fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, prefix='.')
+            os.close(fd)
+            shutil.copyfile(local_path, tmp_path)
+            os.replace(tmp_path, blob)
+        with self._locked():
+            index = self._read_index()
+            index[key] = digest
+            self._write_index(index)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used blobs until the cache fits ``max_bytes``."""
+        with self._locked():
+            blobs = []
+            for name in os.listdir(self.objects_dir):
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(self.objects_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, name, path))
+            total = sum(size for _, size, _, _ in blobs)
+            if total <= self.max_bytes:
+                return
+
+            removed = set()
+            for _, size, name, path in sorted(blobs):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                removed.add(name)
+                total -= size
+            index = {k: d for k, d in self._read_index().items() if d not in removed}
+            self._write_index(index)
+        logger.info(f"Evicted {len(removed)} blobs from the SFTP download cache")
+
+    def fetch(self, pool, remote_path, local_path):
+        """
+        Place ``remote_path`` at ``local_path``, downloading only when it changed.
+
+        Returns a ``Transfer``; ``cached`` tells whether the bytes came from
+        the cache.
+        """
+        start = time.monotonic()
+        attrs = pool.stat(remote_path)
+        key = self.key(remote_path, attrs)
+        blob = self._lookup(key, attrs.st_size)
+        if blob is not None:
+            try:
+                shutil.copyfile(blob, local_path)
+            except FileNotFoundError:
+                # Evicted between the lookup and the copy: treat it as a miss
+                logger.info(f"Cached copy of {key} vanished, fetching again")
+            else:
+                transfer = Transfer(
+                    remote_path, local_path, attrs.st_size, time.monotonic() - start, cached=True,
+                )
+                logger.info(f"Reused {transfer.describe()}")
+                return transfer
+
+        transfer = pool.download(remote_path, local_path)
+        self._store(key, local_path)
+        return transfer
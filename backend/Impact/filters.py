@@ -0,0 +1,89 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework_gis.filters import InBBoxFilter
+
+
+class BBoxFilter(InBBoxFilter):
+    """``?bbox=minLon,minLat,maxLon,maxLat`` using the spatial index on the layer geometry."""
+    bbox_param = 'bbox'
+
+
+# Attribute filters shared by the impact layer endpoints
+IMPACT_FILTERSET_FIELDS = {
+    'gid_0': ['exact'],
+    'name_1': ['exact'],
+    'flood_perc': ['gte'],
+}
+
+# Filters of the archived forecast runs
+FORECAST_RUN_FILTERSET_FIELDS = {
+    'sector__sec_code': ['exact'],
+    'model_type': ['exact'],
+}
+
+# Filters of the normalized impact values; indicator__in allows cross-indicator queries
+IMPACT_VALUE_FILTERSET_FIELDS = {
+    'indicator': ['exact', 'in'],
+    'forecast_date': ['exact', 'gte', 'lte'],
+    'admin_unit': ['exact'],
+    'admin_unit__gid_0': ['exact'],
+    'flood_perc': ['gte'],
+}
+
+
+# Query parameters selecting forecasts by issue date/time
+ISSUED_PARAMS = ('issued', 'from', 'to')
+
+
+def _issued_interval(param, value, date_only):
+    """Half-open ``(start, end)`` interval denoted by an ISO date or date-time."""
+    moment = parse_datetime(value)
+    if moment is not None:
+        if date_only:
+            return moment.date(), moment.date() + timedelta(days=1)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment, moment + timedelta(microseconds=1)
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({param: 'Expected an ISO 8601 date or date-time.'})
+    if date_only:
+        return day, day + timedelta(days=1)
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def filter_issued(queryset, field, params):
+    """
+    Apply ``?issued=``, ``?from=`` and ``?to=`` to the issue date/time ``field``.
+
+    A date matches the whole day; ``from`` and ``to`` are inclusive.
+    """
+    date_only = queryset.model._meta.get_field(field).get_internal_type() == 'DateField'
+    if params.get('issued'):
+        start, end = _issued_interval('issued', params['issued'], date_only)
+        queryset = queryset.filter(**{f'{field}__gte': start, f'{field}__lt': end})
+    if params.get('from'):
+        start, _ = _issued_interval('from', params['from'], date_only)
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if params.get('to'):
+        _, end = _issued_interval('to', params['to'], date_only)
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
+
+
+class IssuedFilter(BaseFilterBackend):
+    """Issue-time filters on the view's ``issued_field``."""
+
+    def filter_queryset(self, request, queryset, view):
+        field = getattr(view, 'issued_field', None)
+        if field is None:
+            return queryset
+        return filter_issued(queryset, field, request.query_params)
@@ -0,0 +1,135 @@
+"""
+Slim, pre-compressed forecast bundle for the map client.
+
+``merged_data.min.geojson`` keeps only the properties the station popups
+read, with coordinates and discharge values rounded, and is written with
+``.gz`` (and ``.br`` when the ``brotli`` package is installed) siblings
+so the web server can hand out the compressed bytes directly. Every file
+is written to a temporary name and renamed into place, so a client never
+reads a half-written bundle.
+"""
+import gzip
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from shapely.geometry import mapping
+
+from Impact.section_json import SERIES_KEYS, TIME_KEY, format_series
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BUNDLE_SUFFIX = '.min.geojson'
+
+# Properties read by the map popups and station list, when present
+BUNDLE_PROPERTIES = [
+    'Id', 'ID', 'SEC_NAME', 'SEC_CODE', 'BASIN', 'AREA', 'Q_THR1', 'Q_THR2', 'Q_THR3',
+    TIME_KEY, *SERIES_KEYS, 'data_date', 'is_fallback',
+]
+COORDINATE_DECIMALS = 5
+SERIES_DECIMALS = 2
+
+
+def bundle_path(geojson_path):
+    return os.path.splitext(geojson_path)[0] + BUNDLE_SUFFIX
+
+
+def write_atomic(path, data):
+    """Write ``data`` (bytes) to ``path`` through a temporary file and a rename."""
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp creates 0600 files; the web server must be able to read the bundle
+        os.chmod(partial, 0o644)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def _round_coordinates(coordinates):
+    if isinstance(coordinates, (list, tuple)) and coordinates and isinstance(coordinates[0], (list, tuple)):
+        return [_round_coordinates(c) for c in coordinates]
+    return [round(float(c), COORDINATE_DECIMALS) for c in coordinates]
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _series_text(value):
+    if isinstance(value, str) or value is None:
+        return value
+    if np.ndim(value) == 0 and pd.isna(value):
+        # The section had no such series
+        return None
+    return format_series(np.round(np.asarray(value, dtype='float64'), SERIES_DECIMALS))
+
+
+def _time_text(value):
+    if isinstance(value, str) or value is None:
+        return value
+    return ','.join(str(v) for v in value)
+
+
+def build_bundle(gdf):
+    """Return the slim FeatureCollection of ``gdf`` as compact JSON bytes."""
+    columns = [c for c in BUNDLE_PROPERTIES if c in gdf.columns]
+    features = []
+    for row, geometry in zip(gdf[columns].itertuples(index=False, name=None), gdf.geometry):
+        properties = {}
+        for column, value in zip(columns, row):
+            if column in SERIES_KEYS:
+                value = _series_text(value)
+            elif column == TIME_KEY:
+                value = _time_text(value)
+            properties[column] = _json_value(value)
+        shape = None
+        if geometry is not None and not geometry.is_empty:
+            shape = mapping(geometry)
+            shape = {'type': shape['type'], 'coordinates': _round_coordinates(shape['coordinates'])}
+        features.append({'type': 'Feature', 'properties': properties, 'geometry': shape})
+    return json.dumps(
+        {'type': 'FeatureCollection', 'features': features}, separators=(',', ':'),
+    ).encode('utf-8')
+
+
+def bundle_files(geojson_path):
+    """The bundle and its compressed variants, whether or not they exist."""
+    path = bundle_path(geojson_path)
+    return [path, f"{path}.gz", f"{path}.br"]
+
+
+def remove_bundle(geojson_path):
+    """Delete a previously written bundle so it is not served stale; returns the paths removed."""
+    removed = []
+    for path in bundle_files(geojson_path):
+        if os.path.exists(path):
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+def write_bundle(gdf, geojson_path):
+    """Write the slim bundle and its compressed variants; returns the paths written."""
+    path = bundle_path(geojson_path)
+    data = build_bundle(gdf)
+    write_atomic(path, data)
+    written = [path]
+
+    write_atomic(f"{path}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+    written.append(f"{path}.gz")
+    if brotli is not None:
+        write_atomic(f"{path}.br", brotli.compress(data, quality=11))
+        written.append(f"{path}.br")
+    return written
@@ -0,0 +1,323 @@
+"""
+Vectorized helpers for loading sector forecast series into the database.
+
+The merged forecast file carries one feature per river section with the GFS
+and ICON discharge series stored as comma-joined strings (or list-likes once
+read from a typed source). These helpers turn that wide layout into a long
+``sector_id / model_type / time_point / forecast_value`` frame in one pass so
+the loaders can write it in bulk.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+
+from Impact.bulk_copy import copy_rows
+from Impact.models import SectorData, SectorForecast, SectorForecastRun
+from Impact.section_json import SERIES_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+TIME_COLUMN = 'time_period'
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+# Properties checked, in order, for the issue time of a section's run
+RUN_TIME_COLUMNS = ['time_run', 'data_date']
+
+FORECAST_COLUMNS = ['sector_id', 'model_type', 'time_point', 'forecast_value']
+
+# How long the table swap may wait for readers before giving up
+SWAP_LOCK_TIMEOUT = '10s'
+
+
+def sector_id_map():
+    """Return a ``sec_code -> SectorData.id`` mapping built from one query."""
+    return dict(SectorData.objects.values_list('sec_code', 'id'))
+
+
+def _as_list(value):
+    """Normalise a comma-joined string or list-like cell to a Python list."""
+    if isinstance(value, str):
+        return value.split(',')
+    if value is None or (np.isscalar(value) and pd.isna(value)):
+        return []
+    if hasattr(value, '__iter__'):
+        return list(value)
+    return [value]
+
+
+def _explode(column, name):
+    """
+    Explode a column of sequences into ``row / step / <name>`` long format.
+
+    Steps are numbered before anything is dropped, so blank values keep
+    their position; callers drop them after aligning the series.
+    """
+    exploded = column.map(_as_list).explode()
+    return pd.DataFrame({
+        'row': exploded.index.to_numpy(),
+        'step': exploded.groupby(level=0).cumcount().to_numpy(),
+        name: exploded.to_numpy(),
+    })
+
+
+def _parse_times(values, time_format=TIME_FORMAT):
+    """Parse time stamps to timezone-aware datetimes in the project timezone."""
+    values = pd.Series(values)
+    if values.map(lambda v: isinstance(v, str)).any():
+        values = values.map(lambda v: v.strip() if isinstance(v, str) else v)
+        times = pd.to_datetime(values, format=time_format, errors='coerce')
+    else:
+        times = pd.to_datetime(values, errors='coerce')
+    if times.dt.tz is None:
+        times = times.dt.tz_localize(settings.TIME_ZONE, ambiguous='NaT', nonexistent='NaT')
+    return times
+
+
+def explode_forecasts(gdf, sector_ids):
+    """
+    Turn the wide merged forecast frame into long-format forecast rows.
+
+    Sections whose ``SEC_CODE`` is unknown are reported once and dropped.
+    Series are aligned by position against ``time_period`` (extra values on
+    either side are ignored), and empty or non-numeric values are skipped.
+    Returns a DataFrame with ``FORECAST_COLUMNS``.
+    """
+    codes = gdf['SEC_CODE'].map(sector_ids)
+    missing = gdf.loc[codes.isna(), 'SEC_CODE']
+    if not missing.empty:
+        logger.warning(f"Sectors not found for codes: {', '.join(map(str, missing.unique()))}")
+
+    known = gdf.loc[codes.notna()].copy()
+    known['sector_id'] = codes[codes.notna()].astype('int64')
+    if known.empty:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+    frame = _explode(known[TIME_COLUMN], 'time_point')
+    for model_type, column in SERIES_COLUMNS.items():
+        frame = frame.merge(_explode(known[column], model_type), on=['row', 'step'])
+
+    frame['time_point'] = _parse_times(frame['time_point'])
+    frame['sector_id'] = known['sector_id'].reindex(frame['row']).to_numpy()
+    frame = frame.melt(
+        id_vars=['sector_id', 'time_point'],
+        value_vars=list(SERIES_COLUMNS),
+        var_name='model_type',
+        value_name='forecast_value',
+    )
+    frame['forecast_value'] = pd.to_numeric(
+        frame['forecast_value'].map(lambda v: v.strip() if isinstance(v, str) else v),
+        errors='coerce',
+    )
+    frame = frame.dropna(subset=['time_point', 'forecast_value'])
+    return frame[FORECAST_COLUMNS].reset_index(drop=True)
+
+
+def bulk_insert_forecasts(frame, batch_size=1000):
+    """Write long-format forecast rows with batched ``bulk_create`` calls."""
+    sector_ids = frame['sector_id'].to_numpy()
+    model_types = frame['model_type'].to_numpy()
+    time_points = frame['time_point'].to_numpy(dtype=object)
+    values = frame['forecast_value'].to_numpy(dtype='float64')
+
+    for start in range(0, len(frame), batch_size):
+        stop = start + batch_size
+        SectorForecast.objects.bulk_create([
+            SectorForecast(
+                sector_id=int(sector_id),
+                model_type=model_type,
+                time_point=time_point,
+                forecast_value=float(value),
+            )
+            for sector_id, model_type, time_point, value in zip(
+                sector_ids[start:stop], model_types[start:stop],
+                time_points[start:stop], values[start:stop],
+            )
+        ])
+    return len(frame)
+
+
+
+def run_time_map(gdf, sector_ids):
+    """Return a ``sector_id -> run issue time`` Series from the merged data."""
+    column = next((c for c in RUN_TIME_COLUMNS if c in gdf.columns), None)
+    if column is None:
+        return pd.Series(dtype='datetime64[ns, UTC]')
+    times = _parse_times(gdf[column], time_format='mixed')
+    times.index = gdf['SEC_CODE'].map(sector_ids).to_numpy()
+    times = times[times.index.notna()].dropna()
+    times.index = times.index.astype('int64')
+    return times[~times.index.duplicated()]
+
+
+def build_forecast_runs(frame, run_times):
+    """
+    Pack long-format forecast rows into one ``SectorForecastRun`` per sector/model.
+
+    The step is the smallest spacing between time points; missing steps are
+    stored as NULL. Series with duplicate or irregular time points are
+    skipped with a warning. Sections without a known run time use the start
+    of their series.
+    """
+    frame = frame.assign(
+        utc=frame['time_point'].dt.tz_convert('UTC').dt.tz_localize(None)
+    ).sort_values(['sector_id', 'model_type', 'utc'])
+
+    runs = []
+    for (sector_id, model_type), group in frame.groupby(['sector_id', 'model_type'], sort=False):
+        ticks = group['utc'].to_numpy()
+        offsets = ticks - ticks[0]
+        step = np.diff(ticks).min() if len(ticks) > 1 else np.timedelta64(0, 'ns')
+        if len(ticks) > 1 and (step == np.timedelta64(0, 'ns') or (offsets % step).any()):
+            logger.warning(f"Skipping irregular {model_type} series for sector {sector_id}.")
+            continue
+
+        positions = offsets // step if len(ticks) > 1 else np.zeros(1, dtype='int64')
+        values = np.full(int(positions[-1]) + 1, np.nan)
+        values[positions.astype('int64')] = group['forecast_value'].to_numpy(dtype='float64')
+
+        start_time = pd.Timestamp(ticks[0]).tz_localize('UTC').to_pydatetime()
+        run_time = run_times.get(sector_id)
+        runs.append(SectorForecastRun(
+            sector_id=int(sector_id),
+            model_type=model_type,
+            run_time=run_time.to_pydatetime() if run_time is not None else start_time,
+            start_time=start_time,
+            step=pd.Timedelta(step).to_pytimedelta(),
+            values=[None if np.isnan(v) else float(v) for v in values],
+        ))
+    return runs
+
+
+def store_forecast_runs(runs, batch_size=500):
+    """Upsert packed runs keyed on ``(sector, model_type, run_time)``."""
+    SectorForecastRun.objects.bulk_create(
+        runs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['sector', 'model_type', 'run_time'],
+        update_fields=['start_time', 'step', 'values'],
+    )
+    return len(runs)
+
+def prune_forecast_runs(before):
+    """Delete forecast runs issued before ``before``; returns the number removed."""
+    deleted, _ = SectorForecastRun.objects.filter(run_time__lt=before).delete()
+    return deleted
+
+
+def copy_forecasts(frame, staging_table='sectorforecast_staging'):
+    """
+    Load long-format forecast rows through a staging table and COPY.
+
+    The rows are copied into a temporary table and merged into
+    ``SectorForecast`` with one statement: existing
+    ``(sector, model_type, time_point)`` rows get their value updated and the
+    rest are inserted. Must run inside a transaction.
+    """
+    quote = connection.ops.quote_name
+    target = quote(SectorForecast._meta.db_table)
+    staging = quote(staging_table)
+    match = (
+        "t.sector_id = s.sector_id AND t.model_type = s.model_type "
+        "AND t.time_point = s.time_point"
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TEMP TABLE {staging} (
+                sector_id bigint NOT NULL,
+                model_type varchar(10) NOT NULL,
+                time_point timestamp with time zone NOT NULL,
+                forecast_value double precision
+            ) ON COMMIT DROP
+        """)
+        copied = copy_rows(cursor, staging_table, FORECAST_COLUMNS, frame)
+        cursor.execute(f"""
+            WITH updated AS (
+                UPDATE {target} AS t
+                SET forecast_value = s.forecast_value
+                FROM {staging} AS s
+                WHERE {match}
+                RETURNING t.sector_id, t.model_type, t.time_point
+            )
+            INSERT INTO {target} (sector_id, model_type, time_point, forecast_value)
+            SELECT s.sector_id, s.model_type, s.time_point, s.forecast_value
+            FROM {staging} AS s
+            WHERE NOT EXISTS (SELECT 1 FROM updated AS t WHERE {match})
+        """)
+    logger.info(f"Copied {copied} forecast rows into {SectorForecast._meta.db_table}.")
+    return copied
+
+
+def _swap_name(name):
+    """Temporary name for an index or constraint built on the shadow table."""
+    return f"{name[:56]}_shadow"
+
+
+def swap_forecasts(frame):
+    """
+    Replace the contents of ``SectorForecast`` by loading and renaming a shadow table.
+
+    The shadow table is filled with COPY while the live table keeps serving
+    readers, then the live table's constraints and indexes are built once on
+    the loaded data. A short transaction renames the shadow table into place,
+    drops the old one and restores the original index, constraint and
+    sequence names so the schema still matches Django's migrations.
+    Must not run inside an outer transaction.
+    """
+    quote = connection.ops.quote_name
+    table = SectorForecast._meta.db_table
+    shadow = f"{table}_shadow"
+    old = f"{table}_old"
+    renames = []
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {quote(shadow)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(shadow)} (LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING IDENTITY)"
+        )
+        copied = copy_rows(cursor, shadow, FORECAST_COLUMNS, frame)
+
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f', 'c')",
+            [quote(table)],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s",
+            [table],
+        )
+        constraint_names = {name for name, _ in constraints}
+        indexes = [(name, sql) for name, sql in cursor.fetchall() if name not in constraint_names]
+
+        for name, definition in constraints:
+            cursor.execute(
+                f"ALTER TABLE {quote(shadow)} ADD CONSTRAINT {quote(_swap_name(name))} {definition}"
+            )
+            renames.append(f"ALTER TABLE {quote(table)} RENAME CONSTRAINT {quote(_swap_name(name))} TO {quote(name)}")
+        for name, definition in indexes:
+            unique = 'UNIQUE ' if definition.startswith('CREATE UNIQUE') else ''
+            method = definition.split(' USING ', 1)[1]
+            cursor.execute(f"CREATE {unique}INDEX {quote(_swap_name(name))} ON {quote(shadow)} USING {method}")
+            renames.append(f"ALTER INDEX {quote(_swap_name(name))} RENAME TO {quote(name)}")
+        cursor.execute(f"ANALYZE {quote(shadow)}")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+        cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+        cursor.execute(f"ALTER TABLE {quote(shadow)} RENAME TO {quote(table)}")
+        cursor.execute(f"DROP TABLE {quote(old)}")
+        for statement in renames:
+            cursor.execute(statement)
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [quote(table)])
+        sequence = cursor.fetchone()[0]
+        if sequence:
+            cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {quote(f'{table}_id_seq')}")
+
+    logger.info(f"Swapped {copied} forecast rows into {table}.")
+    return copied
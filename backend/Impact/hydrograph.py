@@ -0,0 +1,80 @@
+"""
+Per-sector hydrograph payloads built from the packed forecast runs.
+"""
+from datetime import timezone as dt_timezone
+
+import numpy as np
+
+from Impact.models import SectorForecast, SectorForecastRun
+
+# Model type -> key used in the hydrograph payload
+MODEL_KEYS = {'GFS': 'gfs', 'ICON': 'icon'}
+
+
+def _utc_datetime64(values):
+    return np.array(
+        [v.astimezone(dt_timezone.utc).replace(tzinfo=None) for v in values],
+        dtype='datetime64[s]',
+    )
+
+
+def _forecast_series(sector, runs=None):
+    """
+    Return ``model_type -> (times, values)`` for the sector's latest runs.
+
+    ``runs`` narrows the candidate runs (e.g. to an issue date); without it
+    sectors that have no packed runs fall back to the per-step rows.
+    """
+    archived = runs is not None
+    runs = (
+        (runs if archived else SectorForecastRun.objects.all()).filter(sector=sector)
+        .order_by('model_type', '-run_time')
+        .distinct('model_type')
+    )
+    series = {run.model_type: run.as_arrays() for run in runs}
+    if series or archived:
+        return series
+
+    # Sectors loaded before the packed runs existed only have per-step rows
+    rows = (
+        SectorForecast.objects.filter(sector=sector)
+        .order_by('model_type', 'time_point')
+        .values_list('model_type', 'time_point', 'forecast_value')
+    )
+    grouped = {}
+    for model_type, time_point, value in rows:
+        grouped.setdefault(model_type, ([], []))
+        grouped[model_type][0].append(time_point)
+        grouped[model_type][1].append(value)
+    return {
+        model_type: (_utc_datetime64(times), np.array(values, dtype='float64'))
+        for model_type, (times, values) in grouped.items()
+    }
+
+
+def sector_hydrograph(sector, runs=None):
+    """
+    Build ``{sec_code, times, gfs, icon, thresholds}`` for one sector.
+
+    Both series are aligned on the union of their time steps (UTC ISO
+    strings); steps a model does not cover are ``None``. ``runs`` selects
+    archived runs instead of the latest ones.
+    """
+    series = _forecast_series(sector, runs)
+    if series:
+        times = np.unique(np.concatenate([t for t, _ in series.values()]))
+    else:
+        times = np.array([], dtype='datetime64[s]')
+
+    payload = {
+        'sec_code': sector.sec_code,
+        'times': [f"{t}Z" for t in times.astype('datetime64[s]').astype(str)],
+    }
+    for model_type, key in MODEL_KEYS.items():
+        aligned = np.full(len(times), np.nan)
+        if model_type in series:
+            model_times, values = series[model_type]
+            aligned[np.searchsorted(times, model_times)] = values
+        payload[key] = [None if np.isnan(v) else float(v) for v in aligned]
+    payload['thresholds'] = [sector.q_thr1, sector.q_thr2, sector.q_thr3]
+    return payload
@@ -0,0 +1,306 @@
+"""
+Normalized, date-partitioned store for the impact indicators.
+
+The seven impact layers share one schema and each repeated the admin-1
+geometry. Here every admin unit is stored once in ``AdminUnit`` and the
+indicator values go to ``ImpactValue``, range-partitioned by month of
+``forecast_date`` so history is kept and old months can be dropped whole.
+``impact_<indicator>`` SQL views rebuild the layer layout for any forecast
+date; the layer models, endpoints and tiles read from them.
+"""
+from datetime import date, datetime
+
+import pandas as pd
+from django.db import connection, transaction
+
+from Impact.bulk_copy import copy_rows
+from Impact.models import (
+    AffectedPopulation, ImpactedGDP, AffectedCrops, AffectedRoads,
+    DisplacedPopulation, AffectedLivestock, AffectedGrazingLand,
+    AdminUnit, ImpactValue, SIMPLIFIED_GEOMETRY_TOLERANCES,
+)
+from Impact.simplify import SIMPLIFIED_GEOMETRY_FIELDS
+
+# Indicator code -> layer model reading its ``impact_<indicator>`` view
+INDICATOR_MODELS = {
+    'population': AffectedPopulation,
+    'gdp': ImpactedGDP,
+    'crops': AffectedCrops,
+    'roads': AffectedRoads,
+    'displaced': DisplacedPopulation,
+    'livestock': AffectedLivestock,
+    'grazing': AffectedGrazingLand,
+}
+
+# Indicator code -> per-layer table used before the store, read by ``archive_legacy_table``
+LEGACY_TABLES = {
+    'population': 'Impact_affectedpopulation',
+    'gdp': 'Impact_impactedgdp',
+    'crops': 'Impact_affectedcrops',
+    'roads': 'Impact_affectedroads',
+    'displaced': 'Impact_displacedpopulation',
+    'livestock': 'Impact_affectedlivestock',
+    'grazing': 'Impact_affectedgrazingland',
+}
+
+# Staging column types of a layer as loaded from its shapefile
+STAGING_COLUMNS = {
+    'gid_0': 'varchar(80)',
+    'name_0': 'varchar(80)',
+    'name_1': 'varchar(80)',
+    'engtype_1': 'varchar(80)',
+    'cod': 'varchar(80)',
+    'geom': 'geometry(MultiPolygon, 4326)',
+    'lack_cc': 'double precision',
+    'stock': 'double precision',
+    'flood_tot': 'double precision',
+    'flood_perc': 'double precision',
+}
+# Layer columns describing an admin unit, and those carrying its indicator value
+UNIT_COLUMNS = ['gid_0', 'name_0', 'name_1', 'engtype_1', 'cod', 'geom']
+VALUE_COLUMNS = ['gid_0', 'name_1', 'lack_cc', 'stock', 'flood_tot', 'flood_perc']
+
+PARTITION_SUFFIX = '_y%Ym%m'
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def indicator_for_model(model):
+    return next(code for code, layer in INDICATOR_MODELS.items() if layer is model)
+
+
+def forecast_date_from_filename(filename):
+    """Forecast date of a ``YYYYMMDD0000_FPimpacts-*.shp`` file."""
+    return datetime.strptime(filename[:8], '%Y%m%d').date()
+
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(day):
+    return ImpactValue._meta.db_table + _month_start(day).strftime(PARTITION_SUFFIX)
+
+
+def ensure_impact_store():
+    """Create the partitioned value table, its indexes and the compatibility views."""
+    values = _quote(ImpactValue._meta.db_table)
+    units = _quote(AdminUnit._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {values} (
+                id bigint GENERATED BY DEFAULT AS IDENTITY,
+                indicator varchar(20) NOT NULL,
+                forecast_date date NOT NULL,
+                admin_unit_id bigint NOT NULL REFERENCES {units} (id) ON DELETE CASCADE,
+                lack_cc double precision NULL,
+                stock double precision NOT NULL,
+                flood_tot double precision NOT NULL,
+                flood_perc double precision NOT NULL,
+                PRIMARY KEY (id, forecast_date),
+                UNIQUE (indicator, forecast_date, admin_unit_id)
+            ) PARTITION BY RANGE (forecast_date)
+        """)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {_quote(ImpactValue._meta.db_table + '_unit_idx')} "
+            f"ON {values} (admin_unit_id, forecast_date)"
+        )
+        for indicator in INDICATOR_MODELS:
+            cursor.execute(f"""
+                CREATE OR REPLACE VIEW {_quote(INDICATOR_MODELS[indicator]._meta.db_table)} AS
+                SELECT v.id, v.forecast_date, u.gid_0, u.name_0, u.name_1, u.engtype_1,
+                       v.lack_cc, u.cod, v.stock, v.flood_tot, v.flood_perc, u.geom,
+                       {', '.join(f'u.{_quote(f)}' for f in SIMPLIFIED_GEOMETRY_FIELDS)}
+                FROM {values} AS v
+                JOIN {units} AS u ON u.id = v.admin_unit_id
+                WHERE v.indicator = '{indicator}'
+            """)
+
+
+def ensure_partition(day):
+    """Create the monthly partition holding ``day`` if it does not exist yet."""
+    start = _month_start(day)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {_quote(partition_name(day))} "
+            f"PARTITION OF {_quote(ImpactValue._meta.db_table)} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{_next_month(start).isoformat()}')"
+        )
+
+
+def _upsert_units(source):
+    """
+    Upsert the admin units found in ``source`` (a table with ``UNIT_COLUMNS``) by ``(gid_0, name_1)``.
+
+    Only new or changed units are written, with their simplified geometries
+    computed on the way in; the first row of a duplicated unit wins.
+    Returns the number of units written.
+    """
+    source = _quote(source)
+    units = _quote(AdminUnit._meta.db_table)
+    unit_columns = UNIT_COLUMNS + list(SIMPLIFIED_GEOMETRY_FIELDS)
+    simplified = ', '.join(
+        f"ST_Multi(ST_SimplifyPreserveTopology(l.geom, {tolerance}))"
+        for tolerance in SIMPLIFIED_GEOMETRY_TOLERANCES.values()
+    )
+    changed = ' OR '.join(f"u.{_quote(c)} IS DISTINCT FROM l.{_quote(c)}" for c in UNIT_COLUMNS)
+    updates = ', '.join(
+        f"{_quote(c)} = EXCLUDED.{_quote(c)}" for c in unit_columns if c not in ('gid_0', 'name_1')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {units} ({', '.join(_quote(c) for c in unit_columns)})
+            SELECT {', '.join(f'l.{_quote(c)}' for c in UNIT_COLUMNS)}, {simplified}
+            FROM (
+                SELECT DISTINCT ON (gid_0, name_1) * FROM {source} ORDER BY gid_0, name_1, ctid
+            ) AS l
+            LEFT JOIN {units} AS u ON u.gid_0 = l.gid_0 AND u.name_1 = l.name_1
+            WHERE u.id IS NULL OR u.geom_fine IS NULL OR {changed}
+            ON CONFLICT (gid_0, name_1) DO UPDATE SET {updates}
+        """)
+        return cursor.rowcount
+
+
+def _upsert_values(source, indicator, forecast_date):
+    """
+    Replace the values of one indicator on one date with the rows of ``source``.
+
+    ``source`` has ``VALUE_COLUMNS``; rows are matched to admin units by
+    ``(gid_0, name_1)``, so the units must already be stored. Only the value
+    table is written, so loads of different indicators do not contend.
+    Returns the number of values written.
+    """
+    source = _quote(source)
+    units = _quote(AdminUnit._meta.db_table)
+    values = _quote(ImpactValue._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            DELETE FROM {values} AS v
+            WHERE v.indicator = %s AND v.forecast_date = %s
+              AND NOT EXISTS (
+                  SELECT 1 FROM {source} AS l
+                  JOIN {units} AS u ON u.gid_0 = l.gid_0 AND u.name_1 = l.name_1
+                  WHERE u.id = v.admin_unit_id
+              )
+        """, [indicator, forecast_date])
+        cursor.execute(f"""
+            INSERT INTO {values}
+                (indicator, forecast_date, admin_unit_id, lack_cc, stock, flood_tot, flood_perc)
+            SELECT DISTINCT ON (u.id) %s, %s, u.id, l.lack_cc, l.stock, l.flood_tot, l.flood_perc
+            FROM {source} AS l
+            JOIN {units} AS u ON u.gid_0 = l.gid_0 AND u.name_1 = l.name_1
+            ORDER BY u.id
+            ON CONFLICT (indicator, forecast_date, admin_unit_id) DO UPDATE SET
+                lack_cc = EXCLUDED.lack_cc,
+                stock = EXCLUDED.stock,
+                flood_tot = EXCLUDED.flood_tot,
+                flood_perc = EXCLUDED.flood_perc
+        """, [indicator, forecast_date])
+        return cursor.rowcount
+
+
+def _stage(name, frame, columns):
+    """COPY ``frame[columns]`` into a temporary table dropped at commit; call inside a transaction."""
+    definition = ', '.join(f"{_quote(c)} {STAGING_COLUMNS[c]}" for c in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE TEMPORARY TABLE {_quote(name)} ({definition}) ON COMMIT DROP")
+        copy_rows(cursor, name, columns, frame)
+    return name
+
+
+def store_admin_units(frames):
+    """
+    Upsert the admin units of several loaded layers in one statement.
+
+    ``frames`` are loaded layers (hex EWKB geometries), in priority order:
+    when layers disagree on a unit's attributes or geometry, the first one
+    wins. Run this once, before the layers' values are stored (possibly
+    concurrently) with ``store_values``. Returns the number of units written.
+    """
+    units = pd.concat([frame[UNIT_COLUMNS] for frame in frames], ignore_index=True)
+    units = units.drop_duplicates(subset=['gid_0', 'name_1'], keep='first')
+    with transaction.atomic():
+        return _upsert_units(_stage('impact_staging_units', units, UNIT_COLUMNS))
+
+
+def store_values(indicator, frame, forecast_date):
+    """
+    Store the values of a loaded layer for ``forecast_date``, in one transaction.
+
+    Its admin units must already be stored (see ``store_admin_units``).
+    Returns the number of values written.
+    """
+    with transaction.atomic():
+        ensure_partition(forecast_date)
+        staging = _stage(f"impact_staging_{indicator}", frame, VALUE_COLUMNS)
+        return _upsert_values(staging, indicator, forecast_date)
+
+
+def _table_exists(name):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [_quote(name)])
+        return cursor.fetchone()[0]
+
+
+def archive_legacy_table(indicator, forecast_date):
+    """
+    Copy what is left in an indicator's pre-store layer table into the store.
+
+    Returns the number of values written, or None when the table is gone.
+    """
+    table = LEGACY_TABLES[indicator]
+    if not _table_exists(table):
+        return None
+    with transaction.atomic():
+        ensure_partition(forecast_date)
+        _upsert_units(table)
+        return _upsert_values(table, indicator, forecast_date)
+
+
+def drop_legacy_tables():
+    """Drop the pre-store per-layer tables; returns the names that existed."""
+    dropped = []
+    for table in LEGACY_TABLES.values():
+        if _table_exists(table):
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {_quote(table)}")
+            dropped.append(table)
+    return dropped
+
+
+def drop_partitions_before(day):
+    """
+    Drop the monthly partitions that end on or before ``day``.
+
+    Only whole months are dropped, so values from the month holding ``day``
+    are kept until the next month passes. Returns the dropped table names.
+    """
+    parent = ImpactValue._meta.db_table
+    cutoff = _month_start(day)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s",
+            [parent],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    dropped = []
+    for name in sorted(names):
+        try:
+            month = datetime.strptime(name[len(parent):], PARTITION_SUFFIX).date()
+        except ValueError:
+            continue
+        if _next_month(month) <= cutoff:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {_quote(name)}")
+            dropped.append(name)
+    return dropped
@@ -0,0 +1,52 @@
+"""
+Set-based loading of the impact layer shapefiles.
+
+A layer is read in one call through pyogrio, and its polygons are promoted
+to MultiPolygons and encoded as hex EWKB with shapely, ready to be streamed
+into the impact store with ``COPY`` (see ``store_admin_units`` and
+``store_values`` in ``Impact.impact_store``). This replaces ``LayerMapping``,
+which saved one model instance (and one INSERT) per feature.
+"""
+import geopandas as gpd
+import shapely
+from shapely.geometry import MultiPolygon
+
+# ISO-8859-1, as LayerMapping read it; pyogrio mis-decodes that exact spelling as UTF-8
+SOURCE_ENCODING = 'latin1'
+SRID = 4326
+
+
+def read_layer(file_path, field_mapping, geometry_field='geom'):
+    """
+    Read a shapefile into a frame keyed by model field names.
+
+    ``field_mapping`` maps model fields to source attributes, as for
+    ``LayerMapping``; attribute names are matched case-insensitively. The
+    geometry column holds hex EWKB MultiPolygons in EPSG:4326, the SRID the
+    files are published in (they are not reprojected).
+    """
+    gdf = gpd.read_file(file_path, engine='pyogrio', encoding=SOURCE_ENCODING)
+    source_columns = {column.lower(): column for column in gdf.columns}
+
+    attributes = {f: s for f, s in field_mapping.items() if f != geometry_field}
+    missing = [s for s in attributes.values() if s.lower() not in source_columns]
+    if missing:
+        raise ValueError(f"{file_path} is missing the fields: {', '.join(missing)}")
+
+    frame = gdf[[source_columns[s.lower()] for s in attributes.values()]].copy()
+    frame.columns = list(attributes)
+
+    geometries = gdf.geometry.to_numpy().copy()
+    if shapely.is_missing(geometries).any():
+        raise ValueError(f"{file_path} has features without geometry")
+    polygons = shapely.get_type_id(geometries) == shapely.GeometryType.POLYGON
+    geometries[polygons] = [MultiPolygon([polygon]) for polygon in geometries[polygons]]
+    unexpected = shapely.get_type_id(geometries) != shapely.GeometryType.MULTIPOLYGON
+    if unexpected.any():
+        raise ValueError(f"{file_path} has {int(unexpected.sum())} non-polygon features")
+
+    frame[geometry_field] = shapely.to_wkb(
+        shapely.set_srid(geometries, SRID), hex=True, include_srid=True,
+    )
+    return frame
+
@@ -1,24 +1,25 @@
 import os
 import json
-import geopandas as gpd
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.contrib.gis.geos import Point
 from Impact.models import RiverSection
+from Impact.section_json import MERGED_GEOJSON, arrow_path, read_merged
 
 class Command(BaseCommand):
     help = 'Sync river sections timeseries data from GeoJSON'
 
     def handle(self, *args, **kwargs):
-        # Absolute path to the GeoJSON file
-        geojson_path = './temp_data/merged_data.geojson'
+        # Merged file written by merge_jsonFiles, with its Arrow copy alongside
+        geojson_path = os.path.join(settings.TIMESERIES_OUTPUT_DIR, MERGED_GEOJSON)
         
         # Validate file path
-        if not os.path.exists(geojson_path):
+        if not os.path.exists(geojson_path) and not os.path.exists(arrow_path(geojson_path)):
             self.stderr.write(self.style.ERROR(f'File not found: {geojson_path}'))
             return
         
         try:
-            gdf = gpd.read_file(geojson_path)
+            gdf = read_merged(geojson_path)
             
             imported_count = 0
             for _, row in gdf.iterrows():
@@ -42,6 +43,8 @@ class Command(BaseCommand):
                 # Convert Timestamps to strings if needed
                 if hasattr(time_periods, 'dt'):
                     time_periods = time_periods.dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+                elif hasattr(time_periods, 'tolist'):
+                    time_periods = time_periods.tolist()
                 elif isinstance(time_periods, str):
                     time_periods = time_periods.split(',')
                 
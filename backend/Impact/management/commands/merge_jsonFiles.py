@@ -1,12 +1,16 @@
 import os
-import json
 import shutil
 from datetime import datetime, timedelta
-import paramiko
 import geopandas as gpd
+import pandas as pd
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from decouple import config
 import tempfile
+from Impact.download_cache import DownloadCache
+from Impact.forecast_bundle import remove_bundle, write_bundle
+from Impact.section_json import MERGED_GEOJSON, SERIES_KEYS, default_workers, format_series, iter_parsed, write_arrow
+from Impact.sftp import SFTPPool, summarize
 
 class Command(BaseCommand):
     help = 'Download and process remote JSON and shapefile data from an SFTP server.'
@@ -26,8 +30,8 @@ class Command(BaseCommand):
         return base_path, full_path, base_date
 
     def get_output_dir(self):
-        # Use environment variable for timeseries data directory
-        timeseries_dir = config('TIMESERIES_OUTPUT_DIR', default='/etc/mapserver/data/timeseries_data')
+        # TIMESERIES_OUTPUT_DIR setting, shared with the timeseries loaders
+        timeseries_dir = settings.TIMESERIES_OUTPUT_DIR
         is_shared_volume = True
         
         if not os.path.exists(timeseries_dir):
@@ -49,27 +53,23 @@ class Command(BaseCommand):
         
         return timeseries_dir, is_shared_volume
 
-    def check_remote_path_exists(self, sftp, path):
-        try:
-            sftp.stat(path)
-            return True
-        except IOError:
-            return False
+    def check_remote_path_exists(self, pool, path):
+        return pool.exists(path)
 
-    def get_valid_json_path(self, sftp):
+    def get_valid_json_path(self, pool):
         """Try today's data first, then yesterday's data if needed"""
         today = datetime.now()
         yesterday = today - timedelta(days=1)
         
         # First check today's data
         _, today_path, _ = self.get_data_path(today)
-        if self.check_remote_path_exists(sftp, today_path):
+        if self.check_remote_path_exists(pool, today_path):
             self.stdout.write(self.style.SUCCESS(f"Using today's data from: {today.strftime('%Y-%m-%d')}"))
             return today_path, today, False
         
         # If today's data not available, try yesterday's
         _, yesterday_path, _ = self.get_data_path(yesterday)
-        if self.check_remote_path_exists(sftp, yesterday_path):
+        if self.check_remote_path_exists(pool, yesterday_path):
             self.stdout.write(self.style.WARNING(
                 f"Today's data not available. Using yesterday's data from: {yesterday.strftime('%Y-%m-%d')}"
             ))
@@ -82,7 +82,7 @@ class Command(BaseCommand):
         try:
             # Get the output directory
             output_dir, is_shared_volume = self.get_output_dir()
-            output_file = os.path.join(output_dir, 'merged_data.geojson')
+            output_file = os.path.join(output_dir, MERGED_GEOJSON)
             self.stdout.write(self.style.SUCCESS(f"Will save to: {output_file} (Timeseries directory: {is_shared_volume})"))
             
             # Create temporary directory for processing intermediate files
@@ -103,70 +103,61 @@ class Command(BaseCommand):
             raise
 
     def connect_sftp(self):
-        hostname = config('SFTP_HOST')
-        port = int(config('SFTP_PORT'))
-        username = config('SFTP_USERNAME')
-        password = config('SFTP_PASSWORD')
-
-        try:
-            transport = paramiko.Transport((hostname, port))
-            transport.connect(username=username, password=password)
-            return paramiko.SFTPClient.from_transport(transport)
-        except Exception as e:
-            raise Exception(f"Failed to connect to SFTP server: {e}")
+        return SFTPPool()
 
     def sync_data(self, json_dir, shapefile_dir):
-        sftp = self.connect_sftp()
-
-        try:
+        with self.connect_sftp() as pool:
             # Get valid JSON path with fallback to yesterday
-            json_path, data_date, is_fallback = self.get_valid_json_path(sftp)
+            json_path, data_date, is_fallback = self.get_valid_json_path(pool)
 
             # Get static shapefile directory
             shapefile_remote_dir = config('SHAPEFILE_REMOTE_DIR')
-            if not self.check_remote_path_exists(sftp, shapefile_remote_dir):
+            if not self.check_remote_path_exists(pool, shapefile_remote_dir):
                 raise Exception(f"Shapefile directory not found: {shapefile_remote_dir}")
 
             # Download JSON files
             self.stdout.write("Downloading JSON files...")
-            json_files = self.download_files(sftp, json_path, json_dir, '.json')
+            json_files = self.download_files(pool, json_path, json_dir, '.json')
 
-            # Download shapefiles
+            # Download shapefiles; the section shapefile is static, so reuse unchanged copies
             self.stdout.write("Downloading shapefiles...")
             shapefile_extensions = ['.shp', '.shx', '.dbf', '.prj']
-            self.download_files(sftp, shapefile_remote_dir, shapefile_dir, extensions=shapefile_extensions)
+            self.download_files(
+                pool, shapefile_remote_dir, shapefile_dir, extensions=shapefile_extensions, cache=DownloadCache(),
+            )
 
             return json_files, shapefile_dir, data_date, is_fallback
 
-        finally:
-            sftp.close()
-
-    def download_files(self, sftp, remote_dir, local_dir, extensions):
+    def download_files(self, pool, remote_dir, local_dir, extensions, cache=None):
         try:
-            remote_files = sftp.listdir(remote_dir)
+            remote_files = pool.listdir(remote_dir)
         except IOError as e:
             raise Exception(f"Error accessing remote directory {remote_dir}: {e}")
 
-        downloaded_files = []
+        if isinstance(extensions, str):
+            extensions = [extensions]
+        pairs = [
+            (os.path.join(remote_dir, file).replace('\\', '/'), os.path.join(local_dir, file))
+            for file in remote_files
+            if any(file.endswith(ext) for ext in extensions)
+        ]
 
-        for file in remote_files:
-            if isinstance(extensions, str):
-                valid = file.endswith(extensions)
+        # Fetch the matching files concurrently over the pooled sessions
+        transfers, elapsed = pool.download_many(pairs, cache=cache)
+        downloaded_files = []
+        for transfer in transfers:
+            if transfer.ok:
+                downloaded_files.append(transfer.local_path)
+                self.stdout.write(self.style.SUCCESS(
+                    f"{'Cached' if transfer.cached else 'Downloaded'} {transfer.describe()}"
+                ))
+            elif isinstance(transfer.error, FileNotFoundError):
+                self.stderr.write(self.style.WARNING(f"File not found: {transfer.remote_path}"))
             else:
-                valid = any(file.endswith(ext) for ext in extensions)
-
-            if valid:
-                remote_path = os.path.join(remote_dir, file).replace('\\', '/')
-                local_path = os.path.join(local_dir, file)
-
-                try:
-                    sftp.get(remote_path, local_path)
-                    downloaded_files.append(local_path)
-                    self.stdout.write(self.style.SUCCESS(f"Downloaded {file}"))
-                except FileNotFoundError:
-                    self.stderr.write(self.style.WARNING(f"File not found: {remote_path}"))
-                except Exception as e:
-                    self.stderr.write(self.style.WARNING(f"Error downloading {file}: {e}"))
+                self.stderr.write(self.style.WARNING(
+                    f"Error downloading {os.path.basename(transfer.remote_path)}: {transfer.error}"
+                ))
+        self.stdout.write(f"Transferred {summarize(transfers, elapsed)}")
 
         if not downloaded_files:
             raise Exception(f"No files with extensions {extensions} found in {remote_dir}")
@@ -205,59 +196,9 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING("Warning: CRS missing. Setting CRS to EPSG:4326."))
                 gdf.set_crs('EPSG:4326', allow_override=True, inplace=True)
 
-            merged_data = []
-
-            for json_file in json_files:
-                try:
-                    with open(json_file, 'r') as file:
-                        data = json.load(file)
-                        if isinstance(data, str):
-                            data = json.loads(data)
-                        if not isinstance(data, (list, dict)):
-                            raise ValueError(f"Invalid JSON format in {json_file}")
-                        
-                        if isinstance(data, dict):
-                            data = [data]
-
-                        for entry in data:
-                            if not isinstance(entry, dict):
-                                self.stdout.write(self.style.WARNING(
-                                    f"Skipping invalid entry in {json_file}: {entry}"
-                                ))
-                                continue
-                                
-                            section_name = entry.get('section_name')
-                            if section_name:
-                                match = gdf[gdf['SEC_NAME'] == section_name]
-                                if not match.empty:
-                                    merged_entry = entry.copy()
-                                    # Add data date and fallback flag
-                                    merged_entry['data_date'] = data_date.strftime('%Y-%m-%d')
-                                    merged_entry['is_fallback'] = is_fallback
-                                    
-                                    for col in match.columns:
-                                        if col != 'geometry':
-                                            merged_entry[col] = match.iloc[0][col]
-                                    merged_entry['geometry'] = match.iloc[0].geometry
-                                    merged_data.append(merged_entry)
-                                else:
-                                    self.stdout.write(self.style.WARNING(
-                                        f"No match for section_name: {section_name}"
-                                    ))
-                except json.JSONDecodeError as e:
-                    self.stderr.write(self.style.WARNING(
-                        f"Error parsing JSON file {json_file}: {e}"
-                    ))
-                except Exception as e:
-                    self.stderr.write(self.style.WARNING(
-                        f"Error processing file {json_file}: {e}"
-                    ))
+            final_gdf = self.join_sections(self.read_entries(json_files), gdf, data_date, is_fallback)
 
-            if merged_data:
-                # Create the GeoDataFrame
-                final_gdf = gpd.GeoDataFrame(merged_data, geometry='geometry')
-                final_gdf.set_crs(epsg=4326, inplace=True)
-                
+            if final_gdf is not None:
                 # Add metadata about the data date and fallback status
                 final_gdf.attrs['data_date'] = data_date.strftime('%Y-%m-%d')
                 final_gdf.attrs['is_fallback'] = is_fallback
@@ -272,11 +213,97 @@ class Command(BaseCommand):
                 if os.path.exists(output_file):
                     os.remove(output_file)
                 
-                final_gdf.to_file(output_file, driver='GeoJSON')
+                # Series travel as float arrays; the GeoJSON keeps its comma-joined text
+                geojson_gdf = final_gdf.copy()
+                for column in SERIES_KEYS:
+                    if column in geojson_gdf:
+                        geojson_gdf[column] = geojson_gdf[column].map(format_series)
+                geojson_gdf.to_file(output_file, driver='GeoJSON')
                 self.stdout.write(self.style.SUCCESS(f"Merged GeoJSON saved at {output_file}"))
+
+                # Typed columnar copy for the loaders, written after the GeoJSON so it is never older
+                try:
+                    arrow_file = write_arrow(final_gdf, output_file)
+                    self.stdout.write(self.style.SUCCESS(f"Merged Arrow table saved at {arrow_file}"))
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f"Could not write the Arrow copy: {e}"))
+
+                # Slim, pre-compressed bundle served to the map client
+                try:
+                    for bundle_file in write_bundle(final_gdf, output_file):
+                        self.stdout.write(self.style.SUCCESS(
+                            f"Forecast bundle saved at {bundle_file} ({os.path.getsize(bundle_file) / 1e3:.1f} kB)"
+                        ))
+                except Exception:
+                    # The map client reads only the bundle; never leave an older one in place
+                    for stale_file in remove_bundle(output_file):
+                        self.stderr.write(self.style.WARNING(f"Removed stale forecast bundle {stale_file}"))
+                    raise
             else:
                 self.stdout.write(self.style.WARNING("No data to merge."))
 
         except Exception as e:
             self.stderr.write(self.style.ERROR(f"Error merging data: {e}"))
-            raise
\ No newline at end of file
+            raise
+
+    def read_entries(self, json_files):
+        """Yield the section entries of each JSON file, one file's list at a time, as the parsing stage delivers them."""
+        workers = config('JSON_PARSE_WORKERS', default=default_workers(), cast=int)
+        for json_file, entries, skipped, error in iter_parsed(json_files, workers):
+            if error:
+                self.stderr.write(self.style.WARNING(
+                    f"Error processing file {json_file}: {error}"
+                ))
+                continue
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipped {skipped} invalid entries in {json_file}"
+                ))
+            yield entries
+
+    def join_sections(self, batches, gdf, data_date, is_fallback):
+        """
+        Attach the section attributes and geometry to every entry with one hash join.
+
+        ``batches`` yields the entries of one file at a time. Each batch is
+        reduced to its matched entries without the keys the shapefile
+        overrides before the next one is read, so the parsed documents are
+        never all held at once. Sections are matched on ``section_name`` ==
+        ``SEC_NAME``; the first shapefile row wins for duplicated names and
+        shapefile columns take precedence over entry keys of the same name.
+        Returns None when nothing matched.
+        """
+        sections = gdf.drop_duplicates(subset='SEC_NAME', keep='first')
+        names = set(sections['SEC_NAME'])
+        section_columns = set(sections.columns)
+
+        frames, unmatched = [], {}
+        for entries in batches:
+            matched = []
+            for entry in entries:
+                if entry['section_name'] not in names:
+                    unmatched[entry['section_name']] = None
+                    continue
+                matched.append({k: v for k, v in entry.items() if k not in section_columns})
+            if matched:
+                frames.append(pd.DataFrame(matched))
+
+        unmatched = list(unmatched)
+        if len(unmatched):
+            shown = ', '.join(map(str, unmatched[:20]))
+            more = f" (+{len(unmatched) - 20} more)" if len(unmatched) > 20 else ''
+            self.stdout.write(self.style.WARNING(
+                f"No match for {len(unmatched)} section names: {shown}{more}"
+            ))
+
+        if not frames:
+            return None
+        entries_df = pd.concat(frames, ignore_index=True)
+        entries_df['data_date'] = data_date.strftime('%Y-%m-%d')
+        entries_df['is_fallback'] = is_fallback
+
+        overlap = [col for col in sections.columns if col in entries_df.columns]
+        merged = entries_df.drop(columns=overlap).merge(
+            pd.DataFrame(sections), how='inner', left_on='section_name', right_on='SEC_NAME', sort=False,
+        )
+        return gpd.GeoDataFrame(merged, geometry='geometry', crs='EPSG:4326')
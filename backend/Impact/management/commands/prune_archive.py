@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from Impact.forecast_ingest import prune_forecast_runs
+from Impact.impact_store import drop_partitions_before
+
+
+class Command(BaseCommand):
+    help = 'Apply the retention policy to the archived impact values and forecast runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--impact-days', type=int, default=settings.IMPACT_RETENTION_DAYS,
+            help='Days of impact values to keep (0 keeps everything)',
+        )
+        parser.add_argument(
+            '--forecast-days', type=int, default=settings.FORECAST_RETENTION_DAYS,
+            help='Days of forecast runs to keep (0 keeps everything)',
+        )
+
+    def handle(self, *args, **options):
+        if options['impact_days'] > 0:
+            cutoff = timezone.localdate() - timedelta(days=options['impact_days'])
+            dropped = drop_partitions_before(cutoff)
+            self.stdout.write(self.style.SUCCESS(
+                f"Dropped {len(dropped)} impact partitions older than {cutoff}"
+            ))
+
+        if options['forecast_days'] > 0:
+            cutoff = timezone.now() - timedelta(days=options['forecast_days'])
+            pruned = prune_forecast_runs(cutoff)
+            self.stdout.write(self.style.SUCCESS(
+                f"Pruned {pruned} forecast runs issued before {cutoff:%Y-%m-%d}"
+            ))
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from Impact.impact_store import LEGACY_TABLES, archive_legacy_table, drop_legacy_tables, ensure_impact_store
+
+
+class Command(BaseCommand):
+    help = 'Create the partitioned impact store and optionally move the old per-layer tables into it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--archive-date',
+            help='Forecast date (YYYY-MM-DD) to archive the rows left in the old per-layer tables under',
+        )
+        parser.add_argument(
+            '--drop-legacy-tables',
+            action='store_true',
+            help='Drop the old per-layer tables once they are archived',
+        )
+
+    def handle(self, *args, **options):
+        if options['archive_date']:
+            try:
+                forecast_date = datetime.strptime(options['archive_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--archive-date must be formatted as YYYY-MM-DD")
+        else:
+            forecast_date = None
+
+        ensure_impact_store()
+        self.stdout.write(self.style.SUCCESS("Impact store tables and views are in place"))
+
+        if forecast_date:
+            for indicator in LEGACY_TABLES:
+                archived = archive_legacy_table(indicator, forecast_date)
+                if archived is None:
+                    self.stdout.write(self.style.WARNING(f"No old {indicator} table to archive"))
+                    continue
+                self.stdout.write(self.style.SUCCESS(
+                    f"Archived {archived} {indicator} values for {forecast_date}"
+                ))
+
+        if options['drop_legacy_tables']:
+            dropped = drop_legacy_tables()
+            self.stdout.write(self.style.SUCCESS(
+                f"Dropped {len(dropped)} old per-layer tables: {', '.join(dropped) or 'none'}"
+            ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from Impact.models import WaterBodies, AdminUnit
+from Impact.response_cache import IMPACT, WATERBODIES, bump_data_version
+from Impact.simplify import refresh_simplified_geometries
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed simplified geometries of the admin units and waterbodies'
+
+    # The impact layers are views over AdminUnit, so they need no refresh of their own
+    models = [WaterBodies, AdminUnit]
+
+    def handle(self, *args, **kwargs):
+        for model in self.models:
+            updated = refresh_simplified_geometries(model)
+            self.stdout.write(self.style.SUCCESS(
+                f"Simplified {updated} geometries for {model.__name__}"
+            ))
+        bump_data_version(IMPACT)
+        bump_data_version(WATERBODIES)
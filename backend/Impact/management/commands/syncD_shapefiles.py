@@ -1,21 +1,66 @@
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from io import BytesIO
-import paramiko
 from datetime import datetime, timedelta
 import geopandas as gpd
 import pandas as pd
 from django.core.management.base import BaseCommand
-from django.contrib.gis.utils import LayerMapping
+from django.conf import settings
+from django.db import connection
 from decouple import config
 from Impact.models import (
     AffectedPopulation, ImpactedGDP, AffectedCrops,
     AffectedRoads, DisplacedPopulation, AffectedLivestock,
     AffectedGrazingLand
 )
+from Impact.impact_store import (
+    drop_partitions_before, ensure_impact_store, ensure_partition, forecast_date_from_filename,
+    indicator_for_model, store_admin_units, store_values,
+)
+from Impact.layer_load import read_layer
+from Impact.response_cache import IMPACT, bump_data_version
+from Impact.sftp import RemoteManifest, SFTPPool
+from Impact.tiles import warm_tile_cache
 
 current_date = datetime.now().strftime('%Y%m%d')
 
+
+@dataclass
+class LayerIngest:
+    """Per-run state of one impact layer as it moves through the pipeline."""
+    model: type
+    remote_folder: str = None
+    base_filename: str = None
+    extensions: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+    # Layer as read from its shapefile, held until its values are stored
+    frame: object = None
+    loaded: bool = False
+    skipped: bool = False
+    error: Exception = None
+
+    @property
+    def filename(self):
+        return f"{self.base_filename}.shp"
+
+    @property
+    def forecast_date(self):
+        return forecast_date_from_filename(self.base_filename)
+
+    def describe(self):
+        stages = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in self.timings.items())
+        if self.error:
+            status = f"failed: {self.error}"
+        elif self.skipped:
+            status = "kept the published copy"
+        else:
+            status = "ingested"
+        return f"{self.model.__name__}: {status}" + (f" ({stages})" if stages else "")
+
+
 class Command(BaseCommand):
     help = 'Sync remote impact layer shapefiles from SFTP and upload to database and MapServer'
     
@@ -23,6 +68,9 @@ class Command(BaseCommand):
     # Updated MapServer directory to match Docker mounted path
     MAPSERVER_DIR = '/etc/mapserver/data/impact_shapefiles'
     
+    EXTENSIONS = ['.shp', '.shx', '.dbf', '.prj']
+    CRITICAL_EXTENSIONS = ['.shp', '.shx', '.dbf']
+    
     model_configurations = {
         AffectedPopulation: f'{current_date}0000_FPimpacts-Population.shp',
         ImpactedGDP: f'{current_date}0000_FPimpacts-GDP.shp',
@@ -66,9 +114,25 @@ class Command(BaseCommand):
             os.makedirs(self.MAPSERVER_DIR, exist_ok=True)
             
             self.stdout.write(f"Using MapServer directory: {self.MAPSERVER_DIR}")
-            self.sync_shapefiles()
-            self.load_shapefiles()
-            self.copy_to_mapserver()
+            ensure_impact_store()
+            start = time.monotonic()
+            layers = self.run_pipeline()
+            elapsed = time.monotonic() - start
+
+            loaded = [layer for layer in layers if layer.loaded]
+            failed = [layer for layer in layers if layer.error]
+            for layer in layers:
+                self.stdout.write(layer.describe())
+            self.stdout.write(f"Impact ingest finished in {elapsed:.1f}s "
+                              f"({len(loaded)} loaded, {len(failed)} failed)")
+
+            self.apply_retention()
+            if loaded:
+                self.refresh_caches()
+            if failed:
+                raise Exception("Failed to ingest " + ", ".join(
+                    f"{layer.model.__name__} ({layer.error})" for layer in failed
+                ))
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'Error: {str(e)}'))
             raise
@@ -76,23 +140,64 @@ class Command(BaseCommand):
             self.cleanup_temp_files()
     
     def connect_sftp(self, host, port, username, password):
-        """Establish an SFTP connection."""
-        try:
-            transport = paramiko.Transport((host, int(port)))
-            transport.connect(username=username, password=password)
-            return paramiko.SFTPClient.from_transport(transport)
-        except Exception as e:
-            raise Exception(f"Failed to connect to SFTP server: {str(e)}")
+        """Open a pool of SFTP sessions."""
+        return SFTPPool(host, port, username, password)
 
-    def sync_shapefiles(self):
-        """Download impact layer shapefiles from remote SFTP server with enhanced fallback mechanism."""
-        sftp_host = config('SFTP_HOST')
-        sftp_port = config('SFTP_PORT')
-        sftp_username = config('SFTP_USERNAME')
-        sftp_password = config('SFTP_PASSWORD')
-        remote_folder_base = config('REMOTE_FOLDER_BASE')
+    def run_pipeline(self):
+        """
+        Download, read, load and publish every layer.
+
+        Downloads run on the SFTP pool, one layer per session; a layer whose
+        files have arrived is read by one of ``IMPACT_LOAD_WORKERS`` workers
+        while the remaining layers are still downloading. The admin units of
+        all read layers are then upserted once, so the value loads that
+        follow (again on ``IMPACT_LOAD_WORKERS`` workers, each with its own
+        connection) only write their own indicator's rows and never contend
+        for the same unit rows. A failure is recorded on its layer and does
+        not stop the others. Returns the ``LayerIngest`` records in
+        configuration order.
+        """
+        load_workers = max(1, config('IMPACT_LOAD_WORKERS', default=3, cast=int))
         
-        extensions = ['.shp', '.shx', '.dbf', '.prj']
+        self.stdout.write("Connecting to SFTP server...")
+        with self.connect_sftp(
+            config('SFTP_HOST'), config('SFTP_PORT'), config('SFTP_USERNAME'), config('SFTP_PASSWORD'),
+        ) as pool:
+            layers = self.resolve_layers(RemoteManifest(pool))
+            for day in {layer.forecast_date for layer in layers if layer.base_filename}:
+                # Created up front so concurrent loaders never race to create a partition
+                ensure_partition(day)
+            
+            with ThreadPoolExecutor(max_workers=pool.size) as fetchers, \
+                    ThreadPoolExecutor(max_workers=load_workers) as readers:
+                downloads = {
+                    fetchers.submit(self.download_layer, pool, layer): layer
+                    for layer in layers if layer.base_filename
+                }
+                reads = []
+                for future in as_completed(downloads):
+                    layer = downloads[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.keep_published_layer(layer, e)
+                        continue
+                    reads.append(readers.submit(self.read_downloaded, layer))
+                for future in as_completed(reads):
+                    future.result()
+
+        # Configuration order decides which layer's unit attributes win
+        read = [layer for layer in layers if layer.frame is not None]
+        if read and self.store_units(read):
+            with ThreadPoolExecutor(max_workers=load_workers) as loaders:
+                loads = [loaders.submit(self.load_and_publish, layer) for layer in read]
+                for future in as_completed(loads):
+                    future.result()
+        return layers
+
+    def resolve_layers(self, manifest):
+        """Pick, for every layer, the newest date folder holding a complete file set."""
+        remote_folder_base = config('REMOTE_FOLDER_BASE')
         today = datetime.now()
         
         # Enhanced fallback - try up to 7 days back
@@ -103,222 +208,254 @@ class Command(BaseCommand):
                 (check_date.strftime('%Y/%m/%d/00'), check_date.strftime('%Y%m%d'))
             )
         
-        self.stdout.write("Connecting to SFTP server...")
-        sftp = self.connect_sftp(sftp_host, sftp_port, sftp_username, sftp_password)
+        layers = []
+        for model, filename_template in self.model_configurations.items():
+            layer = LayerIngest(model)
+            layers.append(layer)
+            base_filename_template = os.path.splitext(filename_template)[0]
+            candidates = [
+                (f"{remote_folder_base}/{remote_folder}", base_filename_template.replace(current_date, date_str))
+                for remote_folder, date_str in date_attempts
+            ]
+            found = manifest.first_complete(candidates, self.CRITICAL_EXTENSIONS)
+            if found is None:
+                self.keep_published_layer(layer, Exception(
+                    f"no complete file set in the last {len(date_attempts)} days"
+                ))
+                continue
+            
+            layer.remote_folder, layer.base_filename = found
+            self.stdout.write(f"Using {layer.base_filename} from {layer.remote_folder} for {model.__name__}")
+            for ext in self.EXTENSIONS:
+                remote_file = f"{layer.base_filename}{ext}"
+                if manifest.has(layer.remote_folder, remote_file, nonempty=False):
+                    layer.extensions.append(ext)
+                else:
+                    self.stdout.write(self.style.WARNING(f"Optional file {remote_file} not found, skipping"))
+        return layers
+
+    def keep_published_layer(self, layer, error):
+        """
+        Fall back to the copy already in the MapServer directory when a layer
+        could not be fetched; without one, the layer is marked failed.
+        """
+        mapserver_path = os.path.join(self.MAPSERVER_DIR, self.mapserver_filenames[layer.model])
+        if os.path.exists(mapserver_path):
+            layer.skipped = True
+            self.stdout.write(self.style.WARNING(
+                f"Failed to download new data for {layer.model.__name__} ({error}), but existing file exists "
+                f"in MapServer directory. Will continue using existing file: {mapserver_path}"
+            ))
+        else:
+            layer.error = error
+            self.stdout.write(self.style.ERROR(f"Failed to find data for {layer.model.__name__}: {error}"))
+
+    def download_layer(self, pool, layer):
+        """Fetch the files of one layer over a single pooled session."""
+        start = time.monotonic()
+        for ext in layer.extensions:
+            remote_file = f"{layer.base_filename}{ext}"
+            remote_path = f"{layer.remote_folder}/{remote_file}"
+            local_path = os.path.join(self.TEMP_DIR, remote_file)
+            try:
+                transfer = pool.download(remote_path, local_path)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Error downloading {remote_file}: {str(e)}"))
+                if ext in self.CRITICAL_EXTENSIONS:
+                    raise
+                continue
+            self.stdout.write(self.style.SUCCESS(f"Downloaded {transfer.describe()} to {local_path}"))
+        layer.timings['download'] = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully downloaded all required files for {layer.model.__name__} ({layer.base_filename})"
+        ))
+
+    def read_downloaded(self, layer):
+        """Read one downloaded layer's shapefile; a failure is recorded on the layer."""
+        file_path = os.path.join(self.TEMP_DIR, layer.filename)
+        self.stdout.write(f"Reading {layer.model.__name__} from {file_path}...")
+        try:
+            if not os.path.exists(file_path):
+                raise Exception(f"Shapefile not found at {file_path}")
+            start = time.monotonic()
+            layer.frame = read_layer(file_path, self.field_mapping)
+            layer.timings['read'] = time.monotonic() - start
+        except Exception as e:
+            layer.error = e
+            self.stdout.write(self.style.ERROR(f"Error reading {layer.model.__name__}: {str(e)}"))
+
+    def store_units(self, layers):
+        """Upsert the admin units of all read layers at once; returns False (failing the layers) on error."""
+        start = time.monotonic()
+        try:
+            written = store_admin_units([layer.frame for layer in layers])
+        except Exception as e:
+            for layer in layers:
+                layer.error = e
+                layer.frame = None
+            self.stdout.write(self.style.ERROR(f"Error storing admin units: {str(e)}"))
+            return False
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {written} new or changed admin units from {len(layers)} layers "
+            f"in {time.monotonic() - start:.1f}s"
+        ))
+        return True
+
+    def load_and_publish(self, layer):
+        """Load one downloaded layer into the database, then copy it to MapServer."""
+        try:
+            start = time.monotonic()
+            self.load_layer(layer)
+            layer.timings['load'] = time.monotonic() - start
+            
+            start = time.monotonic()
+            self.copy_to_mapserver(layer.model, layer.filename)
+            layer.timings['publish'] = time.monotonic() - start
+        except Exception as e:
+            layer.error = e
+            self.stdout.write(self.style.ERROR(f"Error ingesting {layer.model.__name__}: {str(e)}"))
+        finally:
+            # Worker threads each opened their own connection
+            connection.close()
+
+    def load_layer(self, layer):
+        """Store a read impact layer's values for its forecast date."""
+        model = layer.model
+        self.stdout.write(f"Loading data for {model.__name__}...")
         
         try:
-            for model, filename_template in self.model_configurations.items():
-                base_filename_template = os.path.splitext(filename_template)[0]
-                downloaded = False
-                used_date = None  # Track which date was successfully used
-                
-                # Try today, then fallback to previous days
-                for remote_folder, date_str in date_attempts:
-                    if downloaded:
-                        break  # Skip further attempts if already downloaded
-                    
-                    # Update filename with the current date being tried
-                    base_filename = base_filename_template.replace(current_date, date_str)
-                    remote_folder_path = f"{remote_folder_base}/{remote_folder}"
-                    
-                    self.stdout.write(f"Trying to download files for {date_str} from {remote_folder_path}...")
-                    
-                    try:
-                        # Track if all critical files were downloaded
-                        critical_files_found = True
-                        
-                        # Download all required extensions
-                        for ext in extensions:
-                            remote_file = f"{base_filename}{ext}"
-                            local_path = os.path.join(self.TEMP_DIR, remote_file)
-                            remote_path = os.path.join(remote_folder_path, remote_file).replace('\\', '/')
-                            
-                            try:
-                                self.stdout.write(f"Downloading {remote_file}...")
-                                sftp.get(remote_path, local_path)
-                                
-                                # Check if file is empty
-                                if os.path.getsize(local_path) == 0:
-                                    self.stdout.write(self.style.WARNING(f"Downloaded file {local_path} is empty"))
-                                    if ext in ['.shp', '.shx', '.dbf']:
-                                        critical_files_found = False
-                                        break
-                                else:
-                                    self.stdout.write(self.style.SUCCESS(
-                                        f"Downloaded {remote_file} to {local_path}"
-                                    ))
-                            
-                            except FileNotFoundError:
-                                self.stdout.write(self.style.WARNING(f"File {remote_file} not found at {remote_path}"))
-                                if ext in ['.shp', '.shx', '.dbf']:
-                                    critical_files_found = False
-                                    break
-                        
-                        # If all critical files were found
-                        if critical_files_found:
-                            downloaded = True
-                            used_date = date_str
-                            # Update model_configurations with the full filename including .shp
-                            self.model_configurations[model] = f"{base_filename}.shp"
-                            self.stdout.write(self.style.SUCCESS(
-                                f"Successfully downloaded all required files for {model.__name__} using data from {date_str}"
-                            ))
-                    
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f"Error downloading files for {date_str}: {str(e)}"))
-                        # Continue to next date attempt
-                
-                # If we've tried all dates and still not downloaded
-                if not downloaded:
-                    # Check if we already have this layer in MapServer directory
-                    mapserver_filename = self.mapserver_filenames[model]
-                    mapserver_path = os.path.join(self.MAPSERVER_DIR, mapserver_filename)
-                    if os.path.exists(mapserver_path):
-                        self.stdout.write(self.style.WARNING(
-                            f"Failed to download new data for {model.__name__}, but existing file exists in MapServer directory. "
-                            f"Will continue using existing file: {mapserver_path}"
-                        ))
-                    else:
-                        raise Exception(f"Failed to find data for {model.__name__} after checking {len(date_attempts)} days")
+            # Only this indicator's values are written; the admin units are already stored
+            stored = store_values(indicator_for_model(model), layer.frame, layer.forecast_date)
+            
+            layer.loaded = True
+            self.stdout.write(self.style.SUCCESS(
+                f"Data for {model.__name__} loaded successfully ({stored} values stored for {layer.forecast_date})."
+            ))
         
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Full error: {str(e)}"))
+            raise Exception(
+                f"Error loading data for {model.__name__}: {str(e)}"
+            )
         finally:
-            sftp.close()
+            layer.frame = None
+
+    def apply_retention(self):
+        """Drop archived impact months older than IMPACT_RETENTION_DAYS."""
+        if settings.IMPACT_RETENTION_DAYS <= 0:
+            return
+        cutoff = datetime.now().date() - timedelta(days=settings.IMPACT_RETENTION_DAYS)
+        for name in drop_partitions_before(cutoff):
+            self.stdout.write(f"Dropped archived impact partition {name}")
 
-    def load_shapefiles(self):
-        """Load impact layer shapefiles into the database."""
-        for model, filename in self.model_configurations.items():
-            file_path = os.path.join(self.TEMP_DIR, filename)
+    def copy_to_mapserver(self, model, original_filename):
+        """Copy a layer's shapefile to MapServer directory with a consistent filename and fallback to the previous version."""
+        self.stdout.write(f"Copying {original_filename} to MapServer directory: {self.MAPSERVER_DIR}")
+        
+        try:
+            # Get base name without extension
+            base_filename = os.path.splitext(original_filename)[0]
             
-            # Ensure the file exists
-            if not os.path.exists(file_path):
-                raise Exception(f"Shapefile not found at {file_path}")
+            # Get MapServer target filename
+            mapserver_filename = self.mapserver_filenames[model]
+            mapserver_base = os.path.splitext(mapserver_filename)[0]
             
-            self.stdout.write(f"Loading data for {model.__name__} from {file_path}...")
+            # Create a backup of existing files before overwriting
+            extensions = ['.shp', '.shx', '.dbf', '.prj']
+            backup_created = False
             
-            try:
-                # Clear existing data
-                model.objects.all().delete()
-                
-                # Load shapefile using LayerMapping
-                lm = LayerMapping(
-                    model, 
-                    file_path, 
-                    self.field_mapping,
-                    transform=False,
-                    encoding='iso-8859-1'
-                )
-                lm.save(strict=True, verbose=True)
+            # First, create backups of existing files if they exist
+            for ext in extensions:
+                target_path = os.path.join(self.MAPSERVER_DIR, f"{mapserver_base}{ext}")
+                backup_path = os.path.join(self.MAPSERVER_DIR, f"{mapserver_base}_backup{ext}")
                 
-                self.stdout.write(self.style.SUCCESS(
-                    f"Data for {model.__name__} loaded successfully."
-                ))
+                if os.path.exists(target_path):
+                    try:
+                        shutil.copy2(target_path, backup_path)
+                        backup_created = True
+                        self.stdout.write(f"Created backup: {backup_path}")
+                    except Exception as e:
+                        self.stdout.write(self.style.WARNING(f"Could not create backup of {target_path}: {str(e)}"))
             
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Full error: {str(e)}"))
-                raise Exception(
-                    f"Error loading data for {model.__name__}: {str(e)}"
-                )
-
-    def copy_to_mapserver(self):
-        """Copy shapefiles to MapServer directory with consistent filenames and fallback to previous versions."""
-        self.stdout.write(f"Copying shapefiles to MapServer directory: {self.MAPSERVER_DIR}")
-        
-        for model, original_filename in self.model_configurations.items():
-            try:
-                # Get base name without extension
-                base_filename = os.path.splitext(original_filename)[0]
+            # Now copy new files
+            successful_copy = True
+            for ext in extensions:
+                source_path = os.path.join(self.TEMP_DIR, f"{base_filename}{ext}")
+                target_path = os.path.join(self.MAPSERVER_DIR, f"{mapserver_base}{ext}")
                 
-                # Get MapServer target filename
-                mapserver_filename = self.mapserver_filenames[model]
-                mapserver_base = os.path.splitext(mapserver_filename)[0]
-                
-                # Create a backup of existing files before overwriting
-                extensions = ['.shp', '.shx', '.dbf', '.prj']
-                backup_created = False
-                
-                # First, create backups of existing files if they exist
+                # Check if source file exists before copying
+                if os.path.exists(source_path):
+                    try:
+                        shutil.copy2(source_path, target_path)
+                        self.stdout.write(self.style.SUCCESS(
+                            f"Copied {source_path} to {target_path}"
+                        ))
+                    except Exception as e:
+                        successful_copy = False
+                        self.stdout.write(self.style.ERROR(
+                            f"Error copying {source_path} to {target_path}: {str(e)}"
+                        ))
+                        break
+                else:
+                    # If critical file is missing
+                    if ext in ['.shp', '.shx', '.dbf']:
+                        successful_copy = False
+                        self.stdout.write(self.style.WARNING(
+                            f"Critical source file {source_path} does not exist, copy failed"
+                        ))
+                        break
+                    else:
+                        self.stdout.write(self.style.WARNING(
+                            f"Optional source file {source_path} does not exist, skipping"
+                        ))
+            
+            # If copy failed and we have backups, restore them
+            if not successful_copy and backup_created:
+                self.stdout.write(self.style.WARNING(
+                    f"Copy failed for {model.__name__}, restoring from backup"
+                ))
                 for ext in extensions:
-                    target_path = os.path.join(self.MAPSERVER_DIR, f"{mapserver_base}{ext}")
                     backup_path = os.path.join(self.MAPSERVER_DIR, f"{mapserver_base}_backup{ext}")
-                    
-                    if os.path.exists(target_path):
-                        try:
-                            shutil.copy2(target_path, backup_path)
-                            backup_created = True
-                            self.stdout.write(f"Created backup: {backup_path}")
-                        except Exception as e:
-                            self.stdout.write(self.style.WARNING(f"Could not create backup of {target_path}: {str(e)}"))
-                
-                # Now copy new files
-                successful_copy = True
-                for ext in extensions:
-                    source_path = os.path.join(self.TEMP_DIR, f"{base_filename}{ext}")
                     target_path = os.path.join(self.MAPSERVER_DIR, f"{mapserver_base}{ext}")
                     
-                    # Check if source file exists before copying
-                    if os.path.exists(source_path):
+                    if os.path.exists(backup_path):
                         try:
-                            shutil.copy2(source_path, target_path)
-                            self.stdout.write(self.style.SUCCESS(
-                                f"Copied {source_path} to {target_path}"
-                            ))
+                            shutil.copy2(backup_path, target_path)
+                            self.stdout.write(f"Restored {target_path} from backup")
                         except Exception as e:
-                            successful_copy = False
                             self.stdout.write(self.style.ERROR(
-                                f"Error copying {source_path} to {target_path}: {str(e)}"
+                                f"Failed to restore {target_path} from backup: {str(e)}"
                             ))
-                            break
-                    else:
-                        # If critical file is missing
-                        if ext in ['.shp', '.shx', '.dbf']:
-                            successful_copy = False
-                            self.stdout.write(self.style.WARNING(
-                                f"Critical source file {source_path} does not exist, copy failed"
-                            ))
-                            break
-                        else:
+            
+            # Clean up backups if successful
+            if successful_copy and backup_created:
+                for ext in extensions:
+                    backup_path = os.path.join(self.MAPSERVER_DIR, f"{mapserver_base}_backup{ext}")
+                    if os.path.exists(backup_path):
+                        try:
+                            os.remove(backup_path)
+                            self.stdout.write(f"Removed backup: {backup_path}")
+                        except Exception as e:
                             self.stdout.write(self.style.WARNING(
-                                f"Optional source file {source_path} does not exist, skipping"
+                                f"Could not remove backup {backup_path}: {str(e)}"
                             ))
-                
-                # If copy failed and we have backups, restore them
-                if not successful_copy and backup_created:
-                    self.stdout.write(self.style.WARNING(
-                        f"Copy failed for {model.__name__}, restoring from backup"
-                    ))
-                    for ext in extensions:
-                        backup_path = os.path.join(self.MAPSERVER_DIR, f"{mapserver_base}_backup{ext}")
-                        target_path = os.path.join(self.MAPSERVER_DIR, f"{mapserver_base}{ext}")
-                        
-                        if os.path.exists(backup_path):
-                            try:
-                                shutil.copy2(backup_path, target_path)
-                                self.stdout.write(f"Restored {target_path} from backup")
-                            except Exception as e:
-                                self.stdout.write(self.style.ERROR(
-                                    f"Failed to restore {target_path} from backup: {str(e)}"
-                                ))
-                
-                # Clean up backups if successful
-                if successful_copy and backup_created:
-                    for ext in extensions:
-                        backup_path = os.path.join(self.MAPSERVER_DIR, f"{mapserver_base}_backup{ext}")
-                        if os.path.exists(backup_path):
-                            try:
-                                os.remove(backup_path)
-                                self.stdout.write(f"Removed backup: {backup_path}")
-                            except Exception as e:
-                                self.stdout.write(self.style.WARNING(
-                                    f"Could not remove backup {backup_path}: {str(e)}"
-                                ))
-                
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(
-                    f"Error handling MapServer files for {model.__name__}: {str(e)}"
-                ))
-                # Continue with next model instead of raising
-                continue
-    
+            
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(
+                f"Error handling MapServer files for {model.__name__}: {str(e)}"
+            ))
+            # Other layers are published regardless
+
+    def refresh_caches(self):
+        """Invalidate cached impact responses and tiles, then optionally pre-seed low zooms."""
+        version = bump_data_version(IMPACT)
+        self.stdout.write(f"Impact data version is now {version}")
+
+        max_zoom = settings.TILE_CACHE_WARM_MAX_ZOOM
+        if max_zoom >= 0:
+            count = warm_tile_cache(max_zoom)
+            self.stdout.write(self.style.SUCCESS(f"Pre-rendered {count} tiles up to zoom {max_zoom}"))
+
     def cleanup_temp_files(self):
         """Clean up temporary files after processing."""
         self.stdout.write("Cleaning up temporary files...")
@@ -1,6 +1,5 @@
 import os
 from io import BytesIO
-import paramiko
 from datetime import datetime
 import geopandas as gpd
 import pandas as pd
@@ -8,6 +7,9 @@ from django.core.management.base import BaseCommand
 from django.contrib.gis.utils import LayerMapping
 from decouple import config
 from Impact.models import SectorData
+from Impact.response_cache import SECTORS, bump_data_version
+from Impact.download_cache import DownloadCache
+from Impact.sftp import SFTPPool, summarize
 
 class Command(BaseCommand):
     help = 'Sync remote sector shapefiles from SFTP and upload to database'
@@ -49,13 +51,8 @@ class Command(BaseCommand):
             self.cleanup_temp_files()
     
     def connect_sftp(self, host, port, username, password):
-        """Establish an SFTP connection."""
-        try:
-            transport = paramiko.Transport((host, int(port)))
-            transport.connect(username=username, password=password)
-            return paramiko.SFTPClient.from_transport(transport)
-        except Exception as e:
-            raise Exception(f"Failed to connect to SFTP server: {str(e)}")
+        """Open a pool of SFTP sessions."""
+        return SFTPPool(host, port, username, password)
 
     def sync_sector_shapefile(self):
         """Download sector shapefile from remote SFTP server."""
@@ -69,28 +66,33 @@ class Command(BaseCommand):
         base_filename = os.path.splitext(self.SECTOR_FILENAME)[0]
         
         self.stdout.write("Connecting to SFTP server...")
-        sftp = self.connect_sftp(sftp_host, sftp_port, sftp_username, sftp_password)
-        
-        try:
-            for ext in extensions:
-                remote_file = f"{base_filename}{ext}"
-                local_path = os.path.join(self.SHAPEFILE_DIR, remote_file)
-                remote_path = os.path.join(sectors_remote_folder, remote_file).replace('\\', '/')
-                
-                try:
-                    self.stdout.write(f"Downloading {remote_file}...")
-                    sftp.get(remote_path, local_path)
-                    self.stdout.write(self.style.SUCCESS(
-                        f"Downloaded {remote_file} to {local_path}"
-                    ))
-                except FileNotFoundError:
-                    msg = f"Warning: {remote_file} not found at {remote_path}"
-                    if ext in ['.shp', '.shx', '.dbf']:
-                        raise Exception(msg)
-                    else:
-                        self.stdout.write(self.style.WARNING(msg))
-        finally:
-            sftp.close()
+        with self.connect_sftp(sftp_host, sftp_port, sftp_username, sftp_password) as pool:
+            self.stdout.write(f"Downloading {base_filename} ({', '.join(extensions)})...")
+            # The sector shapefile rarely changes; unchanged files come from the local cache
+            transfers, elapsed = pool.download_many(
+                [
+                    (
+                        os.path.join(sectors_remote_folder, f"{base_filename}{ext}").replace('\\', '/'),
+                        os.path.join(self.SHAPEFILE_DIR, f"{base_filename}{ext}"),
+                    )
+                    for ext in extensions
+                ],
+                cache=DownloadCache(),
+            )
+
+        for ext, transfer in zip(extensions, transfers):
+            if transfer.ok:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{'Cached' if transfer.cached else 'Downloaded'} {transfer.describe()} to {transfer.local_path}"
+                ))
+                continue
+            if not isinstance(transfer.error, FileNotFoundError):
+                raise transfer.error
+            msg = f"Warning: {base_filename}{ext} not found at {transfer.remote_path}"
+            if ext in ['.shp', '.shx', '.dbf']:
+                raise Exception(msg)
+            self.stdout.write(self.style.WARNING(msg))
+        self.stdout.write(f"Transferred {summarize(transfers, elapsed)}")
 
     def load_sector_data(self):
         """Load sector data into the database using LayerMapping."""
@@ -116,6 +118,7 @@ class Command(BaseCommand):
                 encoding='iso-8859-1'
             )
             lm.save(strict=True, verbose=True)
+            bump_data_version(SECTORS)
             
             self.stdout.write(self.style.SUCCESS(
                 f"Successfully loaded sectors into database."
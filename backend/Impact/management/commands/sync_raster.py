@@ -1,10 +1,9 @@
 import os
 from datetime import datetime
-import paramiko
 from decouple import config
 from django.core.management.base import BaseCommand
-import rasterio
-import numpy as np
+from Impact.raster_mosaic import DEFAULT_RULE, mosaic
+from Impact.sftp import SFTPPool, summarize
 
 class Command(BaseCommand):
     help = 'Sync remote raster data from SFTP, merge and process it locally using rasterio'
@@ -29,13 +28,8 @@ class Command(BaseCommand):
             self.cleanup_temp_files(preserve_merged=True)
 
     def connect_sftp(self, host, port, username, password):
-        """Establish an SFTP connection."""
-        try:
-            transport = paramiko.Transport((host, int(port)))
-            transport.connect(username=username, password=password)
-            return paramiko.SFTPClient.from_transport(transport)
-        except Exception as e:
-            raise Exception(f"Failed to connect to SFTP server: {str(e)}")
+        """Open a pool of SFTP sessions."""
+        return SFTPPool(host, port, username, password)
 
     def sync_rasters(self):
         """Download raster files from remote SFTP server."""
@@ -48,113 +42,47 @@ class Command(BaseCommand):
         remote_date = datetime.now().strftime('%Y/%m/%d/00/0000')
         remote_folder = f"{remote_folder_base}/{remote_date}/HMC"
 
-        self.stdout.write("Connecting to SFTP server...")
-        sftp = self.connect_sftp(sftp_host, sftp_port, sftp_username, sftp_password)
-
-        try:
-            for group, filenames in self.raster_groups.items():
-                self.stdout.write(f"Processing {group}...")
-                local_group_dir = os.path.join(self.RASTER_DIR, group)
-                os.makedirs(local_group_dir, exist_ok=True)
-
-                # Download the raster files for this group
-                local_files = []
-                for filename in filenames:
-                    remote_file = os.path.join(remote_folder, filename).replace('\\', '/')
-                    local_file = os.path.join(local_group_dir, filename)
-                    self.stdout.write(f"Downloading {filename}...")
-                    try:
-                        sftp.get(remote_file, local_file)
-                        local_files.append(local_file)
-                        self.stdout.write(self.style.SUCCESS(f"Downloaded {filename}"))
-                    except FileNotFoundError:
-                        self.stdout.write(self.style.WARNING(f"{filename} not found at {remote_file}"))
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f"Error downloading {filename}: {str(e)}"))
-
-                # Merge the rasters for this group if files were downloaded
-                if local_files:
-                    self.merge_rasters(local_files, local_group_dir)
+        # (group, remote path, local path) of every raster, fetched in one concurrent batch
+        downloads = []
+        for group, filenames in self.raster_groups.items():
+            local_group_dir = os.path.join(self.RASTER_DIR, group)
+            os.makedirs(local_group_dir, exist_ok=True)
+            for filename in filenames:
+                remote_file = os.path.join(remote_folder, filename).replace('\\', '/')
+                downloads.append((group, remote_file, os.path.join(local_group_dir, filename)))
 
-        finally:
-            sftp.close()
+        self.stdout.write("Connecting to SFTP server...")
+        with self.connect_sftp(sftp_host, sftp_port, sftp_username, sftp_password) as pool:
+            self.stdout.write(f"Downloading {len(downloads)} raster files...")
+            transfers, elapsed = pool.download_many((remote, local) for _, remote, local in downloads)
+        self.stdout.write(f"Transferred {summarize(transfers, elapsed)}")
+
+        local_files = {group: [] for group in self.raster_groups}
+        for (group, remote_file, _), transfer in zip(downloads, transfers):
+            filename = os.path.basename(remote_file)
+            if transfer.ok:
+                local_files[group].append(transfer.local_path)
+                self.stdout.write(self.style.SUCCESS(f"Downloaded {transfer.describe()}"))
+            elif isinstance(transfer.error, FileNotFoundError):
+                self.stdout.write(self.style.WARNING(f"{filename} not found at {remote_file}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Error downloading {filename}: {str(transfer.error)}"))
+
+        for group, files in local_files.items():
+            self.stdout.write(f"{group}: {len(files)} raster files")
+        # All groups go into one regional mosaic
+        raster_files = [path for files in local_files.values() for path in files]
+        if raster_files:
+            self.merge_rasters(raster_files, self.RASTER_DIR)
 
     def merge_rasters(self, raster_files, output_dir):
-        """Merge raster files and save them to the output directory using rasterio."""
-        self.stdout.write("Merging raster files using rasterio...")
+        """Mosaic raster files over their union extent, keeping the highest alert level, into the output directory."""
+        self.stdout.write(f"Merging {len(raster_files)} raster files using rasterio...")
         try:
-            # First, read and store all raster data and metadata
-            raster_data = []
-            for raster in raster_files:
-                with rasterio.open(raster) as src:
-                    # Read all bands
-                    data = src.read()
-                    profile = src.profile.copy()
-                    transform = src.transform
-                    crs = src.crs
-                    
-                    # Handle negative pixel height
-                    if transform[4] == 0 and transform[5] > 0:
-                        # Flip all bands
-                        data = np.flip(data, axis=1)
-                        # Adjust the transform
-                        ulx = transform[2]
-                        uly = transform[5] + (data.shape[1] * abs(transform[4]))
-                        transform = rasterio.Affine(
-                            transform[0],
-                            0.0,
-                            ulx,
-                            0.0,
-                            -abs(transform[4]),
-                            uly
-                        )
-                    
-                    raster_data.append({
-                        'data': data,
-                        'profile': profile,
-                        'transform': transform,
-                        'crs': crs
-                    })
-
-            # If we have rasters to merge
-            if raster_data:
-                # Create output profile from the first raster
-                out_profile = raster_data[0]['profile']
-                
-                # Update output profile for merged result
-                out_profile.update({
-                    'height': raster_data[0]['data'].shape[1],
-                    'width': raster_data[0]['data'].shape[2],
-                    'transform': raster_data[0]['transform'],
-                    'crs': raster_data[0]['crs'],
-                    'compress': 'lzw',
-                    'tiled': True,
-                    'blockxsize': 256,
-                    'blockysize': 256,
-                    'driver': 'GTiff'
-                })
-
-                # Define output path
-                merged_filename = f"merged_{datetime.now().strftime('%Y%m%d%H%M%S')}.tif"
-                merged_file_path = os.path.join(output_dir, merged_filename)
-
-                # Write the merged raster
-                with rasterio.open(merged_file_path, 'w', **out_profile) as dst:
-                    # Write each band from each raster
-                    for band_idx in range(raster_data[0]['data'].shape[0]):
-                        band_data = np.zeros((out_profile['height'], out_profile['width']), 
-                                           dtype=raster_data[0]['data'].dtype)
-                        
-                        # Combine data from all rasters for this band
-                        for raster in raster_data:
-                            # Only write non-zero/non-nodata values
-                            mask = raster['data'][band_idx] != 0
-                            band_data[mask] = raster['data'][band_idx][mask]
-                        
-                        dst.write(band_data, band_idx + 1)
-
-                self.stdout.write(self.style.SUCCESS(f"Merged raster saved to {merged_file_path}"))
-            
+            merged_filename = f"merged_{datetime.now().strftime('%Y%m%d%H%M%S')}.tif"
+            merged_file_path = os.path.join(output_dir, merged_filename)
+            mosaic(raster_files, merged_file_path, rule=config('ALERT_MOSAIC_RULE', default=DEFAULT_RULE))
+            self.stdout.write(self.style.SUCCESS(f"Merged raster saved to {merged_file_path}"))
         except Exception as e:
             self.stderr.write(self.style.ERROR(f"Error merging rasters with rasterio: {e}"))
             raise
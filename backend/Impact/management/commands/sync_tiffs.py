@@ -1,5 +1,4 @@
 import os
-import paramiko
 import shutil
 import traceback
 from datetime import datetime, timedelta
@@ -8,6 +7,9 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 import tempfile
 import glob
+from Impact.cog import publish_raster
+from Impact.raster_mosaic import DEFAULT_RULE, mosaic
+from Impact.sftp import RemoteManifest, SFTPPool, summarize
 
 class Command(BaseCommand):
     help = 'Sync TIFF files from SFTP server and update MapServer raster files'
@@ -15,7 +17,7 @@ class Command(BaseCommand):
     def __init__(self):
         super().__init__()
         self.current_date = datetime.now()
-        self.sftp = None
+        self.pool = None
         self.temp_dir = os.path.join(tempfile.gettempdir(), 'temp_rasters')
         os.makedirs(self.temp_dir, exist_ok=True)
         
@@ -48,7 +50,7 @@ class Command(BaseCommand):
         
         self.stdout.write("Connecting to SFTP server...")
         try:
-            self.sftp = self.connect_sftp()
+            self.pool = self.connect_sftp()
             
             # Try with current date first
             current_date_success = self.process_date(self.current_date)
@@ -66,24 +68,13 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR(f"Error: {str(e)}"))
             traceback.print_exc()
         finally:
-            if self.sftp:
-                self.sftp.close()
+            if self.pool:
+                self.pool.close()
             self.cleanup()
         
     def connect_sftp(self):
-        """Connect to SFTP server"""
-        try:
-            transport = paramiko.Transport((
-                config('SFTP_HOST'),
-                int(config('SFTP_PORT', default=22))
-            ))
-            transport.connect(
-                username=config('SFTP_USERNAME'),
-                password=config('SFTP_PASSWORD')
-            )
-            return paramiko.SFTPClient.from_transport(transport)
-        except Exception as e:
-            raise Exception(f"Failed to connect to SFTP server: {str(e)}")
+        """Open a pool of SFTP sessions"""
+        return SFTPPool().open()
     
     def process_date(self, date):
         """Process files for a specific date"""
@@ -92,10 +83,11 @@ class Command(BaseCommand):
         path_pattern = f"{sftp_base_path}/fp_impact_forecast/nwp_gfs-det/{date_str}/00/0000"
         
         try:
+            # One listing per directory answers every existence check below
+            manifest = RemoteManifest(self.pool)
+            
             # Check if the directory exists
-            try:
-                self.sftp.stat(path_pattern)
-            except IOError:
+            if not manifest.exists(path_pattern):
                 self.stdout.write(self.style.WARNING(f"Directory not found: {path_pattern}"))
                 return False
             
@@ -107,20 +99,20 @@ class Command(BaseCommand):
             flood_downloaded = False
             try:
                 # Check if flood hazard file exists
-                self.sftp.stat(flood_remote_path)
+                if not manifest.has(path_pattern, flood_hazard_file):
+                    raise FileNotFoundError(flood_remote_path)
                 
                 # Download the flood hazard file
                 self.stdout.write(f"Downloading {flood_hazard_file}...")
-                self.sftp.get(flood_remote_path, flood_local_path)
-                self.stdout.write(self.style.SUCCESS(f"Downloaded flood hazard map to {flood_local_path}"))
+                transfer = self.pool.download(flood_remote_path, flood_local_path)
+                self.stdout.write(self.style.SUCCESS(f"Downloaded flood hazard map to {flood_local_path} ({transfer.describe()})"))
                 flood_downloaded = True
                 
                 # Copy to MapServer directory with proper naming
                 flood_target = os.path.join(self.mapserver_raster_dir, f"flood_hazard_{date.strftime('%Y%m%d')}.tif")
                 flood_latest = os.path.join(self.mapserver_raster_dir, "flood_hazard_latest.tif")
                 
-                shutil.copy2(flood_local_path, flood_target)
-                self.stdout.write(self.style.SUCCESS(f"Copied flood hazard map to {flood_target}"))
+                self.publish(flood_local_path, flood_target, "flood hazard map")
                 
                 # Update latest symlink or copy if symlinks not supported
                 if os.path.exists(flood_latest) or os.path.islink(flood_latest):
@@ -140,15 +132,14 @@ class Command(BaseCommand):
             
             # Process group alert files
             hmc_path = f"{path_pattern}/HMC"
-            try:
-                self.sftp.stat(hmc_path)
-            except IOError:
+            if not manifest.exists(hmc_path):
                 self.stdout.write(self.style.WARNING(f"HMC directory not found: {hmc_path}"))
                 # Return True if at least the flood hazard file was processed
                 return flood_downloaded
             
-            # Process each group
+            # Collect the group alert files present, then fetch them concurrently
             alert_files_downloaded = []
+            downloads = []
             
             for group_name in self.groups:
                 group_dir = os.path.join(self.temp_dir, group_name)
@@ -159,22 +150,22 @@ class Command(BaseCommand):
                 group_remote_path = f"{hmc_path}/{group_file}"
                 group_local_path = os.path.join(group_dir, group_file)
                 
-                try:
-                    # Check if file exists
-                    try:
-                        self.sftp.stat(group_remote_path)
-                    except IOError:
-                        self.stdout.write(self.style.WARNING(f"{group_file} not found at {group_remote_path}"))
-                        continue
-                    
-                    # Download the group alert file
-                    self.stdout.write(f"Downloading {group_file}...")
-                    self.sftp.get(group_remote_path, group_local_path)
-                    self.stdout.write(self.style.SUCCESS(f"Downloaded {group_file} to {group_local_path}"))
-                    alert_files_downloaded.append(group_local_path)
-                    
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"Error processing {group_name}: {str(e)}"))
+                # Check if file exists
+                if not manifest.has(hmc_path, group_file):
+                    self.stdout.write(self.style.WARNING(f"{group_file} not found at {group_remote_path}"))
+                    continue
+                downloads.append((group_name, group_remote_path, group_local_path))
+            
+            if downloads:
+                self.stdout.write(f"Downloading {len(downloads)} group alert files...")
+                transfers, elapsed = self.pool.download_many((remote, local) for _, remote, local in downloads)
+                for (group_name, _, group_local_path), transfer in zip(downloads, transfers):
+                    if transfer.ok:
+                        self.stdout.write(self.style.SUCCESS(f"Downloaded {transfer.describe()} to {group_local_path}"))
+                        alert_files_downloaded.append(group_local_path)
+                    else:
+                        self.stdout.write(self.style.ERROR(f"Error processing {group_name}: {str(transfer.error)}"))
+                self.stdout.write(f"Transferred {summarize(transfers, elapsed)}")
             
             # Merge alert files if any were downloaded
             if alert_files_downloaded:
@@ -184,8 +175,7 @@ class Command(BaseCommand):
                     alerts_target = os.path.join(self.mapserver_raster_dir, f"alerts_{date.strftime('%Y%m%d')}.tif")
                     alerts_latest = os.path.join(self.mapserver_raster_dir, "alerts_latest.tif")
                     
-                    shutil.copy2(merged_alerts_file, alerts_target)
-                    self.stdout.write(self.style.SUCCESS(f"Copied merged alerts to {alerts_target}"))
+                    self.publish(merged_alerts_file, alerts_target, "merged alerts")
                     
                     # Update latest symlink
                     if os.path.exists(alerts_latest) or os.path.islink(alerts_latest):
@@ -208,43 +198,25 @@ class Command(BaseCommand):
             traceback.print_exc()
             return False
     
+    def publish(self, source_path, target_path, label):
+        """Write a raster to the MapServer directory as a tiled COG with overviews."""
+        if publish_raster(source_path, target_path):
+            self.stdout.write(self.style.SUCCESS(f"Published {label} as COG to {target_path}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"COG conversion failed, copied {label} unchanged to {target_path}"))
+    
     def merge_alert_files(self, alert_files, date):
-        """Merge alert files using GDAL"""
+        """Mosaic the group alert files into one regional raster, keeping the highest alert level"""
         if not alert_files:
             return None
         
         self.stdout.write(f"Merging {len(alert_files)} alert files...")
+        merged_file = os.path.join(self.temp_dir, f"merged_alerts_{date.strftime('%Y%m%d')}.tif")
         
         try:
-            # Import GDAL only when needed
-            try:
-                from osgeo import gdal
-                GDAL_AVAILABLE = True
-            except ImportError:
-                GDAL_AVAILABLE = False
-                self.stdout.write(self.style.WARNING("GDAL not available for merging. Trying alternative method."))
-            
-            merged_file = os.path.join(self.temp_dir, f"merged_alerts_{date.strftime('%Y%m%d')}.tif")
-            
-            if GDAL_AVAILABLE:
-                # Create VRT
-                vrt_file = os.path.join(self.temp_dir, f"merged_alerts_{date.strftime('%Y%m%d')}.vrt")
-                vrt_options = gdal.BuildVRTOptions(resampleAlg='nearest', separate=False)
-                vrt = gdal.BuildVRT(vrt_file, alert_files, options=vrt_options)
-                
-                # Create GeoTIFF from VRT
-                gdal.Translate(merged_file, vrt, options=gdal.TranslateOptions(
-                    format='GTiff',
-                    creationOptions=['COMPRESS=LZW']
-                ))
-                
-                self.stdout.write(self.style.SUCCESS(f"Successfully merged alert files to {merged_file}"))
-                return merged_file
-            else:
-                # Fallback - just use the first alert file
-                shutil.copy2(alert_files[0], merged_file)
-                self.stdout.write(self.style.WARNING(f"GDAL not available. Using first alert file as merged file: {merged_file}"))
-                return merged_file
+            mosaic(alert_files, merged_file, rule=config('ALERT_MOSAIC_RULE', default=DEFAULT_RULE))
+            self.stdout.write(self.style.SUCCESS(f"Successfully merged alert files to {merged_file}"))
+            return merged_file
                 
         except Exception as e:
             self.stderr.write(self.style.ERROR(f"Error merging alert files: {str(e)}"))
@@ -252,7 +224,6 @@ class Command(BaseCommand):
             
             # Fallback - just use the first alert file
             try:
-                merged_file = os.path.join(self.temp_dir, f"merged_alerts_{date.strftime('%Y%m%d')}.tif")
                 shutil.copy2(alert_files[0], merged_file)
                 self.stdout.write(self.style.WARNING(f"Using first alert file as merged file due to error: {merged_file}"))
                 return merged_file
@@ -1,18 +1,24 @@
-from django.core.management.base import BaseCommand
-import geopandas as gpd
-from Impact.models import SectorForecast, SectorData
-from datetime import datetime
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
+from Impact.models import SectorForecast
+from Impact.forecast_ingest import (
+    build_forecast_runs, bulk_insert_forecasts, copy_forecasts, explode_forecasts,
+    prune_forecast_runs, run_time_map, sector_id_map, store_forecast_runs, swap_forecasts,
+)
+from Impact.response_cache import FORECAST, bump_data_version
+from Impact.section_json import MERGED_GEOJSON, read_merged
 from django.db import transaction
 import logging
-from django.core.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
     help = 'Sync sector time series data from GeoJSON and upload to database'
 
-    GEOJSON_FILENAME = './temp_data/merged_data.geojson'
     BATCH_SIZE = 1000  # Number of records to process in each batch
 
     def add_arguments(self, parser):
@@ -21,104 +27,62 @@ class Command(BaseCommand):
             action='store_true',
             help='Keep existing forecast data instead of clearing it',
         )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Write forecasts with PostgreSQL COPY and a staging table instead of bulk_create',
+        )
+        parser.add_argument(
+            '--swap',
+            action='store_true',
+            help='Refresh forecasts by loading a shadow table and renaming it into place',
+        )
 
     def handle(self, *args, **kwargs):
+        if kwargs.get('swap') and kwargs.get('keep_existing'):
+            raise CommandError('--swap replaces the whole table and cannot be combined with --keep-existing')
+
         try:
-            self.process_time_series(self.GEOJSON_FILENAME, kwargs.get('keep_existing', False))
+            self.process_time_series(
+                os.path.join(settings.TIMESERIES_OUTPUT_DIR, MERGED_GEOJSON),
+                kwargs.get('keep_existing', False),
+                use_copy=kwargs.get('copy', False),
+                swap=kwargs.get('swap', False),
+            )
         except Exception as e:
             logger.error(f'Error processing time series: {str(e)}')
             self.stderr.write(self.style.ERROR(f'Error: {str(e)}'))
 
-    def validate_forecast_value(self, value):
-        try:
-            if value:
-                return float(value)
-            return None
-        except ValueError:
-            return None
-
-    @transaction.atomic
-    def process_time_series(self, geojson_path, keep_existing=False):
+    def process_time_series(self, geojson_path, keep_existing=False, use_copy=False, swap=False):
         logger.info(f"Loading sector data from {geojson_path}...")
         
         try:
-            gdf = gpd.read_file(geojson_path)
-            
-            if not keep_existing:
-                logger.info("Clearing existing forecast data...")
-                SectorForecast.objects.all().delete()
+            # Memory-maps the Arrow copy when merge_jsonFiles left one next to the GeoJSON
+            gdf = read_merged(geojson_path)
 
-            forecasts_to_create = []
-            
-            for _, row in gdf.iterrows():
-                section_code = row['SEC_CODE']
-                
-                try:
-                    sector = SectorData.objects.get(sec_code=section_code)
-                except SectorData.DoesNotExist:
-                    logger.warning(f"Sector with code {section_code} not found.")
-                    continue
-
-                # Extract and validate time series data
-                try:
-                    gfs_data = row['time_series_discharge_simulated-gfs'].split(',')
-                    icon_data = row['time_series_discharge_simulated-icon'].split(',')
-                    
-                    if isinstance(row['time_period'], str):
-                        time_periods = row['time_period'].split(',')
-                        date_parser = lambda x: self.make_aware(datetime.strptime(x.strip(), '%Y-%m-%d %H:%M'))
-                    elif hasattr(row['time_period'], '__iter__'):
-                        time_periods = row['time_period']
-                        date_parser = lambda x: self.make_aware(x)
-                    else:
-                        time_periods = [row['time_period']] * len(gfs_data)
-                        date_parser = lambda x: self.make_aware(x)
-
-                    for gfs_value, icon_value, time_period in zip(gfs_data, icon_data, time_periods):
-                        date = date_parser(time_period)
-                        
-                        # Validate and create GFS forecast
-                        gfs_val = self.validate_forecast_value(gfs_value)
-                        if gfs_val is not None:
-                            forecasts_to_create.append(
-                                SectorForecast(
-                                    sector=sector,
-                                    model_type='GFS',
-                                    time_point=date,
-                                    forecast_value=gfs_val
-                                )
-                            )
-
-                        # Validate and create ICON forecast
-                        icon_val = self.validate_forecast_value(icon_value)
-                        if icon_val is not None:
-                            forecasts_to_create.append(
-                                SectorForecast(
-                                    sector=sector,
-                                    model_type='ICON',
-                                    time_point=date,
-                                    forecast_value=icon_val
-                                )
-                            )
-
-                        # Bulk create when batch size is reached
-                        if len(forecasts_to_create) >= self.BATCH_SIZE:
-                            SectorForecast.objects.bulk_create(
-                                forecasts_to_create,
-                                ignore_conflicts=True
-                            )
-                            forecasts_to_create = []
-
-                except (KeyError, ValueError) as e:
-                    logger.error(f"Error processing row with section_code {section_code}: {str(e)}")
-                    continue
-
-            # Create any remaining forecasts
-            if forecasts_to_create:
-                SectorForecast.objects.bulk_create(
-                    forecasts_to_create,
-                    ignore_conflicts=True
-                )
+            # Resolve sectors and explode the series before opening the transaction
+            sector_ids = sector_id_map()
+            forecasts = explode_forecasts(gdf, sector_ids)
+            logger.info(f"Prepared {len(forecasts)} forecast values from {len(gdf)} sections.")
+
+            if swap:
+                # Readers keep the previous table until the loaded copy is renamed in
+                swap_forecasts(forecasts)
+            else:
+                self.write_forecasts(forecasts, keep_existing, use_copy)
+
+            # Packed one-row-per-run copy of the same series
+            runs = build_forecast_runs(forecasts, run_time_map(gdf, sector_ids))
+            store_forecast_runs(runs)
+            logger.info(f"Stored {len(runs)} packed forecast runs.")
+
+            # The runs are the forecast archive; trim it to the retention window
+            if settings.FORECAST_RETENTION_DAYS > 0:
+                cutoff = timezone.now() - timedelta(days=settings.FORECAST_RETENTION_DAYS)
+                pruned = prune_forecast_runs(cutoff)
+                logger.info(f"Pruned {pruned} forecast runs issued before {cutoff:%Y-%m-%d}.")
+
+            bump_data_version(FORECAST)
 
             logger.info("Time series data successfully pushed to SectorForecast model.")
             self.stdout.write(self.style.SUCCESS("Time series data pushed to SectorForecast model."))
@@ -127,8 +91,14 @@ class Command(BaseCommand):
             logger.error(f"Error processing time series data: {str(e)}")
             raise
 
-    def make_aware(self, naive_datetime):
-        """Make a naive datetime object timezone-aware."""
-        if timezone.is_naive(naive_datetime):
-            return timezone.make_aware(naive_datetime, timezone.get_default_timezone())
-        return naive_datetime
\ No newline at end of file
+    @transaction.atomic
+    def write_forecasts(self, forecasts, keep_existing=False, use_copy=False):
+        """Write forecasts into the live table, clearing it first unless keep_existing."""
+        if not keep_existing:
+            logger.info("Clearing existing forecast data...")
+            SectorForecast.objects.all().delete()
+
+        if use_copy:
+            copy_forecasts(forecasts)
+        else:
+            bulk_insert_forecasts(forecasts, batch_size=self.BATCH_SIZE)
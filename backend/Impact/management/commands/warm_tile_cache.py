@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from Impact.tiles import TILE_LAYERS, warm_tile_cache
+
+
+class Command(BaseCommand):
+    help = 'Pre-render low-zoom vector tiles into the tile cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-zoom',
+            type=int,
+            default=settings.TILE_CACHE_WARM_MAX_ZOOM,
+            help='Highest zoom level to pre-render; defaults to TILE_CACHE_WARM_MAX_ZOOM (-1 disables warm-up)',
+        )
+        parser.add_argument(
+            '--layer',
+            action='append',
+            choices=sorted(TILE_LAYERS),
+            help='Layer to pre-render (repeatable); defaults to all layers',
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['max_zoom'] < 0:
+            self.stdout.write(self.style.WARNING("Tile warm-up is disabled; pass --max-zoom or set TILE_CACHE_WARM_MAX_ZOOM"))
+            return
+        count = warm_tile_cache(kwargs['max_zoom'], layers=kwargs['layer'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Pre-rendered {count} tiles up to zoom {kwargs['max_zoom']}"
+        ))
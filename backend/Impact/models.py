@@ -1,16 +1,39 @@
 
 # from django.db import models
+from datetime import timezone as dt_timezone
+
+import numpy as np
 from django.contrib.gis.db import models 
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models as django_models
 
 # Create your models here.
+# Simplification tolerance (degrees) of each precomputed copy of ``geom``
+SIMPLIFIED_GEOMETRY_TOLERANCES = {
+    'geom_coarse': 0.05,
+    'geom_medium': 0.01,
+    'geom_fine': 0.002,
+}
+
+
+class SimplifiedGeometryModel(models.Model):
+    """Abstract base adding topology-preserving simplified copies of ``geom``, filled at ingest."""
+    geom_coarse = models.MultiPolygonField(srid=4326, null=True, blank=True, editable=False)
+    geom_medium = models.MultiPolygonField(srid=4326, null=True, blank=True, editable=False)
+    geom_fine = models.MultiPolygonField(srid=4326, null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
 # 1. Create a model named affected_population that has the following fields:
-class AffectedPopulation(models.Model):
+class AffectedPopulation(SimplifiedGeometryModel):
+    forecast_date = models.DateField()
     gid_0 = models.CharField(max_length=80)
     name_0 = models.CharField(max_length=80)
     name_1 = models.CharField(max_length=80)
     engtype_1 = models.CharField(max_length=80)
-    lack_cc = models.FloatField()
+    lack_cc = models.FloatField(null=True)
     cod = models.CharField(max_length=80)
     stock = models.FloatField()
     flood_tot = models.FloatField()
@@ -21,15 +44,19 @@ class AffectedPopulation(models.Model):
         return self.name_1
     
     class Meta:
+        # Read-only view over AdminUnit and ImpactValue, created by Impact.impact_store
+        managed = False
+        db_table = 'impact_population'
         verbose_name_plural = "AffectedPopulation"
 
 # 2. Create a model named impacted_gdp that has the following fields:
-class ImpactedGDP(models.Model):
+class ImpactedGDP(SimplifiedGeometryModel):
+    forecast_date = models.DateField()
     gid_0 = models.CharField(max_length=80)
     name_0 = models.CharField(max_length=80)
     name_1 = models.CharField(max_length=80)
     engtype_1 = models.CharField(max_length=80)
-    lack_cc = models.FloatField()
+    lack_cc = models.FloatField(null=True)
     cod = models.CharField(max_length=80)
     stock = models.FloatField()
     flood_tot = models.FloatField()
@@ -40,16 +67,20 @@ class ImpactedGDP(models.Model):
         return self.name_1
     
     class Meta:
+        # Read-only view over AdminUnit and ImpactValue, created by Impact.impact_store
+        managed = False
+        db_table = 'impact_gdp'
         verbose_name_plural = "ImpactedGDP"
 
 
 # 3. Create a model named affected_crops that has the following fields:
-class AffectedCrops(models.Model):
+class AffectedCrops(SimplifiedGeometryModel):
+    forecast_date = models.DateField()
     gid_0 = models.CharField(max_length=80)
     name_0 = models.CharField(max_length=80)
     name_1 = models.CharField(max_length=80)
     engtype_1 = models.CharField(max_length=80)
-    lack_cc = models.FloatField()
+    lack_cc = models.FloatField(null=True)
     cod = models.CharField(max_length=80)
     stock = models.FloatField()
     flood_tot = models.FloatField()
@@ -60,16 +91,20 @@ class AffectedCrops(models.Model):
         return self.name_1
     
     class Meta:
+        # Read-only view over AdminUnit and ImpactValue, created by Impact.impact_store
+        managed = False
+        db_table = 'impact_crops'
         verbose_name_plural = "AffectedCrops"
 
 
 # 4. Create a model named affected_roads that has the following fields:
-class AffectedRoads(models.Model):
+class AffectedRoads(SimplifiedGeometryModel):
+    forecast_date = models.DateField()
     gid_0 = models.CharField(max_length=80)
     name_0 = models.CharField(max_length=80)
     name_1 = models.CharField(max_length=80)
     engtype_1 = models.CharField(max_length=80)
-    lack_cc = models.FloatField()
+    lack_cc = models.FloatField(null=True)
     cod = models.CharField(max_length=80)
     stock = models.FloatField()
     flood_tot = models.FloatField()
@@ -80,16 +115,20 @@ class AffectedRoads(models.Model):
         return self.name_1
     
     class Meta:
+        # Read-only view over AdminUnit and ImpactValue, created by Impact.impact_store
+        managed = False
+        db_table = 'impact_roads'
         verbose_name_plural = "AffectedRoads"
 
 
 # 5. Create a model named displaced_population that has the following fields:
-class DisplacedPopulation(models.Model):
+class DisplacedPopulation(SimplifiedGeometryModel):
+    forecast_date = models.DateField()
     gid_0 = models.CharField(max_length=80)
     name_0 = models.CharField(max_length=80)
     name_1 = models.CharField(max_length=80)
     engtype_1 = models.CharField(max_length=80)
-    lack_cc = models.FloatField()
+    lack_cc = models.FloatField(null=True)
     cod = models.CharField(max_length=80)
     stock = models.FloatField()
     flood_tot = models.FloatField()
@@ -100,16 +139,20 @@ class DisplacedPopulation(models.Model):
         return self.name_1
     
     class Meta:
+        # Read-only view over AdminUnit and ImpactValue, created by Impact.impact_store
+        managed = False
+        db_table = 'impact_displaced'
         verbose_name_plural = "DisplacedPopulation"
 
 
 # 6. Create a model named affected_livestock that has the following fields:
-class AffectedLivestock(models.Model):
+class AffectedLivestock(SimplifiedGeometryModel):
+    forecast_date = models.DateField()
     gid_0 = models.CharField(max_length=80)
     name_0 = models.CharField(max_length=80)
     name_1 = models.CharField(max_length=80)
     engtype_1 = models.CharField(max_length=80)
-    lack_cc = models.FloatField()
+    lack_cc = models.FloatField(null=True)
     cod = models.CharField(max_length=80)
     stock = models.FloatField()
     flood_tot = models.FloatField()
@@ -120,16 +163,20 @@ class AffectedLivestock(models.Model):
         return self.name_1
     
     class Meta:
+        # Read-only view over AdminUnit and ImpactValue, created by Impact.impact_store
+        managed = False
+        db_table = 'impact_livestock'
         verbose_name_plural = "AffectedLivestock"
 
 
 # 7. Create a model named affected_grazingland that has the following fields:
-class AffectedGrazingLand(models.Model):
+class AffectedGrazingLand(SimplifiedGeometryModel):
+    forecast_date = models.DateField()
     gid_0 = models.CharField(max_length=80)
     name_0 = models.CharField(max_length=80)
     name_1 = models.CharField(max_length=80)
     engtype_1 = models.CharField(max_length=80)
-    lack_cc = models.FloatField()
+    lack_cc = models.FloatField(null=True)
     cod = models.CharField(max_length=80)
     stock = models.FloatField()
     flood_tot = models.FloatField()
@@ -140,6 +187,9 @@ class AffectedGrazingLand(models.Model):
         return self.name_1
     
     class Meta:
+        # Read-only view over AdminUnit and ImpactValue, created by Impact.impact_store
+        managed = False
+        db_table = 'impact_grazing'
         verbose_name_plural = "AffectedGrazingLand"
 
 
@@ -187,6 +237,60 @@ class SectorForecast(models.Model):
         return f"{self.sector.sec_name} - {self.model_type} - {self.time_point}"
     
 
+# 9b. compact per-run forecast series
+class SectorForecastRunQuerySet(models.QuerySet):
+    def series(self, sec_code, model_type, run_time=None):
+        """
+        Return ``(times, values)`` NumPy arrays for one sector/model run.
+
+        Uses the latest run unless ``run_time`` is given; returns ``None``
+        when no run is stored.
+        """
+        runs = self.filter(sector__sec_code=sec_code, model_type=model_type)
+        if run_time is not None:
+            runs = runs.filter(run_time=run_time)
+        run = runs.order_by('-run_time').first()
+        return run.as_arrays() if run else None
+
+
+class SectorForecastRun(models.Model):
+    """One forecast run of one model for one sector, with the series in a float8[] array."""
+    sector = models.ForeignKey(SectorData, on_delete=models.CASCADE)
+    model_type = models.CharField(max_length=10, choices=[('GFS', 'GFS'), ('ICON', 'ICON')])
+    run_time = models.DateTimeField()
+    start_time = models.DateTimeField()
+    step = models.DurationField()
+    values = ArrayField(models.FloatField(null=True))
+
+    objects = SectorForecastRunQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = "SectorForecastRuns"
+        constraints = [
+            models.UniqueConstraint(fields=['sector', 'model_type', 'run_time'], name='unique_sector_forecast_run'),
+        ]
+        indexes = [
+            # Runs arrive in issue order, so a BRIN index keeps range scans over the archive cheap
+            BrinIndex(fields=['run_time'], name='sectorforecastrun_issued_brin'),
+        ]
+
+    def __str__(self):
+        return f"{self.sector_id} - {self.model_type} - {self.run_time}"
+
+    def values_array(self):
+        """Return the series as a float64 array with NaN for missing steps."""
+        return np.array(self.values, dtype='float64')
+
+    def times_array(self):
+        """Return the UTC time of every step as a datetime64[s] array."""
+        start = np.datetime64(self.start_time.astimezone(dt_timezone.utc).replace(tzinfo=None), 's')
+        step = np.timedelta64(int(self.step.total_seconds()), 's')
+        return start + np.arange(len(self.values)) * step
+
+    def as_arrays(self):
+        return self.times_array(), self.values_array()
+
+
 
 # 10. create a model named waterbodies
 
@@ -252,7 +356,7 @@ class Admin1(models.Model):
     def __str__(self):
         return self.country  
 
-class WaterBodies(models.Model):
+class WaterBodies(SimplifiedGeometryModel):
     af_wtr_id = models.BigIntegerField()
     sqkm = models.FloatField()
     name_of_wa = models.CharField(max_length=254, blank=True, null=True)
@@ -265,4 +369,72 @@ class WaterBodies(models.Model):
         return self.name_of_wa or "Unnamed Water Body"
 
     class Meta:
-        verbose_name_plural = "WaterBodies"
\ No newline at end of file
+        verbose_name_plural = "WaterBodies"
+
+
+# 12. Version registry bumped by the ingest commands; drives cache keys and ETags
+class DataVersion(models.Model):
+    dataset = models.CharField(max_length=40, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.dataset} v{self.version}"
+
+    class Meta:
+        verbose_name_plural = "DataVersions"
+
+
+# 13. Normalized impact store: admin-1 units stored once, indicator values per forecast date
+IMPACT_INDICATORS = [
+    ('population', 'Affected population'),
+    ('gdp', 'Impacted GDP'),
+    ('crops', 'Affected crops'),
+    ('roads', 'Affected roads'),
+    ('displaced', 'Displaced population'),
+    ('livestock', 'Affected livestock'),
+    ('grazing', 'Affected grazing land'),
+]
+
+
+class AdminUnit(SimplifiedGeometryModel):
+    gid_0 = models.CharField(max_length=80)
+    name_0 = models.CharField(max_length=80)
+    name_1 = models.CharField(max_length=80)
+    engtype_1 = models.CharField(max_length=80)
+    cod = models.CharField(max_length=80)
+    geom = models.MultiPolygonField(srid=4326)
+
+    def __str__(self):
+        return f"{self.gid_0} - {self.name_1}"
+
+    class Meta:
+        verbose_name_plural = "AdminUnits"
+        constraints = [
+            models.UniqueConstraint(fields=['gid_0', 'name_1'], name='unique_admin_unit'),
+        ]
+
+
+class ImpactValue(models.Model):
+    """
+    One indicator value for one admin unit on one forecast date.
+
+    The table is range-partitioned by ``forecast_date``, which Django cannot
+    create, so it is unmanaged; ``Impact.impact_store`` owns the DDL.
+    """
+    id = models.BigAutoField(primary_key=True)
+    indicator = models.CharField(max_length=20, choices=IMPACT_INDICATORS)
+    forecast_date = models.DateField()
+    admin_unit = models.ForeignKey(AdminUnit, on_delete=models.DO_NOTHING, db_constraint=False)
+    lack_cc = models.FloatField(null=True)
+    stock = models.FloatField()
+    flood_tot = models.FloatField()
+    flood_perc = models.FloatField()
+
+    def __str__(self):
+        return f"{self.indicator} - {self.forecast_date} - {self.admin_unit_id}"
+
+    class Meta:
+        managed = False
+        db_table = 'Impact_impactvalue'
+        verbose_name_plural = "ImpactValues"
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class GeoJsonCursorPagination(CursorPagination):
+    """
+    Keyset pagination that keeps the GeoJSON FeatureCollection shape.
+
+    Pages are ordered by primary key so the cursor maps onto an index scan;
+    ``next``/``previous`` carry opaque cursors. The default page size covers
+    a whole layer of admin-1 units, so unpaginated clients keep working,
+    while ``page_size`` lets map clients fetch smaller pages.
+    """
+    ordering = 'id'
+    page_size = 500
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('type', 'FeatureCollection'),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('features', data['features']),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'type': {'type': 'string', 'example': 'FeatureCollection'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'features': schema.get('properties', {}).get('features', schema),
+            },
+        }
+
+
+class ImpactValueCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the impact values, most recently stored first.
+
+    The cursor position is the unique, insert-ordered ``id``; filter on
+    ``forecast_date`` (or ``issued=``) to select dates.
+    """
+    ordering = '-id'
+    page_size = 1000
+    page_size_query_param = 'page_size'
+    max_page_size = 5000
+
+
+class ForecastRunCursorPagination(CursorPagination):
+    """Keyset pagination over the archived forecast runs, most recently stored first, keyed on the unique ``id``."""
+    ordering = '-id'
+    page_size = 200
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
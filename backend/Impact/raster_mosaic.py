@@ -0,0 +1,236 @@
+"""
+Block-streaming raster mosaics.
+
+The output grid spans the union of the sources' extents at the finest of
+their resolutions. Every source is opened through a ``WarpedVRT`` aligned
+to that grid, so rasters with different extents, resolutions or
+orientation line up without being loaded whole. The output is produced in
+one pass, one internal block (256x256 by default) at a time: each
+source's overlapping window is read, combined into the block under a
+per-pixel priority rule (highest alert level by default) with vectorized
+masks, and the block is written before the next one starts. Peak memory
+is a few blocks, however large the mosaic. Zero means "no alert": it never
+wins over another source, but a pixel covered only by zeros stays 0 rather
+than becoming nodata.
+"""
+import logging
+import math
+import os
+from contextlib import ExitStack
+from dataclasses import dataclass
+
+import numpy as np
+import rasterio
+import rasterio.warp
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window, from_bounds as window_from_bounds, intersect, intersection
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 256
+
+# Which of several valid source pixels a mosaic pixel takes
+PRIORITY_RULES = ('max', 'min', 'first', 'last')
+DEFAULT_RULE = 'max'
+
+
+def dataset_bounds(dataset):
+    """``(left, bottom, right, top)`` of ``dataset`` with bottom below top, also for bottom-up rasters."""
+    left, bottom, right, top = dataset.bounds
+    return left, min(bottom, top), right, max(bottom, top)
+
+
+@dataclass
+class Grid:
+    """Pixel grid of a mosaic: CRS, north-up affine transform and size."""
+    crs: object
+    transform: object
+    width: int
+    height: int
+
+    @classmethod
+    def union(cls, datasets, crs=None):
+        """
+        Grid covering every dataset at the finest resolution among them.
+
+        ``crs`` defaults to the CRS of the first dataset; the others are
+        measured after reprojection to it. The origin is the union's
+        top-left corner, and the size is rounded up so no source pixel is cut.
+        """
+        crs = crs or datasets[0].crs
+        lefts, bottoms, rights, tops, xres, yres = [], [], [], [], [], []
+        for dataset in datasets:
+            left, bottom, right, top = dataset_bounds(dataset)
+            if dataset.crs == crs:
+                xsize, ysize = abs(dataset.transform.a), abs(dataset.transform.e)
+            else:
+                transform, _, _ = rasterio.warp.calculate_default_transform(
+                    dataset.crs, crs, dataset.width, dataset.height, left, bottom, right, top,
+                )
+                xsize, ysize = abs(transform.a), abs(transform.e)
+                left, bottom, right, top = rasterio.warp.transform_bounds(dataset.crs, crs, left, bottom, right, top)
+            lefts.append(left)
+            bottoms.append(bottom)
+            rights.append(right)
+            tops.append(top)
+            xres.append(xsize)
+            yres.append(ysize)
+
+        left, bottom, right, top = min(lefts), min(bottoms), max(rights), max(tops)
+        xsize, ysize = min(xres), min(yres)
+        # Tolerate floating-point noise before rounding up to whole pixels
+        width = math.ceil((right - left) / xsize - 1e-6)
+        height = math.ceil((top - bottom) / ysize - 1e-6)
+        return cls(crs, from_origin(left, top, xsize, ysize), width, height)
+
+    @property
+    def bounds(self):
+        left, top = self.transform * (0, 0)
+        right, bottom = self.transform * (self.width, self.height)
+        return left, bottom, right, top
+
+    def window(self, bounds):
+        """Window of this grid covering ``bounds``, clipped to the grid; None when disjoint."""
+        window = window_from_bounds(*bounds, transform=self.transform).round_offsets().round_lengths()
+        full = Window(0, 0, self.width, self.height)
+        if not intersect(window, full):
+            return None
+        return intersection(window, full)
+
+
+def _fill_value(dataset):
+    return dataset.nodata if dataset.nodata is not None else 0
+
+
+def _aligned(dataset, grid):
+    """``dataset`` warped onto ``grid`` with nearest-neighbour sampling."""
+    fill = _fill_value(dataset)
+    return WarpedVRT(
+        dataset,
+        crs=grid.crs,
+        transform=grid.transform,
+        width=grid.width,
+        height=grid.height,
+        resampling=Resampling.nearest,
+        src_nodata=dataset.nodata,
+        nodata=fill,
+    )
+
+
+def _valid(data, fill):
+    """Pixels carrying a value: neither the source fill value nor zero (no alert)."""
+    valid = data != 0
+    if fill != 0:
+        valid &= data != fill
+    if np.issubdtype(data.dtype, np.floating):
+        valid &= ~np.isnan(data)
+    return valid
+
+
+def _inside(data, nodata):
+    """Pixels inside a source's data, zeros included; all of them when it declares no nodata."""
+    inside = np.ones(data.shape, dtype=bool) if nodata is None else data != nodata
+    if np.issubdtype(data.dtype, np.floating):
+        inside &= ~np.isnan(data)
+    return inside
+
+
+def _take(rule, block, filled, data, valid):
+    """Mask of the pixels where ``data`` replaces ``block`` under ``rule``."""
+    if rule == 'last':
+        return valid
+    if rule == 'first':
+        return valid & ~filled
+    if rule == 'max':
+        return valid & (~filled | (data > block))
+    return valid & (~filled | (data < block))
+
+
+def mosaic(paths, dst_path, grid=None, rule=DEFAULT_RULE, block_size=BLOCK_SIZE, compress='lzw'):
+    """
+    Merge the rasters at ``paths`` into ``dst_path`` block by block.
+
+    The output uses ``grid`` (by default the union grid of the sources), a
+    dtype that holds every source's values, and the band count and nodata
+    of the first raster. Where several rasters carry a non-zero,
+    non-nodata value, ``rule`` picks the pixel: ``max`` or ``min`` value,
+    or the ``first`` or ``last`` raster in ``paths``. Pixels that sources
+    cover only with zeros are 0, and pixels no source covers are nodata.
+    The file is written next to the target and renamed into place.
+    Returns ``dst_path``.
+    """
+    if not paths:
+        raise ValueError("No rasters to merge")
+    if rule not in PRIORITY_RULES:
+        raise ValueError(f"Unknown priority rule {rule}; use one of {', '.join(PRIORITY_RULES)}")
+
+    with ExitStack() as stack:
+        datasets = [stack.enter_context(rasterio.open(path)) for path in paths]
+        first = datasets[0]
+        grid = grid or Grid.union(datasets)
+        fill = _fill_value(first)
+        dtype = np.result_type(*(dataset.dtypes[0] for dataset in datasets))
+
+        # Each source with the part of the output grid it covers; disjoint ones are dropped
+        sources = []
+        for dataset in datasets:
+            if dataset.count != first.count:
+                raise ValueError(f"{dataset.name} has {dataset.count} bands, expected {first.count}")
+            vrt = stack.enter_context(_aligned(dataset, grid))
+            # Compare on the output CRS so reprojected sources are located correctly
+            covered = grid.window(rasterio.warp.transform_bounds(dataset.crs, grid.crs, *dataset_bounds(dataset)))
+            if covered is None:
+                logger.warning(f"{dataset.name} does not overlap the mosaic, skipped")
+                continue
+            sources.append((vrt, covered, _fill_value(dataset), dataset.nodata))
+
+        profile = {
+            'driver': 'GTiff',
+            'count': first.count,
+            'dtype': dtype,
+            'nodata': first.nodata,
+            'crs': grid.crs,
+            'transform': grid.transform,
+            'width': grid.width,
+            'height': grid.height,
+            'tiled': True,
+            'blockxsize': block_size,
+            'blockysize': block_size,
+            'compress': compress,
+            'BIGTIFF': 'IF_SAFER',
+        }
+
+        partial = f"{dst_path}.part"
+        try:
+            with rasterio.open(partial, 'w', **profile) as dst:
+                for _, window in dst.block_windows(1):
+                    shape = (first.count, window.height, window.width)
+                    block = np.full(shape, fill, dtype=dtype)
+                    filled = np.zeros(shape, dtype=bool)
+                    inside = np.zeros(shape, dtype=bool)
+                    for vrt, covered, source_fill, source_nodata in sources:
+                        if not intersect(window, covered):
+                            continue
+                        # Read only the overlap and combine it at its offset inside the block
+                        overlap = intersection(window, covered)
+                        data = vrt.read(window=overlap)
+                        rows = slice(overlap.row_off - window.row_off, overlap.row_off - window.row_off + overlap.height)
+                        cols = slice(overlap.col_off - window.col_off, overlap.col_off - window.col_off + overlap.width)
+                        target, target_filled = block[:, rows, cols], filled[:, rows, cols]
+                        valid = _valid(data, source_fill)
+                        take = _take(rule, target, target_filled, data, valid)
+                        target[take] = data[take]
+                        target_filled |= valid
+                        inside[:, rows, cols] |= _inside(data, source_nodata)
+                    # Covered, but zero in every source that covers it
+                    block[inside & ~filled] = 0
+                    dst.write(block, window=window)
+            os.replace(partial, dst_path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    logger.info(f"Merged {len(paths)} rasters into {dst_path} ({grid.width}x{grid.height}, rule {rule})")
+    return dst_path
@@ -0,0 +1,43 @@
+import struct
+
+import numpy as np
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class HydrographFloat32Renderer(BaseRenderer):
+    """
+    Packed little-endian encoding of a hydrograph payload for the map popups.
+
+    Layout: ``float64`` start time (Unix seconds, UTC), ``uint32`` step count ``n``,
+    three ``float32`` discharge thresholds, then ``float32[n]`` hour offsets
+    from the start, ``float32[n]`` GFS and ``float32[n]`` ICON values, with NaN
+    for missing values. Every array starts on a 4-byte boundary so the client
+    can wrap it in a ``Float32Array`` without copying.
+    """
+    media_type = 'application/octet-stream'
+    format = 'f32'
+    charset = None
+    render_style = 'binary'
+
+    HEADER = struct.Struct('<dI3f')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None and response.status_code != 200:
+            # Errors stay readable
+            response['Content-Type'] = 'application/json'
+            return JSONRenderer().render(data)
+
+        times = np.array([t.rstrip('Z') for t in data['times']], dtype='datetime64[s]').astype('int64')
+        start = float(times[0]) if len(times) else 0.0
+        thresholds = [np.nan if t is None else t for t in data['thresholds']]
+
+        def packed(values):
+            return np.array([np.nan if v is None else v for v in values], dtype='<f4').tobytes()
+
+        return b''.join([
+            self.HEADER.pack(start, len(times), *thresholds),
+            ((times - start) / 3600.0).astype('<f4').tobytes(),
+            packed(data['gfs']),
+            packed(data['icon']),
+        ])
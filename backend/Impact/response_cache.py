@@ -0,0 +1,115 @@
+"""
+Data-version registry and versioned response/tile cache.
+
+Every dataset has a ``DataVersion`` row that the ingest commands bump after
+a successful load. The current ``(version, updated_at)`` pair is mirrored in
+the cache (for ``DATA_STATE_TIMEOUT`` seconds) so request handling can build
+cache keys, ETags and Last-Modified headers without querying the database. Cached entries embed
+the version, so a bump makes every older entry unreachable at once; stale
+entries then age out of Redis through its TTL and LRU eviction. Responses
+that embed rows of other datasets (forecasts carry their sector's fields)
+name them as ``related`` datasets, whose versions are part of the key and
+ETag too.
+
+The cache is an accelerator only: ``cache_get`` and ``cache_set`` log and
+swallow backend errors (Django's RedisCache raises when Redis is down), so
+requests fall back to the database instead of failing.
+"""
+import hashlib
+import logging
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db.models import F
+from django.utils import timezone
+
+from Impact.models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+# Datasets whose version is tracked separately
+IMPACT = 'impact'
+FORECAST = 'forecast'
+SECTORS = 'sectors'
+WATERBODIES = 'waterbodies'
+
+# Seconds the mirrored version state is trusted; bounds staleness after a failed cache write
+DATA_STATE_TIMEOUT = 60
+
+
+def cache_get(key, default=None):
+    """``cache.get`` that treats an unreachable cache as a miss."""
+    try:
+        return cache.get(key, default)
+    except Exception as e:
+        logger.warning(f"Cache read of {key} failed: {e}")
+        return default
+
+
+def cache_set(key, value, timeout=DEFAULT_TIMEOUT):
+    """``cache.set`` that skips storing when the cache is unreachable."""
+    try:
+        cache.set(key, value, timeout=timeout)
+    except Exception as e:
+        logger.warning(f"Cache write of {key} failed: {e}")
+
+
+def _state_key(dataset):
+    return f"data-version:{dataset}"
+
+
+def get_data_state(dataset):
+    """Return ``(version, updated_at)`` for ``dataset``, from the cache when possible."""
+    state = cache_get(_state_key(dataset))
+    if state is None:
+        row, _ = DataVersion.objects.get_or_create(
+            dataset=dataset, defaults={'version': 1, 'updated_at': timezone.now()},
+        )
+        state = (row.version, row.updated_at)
+        cache_set(_state_key(dataset), state, timeout=DATA_STATE_TIMEOUT)
+    return state
+
+
+def get_data_version(dataset):
+    """Return the current version number of ``dataset``."""
+    return get_data_state(dataset)[0]
+
+
+def bump_data_version(dataset):
+    """Record a data refresh of ``dataset``; invalidates its cached responses and ETags."""
+    now = timezone.now()
+    row, created = DataVersion.objects.get_or_create(
+        dataset=dataset, defaults={'version': 1, 'updated_at': now},
+    )
+    if not created:
+        DataVersion.objects.filter(pk=row.pk).update(version=F('version') + 1, updated_at=now)
+        row.refresh_from_db()
+    cache_set(_state_key(dataset), (row.version, row.updated_at), timeout=DATA_STATE_TIMEOUT)
+    return row.version
+
+
+def last_updated(dataset, related=()):
+    """Latest refresh time of ``dataset`` and its ``related`` datasets."""
+    return max(get_data_state(name)[1] for name in (dataset, *related))
+
+
+def _version_tag(dataset, related=()):
+    return '+'.join(f"{name}-{get_data_version(name)}" for name in (dataset, *related))
+
+
+def data_etag(dataset, variant='', related=()):
+    """ETag for a representation of ``dataset`` (and its ``related`` datasets) at the current versions."""
+    tag = _version_tag(dataset, related)
+    return f"{tag}-{variant}" if variant else tag
+
+
+def response_cache_key(dataset, request, related=()):
+    """Cache key for a GET response, varying on path, query string, renderer and data versions."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    fingerprint = f"{request.get_full_path()}|{getattr(renderer, 'format', '')}"
+    digest = hashlib.md5(fingerprint.encode('utf-8')).hexdigest()
+    return f"response:{_version_tag(dataset, related)}:{digest}"
+
+
+def tile_cache_key(dataset, layer, z, x, y, attributes):
+    return f"tile:{dataset}:{get_data_version(dataset)}:{layer}:{z}/{x}/{y}:{','.join(attributes)}"
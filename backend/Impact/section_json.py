@@ -0,0 +1,192 @@
+"""
+Parsing stage for the per-section forecast JSON files.
+
+Files are decoded in a process pool (serially inside daemonic workers such
+as Celery's prefork children, which may not fork), with ``orjson`` when it
+is installed. Results are yielded one file at a time so the join step can
+consume them without every parsed document being held at once. The GFS
+and ICON discharge series come out as float64 arrays with NaN for blanks;
+``format_series`` turns them back into the comma-joined text the GeoJSON
+consumers expect. The module stays free of Django imports so worker
+processes can load it on their own.
+
+Next to the merged GeoJSON an uncompressed Arrow IPC (Feather v2) copy is
+written with the series as typed list columns; the loaders memory-map it
+instead of re-parsing the text.
+"""
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Model type -> property holding its discharge series in the section files
+SERIES_COLUMNS = {
+    'GFS': 'time_series_discharge_simulated-gfs',
+    'ICON': 'time_series_discharge_simulated-icon',
+}
+SERIES_KEYS = list(SERIES_COLUMNS.values())
+TIME_KEY = 'time_period'
+
+logger = logging.getLogger(__name__)
+
+# Merged forecast file written by merge_jsonFiles into TIMESERIES_OUTPUT_DIR
+MERGED_GEOJSON = 'merged_data.geojson'
+ARROW_SUFFIX = '.arrow'
+
+
+def loads(data):
+    """Decode JSON from bytes or text with the fastest decoder available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_series(value):
+    """Return a discharge series (comma-joined text or list) as a float64 array."""
+    if value is None:
+        return np.array([], dtype='float64')
+    items = value.split(',') if isinstance(value, str) else list(value)
+    try:
+        return np.array(items, dtype='float64')
+    except (TypeError, ValueError):
+        # Blank or malformed steps become NaN
+        return pd.to_numeric(pd.Series(items, dtype='object').map(
+            lambda v: v.strip() if isinstance(v, str) else v
+        ), errors='coerce').to_numpy(dtype='float64')
+
+
+def format_series(values):
+    """
+    Comma-join a float series for text outputs; NaN steps are left empty.
+
+    A missing series (None, or the NaN a frame puts in a cell whose entry
+    lacked the key) stays None so it is written as null.
+    """
+    if isinstance(values, str) or values is None:
+        return values
+    if np.ndim(values) == 0 and pd.isna(values):
+        return None
+    return ','.join('' if np.isnan(v) else repr(float(v)) for v in np.asarray(values, dtype='float64'))
+
+
+def parse_file(path):
+    """
+    Parse one section file into ``(entries, skipped)``.
+
+    Entries are the dicts with a ``section_name``, series converted to
+    arrays; ``skipped`` counts list items that were not objects. Payloads
+    that were JSON-encoded twice are decoded again.
+    """
+    with open(path, 'rb') as f:
+        data = loads(f.read())
+    if isinstance(data, str):
+        data = loads(data)
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise ValueError(f"Invalid JSON format in {path}")
+
+    entries, skipped = [], 0
+    for entry in data:
+        if not isinstance(entry, dict):
+            skipped += 1
+            continue
+        if not entry.get('section_name'):
+            continue
+        for key in SERIES_KEYS:
+            if key in entry:
+                entry[key] = parse_series(entry[key])
+        entries.append(entry)
+    return entries, skipped
+
+
+def _parse_recorded(path):
+    try:
+        entries, skipped = parse_file(path)
+        return path, entries, skipped, None
+    except Exception as e:
+        return path, [], 0, f"{type(e).__name__}: {e}"
+
+
+def default_workers():
+    return min(4, os.cpu_count() or 1)
+
+
+def iter_parsed(paths, workers=None):
+    """
+    Yield ``(path, entries, skipped, error)`` for each file, in input order.
+
+    Uses ``workers`` processes when more than one is allowed and the caller
+    is not itself a daemonic process; ``error`` describes a file that could
+    not be parsed.
+    """
+    paths = list(paths)
+    workers = default_workers() if workers is None else workers
+    if workers <= 1 or len(paths) < 2 or multiprocessing.current_process().daemon:
+        for path in paths:
+            yield _parse_recorded(path)
+        return
+
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_parse_recorded, paths, chunksize=chunksize)
+
+
+def arrow_path(geojson_path):
+    """Path of the Arrow artifact that accompanies ``geojson_path``."""
+    return os.path.splitext(geojson_path)[0] + ARROW_SUFFIX
+
+
+def _split_times(value):
+    if isinstance(value, str):
+        return [t.strip() for t in value.split(',')]
+    return value
+
+
+def write_arrow(gdf, geojson_path):
+    """
+    Write the typed Arrow copy of the merged frame next to ``geojson_path``.
+
+    Series columns must still hold arrays; ``time_period`` becomes a list of
+    strings. The file is renamed into place so readers never see a partial
+    write. Returns the artifact path.
+    """
+    frame = gdf.copy()
+    if TIME_KEY in frame:
+        frame[TIME_KEY] = frame[TIME_KEY].map(_split_times)
+    path = arrow_path(geojson_path)
+    partial = f"{path}.part"
+    try:
+        frame.to_feather(partial, compression='uncompressed')
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return path
+
+
+def read_merged(geojson_path):
+    """
+    Load the merged forecast frame, preferring the memory-mapped Arrow copy.
+
+    The Arrow file is used when it is at least as new as the GeoJSON (or the
+    GeoJSON is absent); otherwise the GeoJSON is parsed, with a warning.
+    """
+    path = arrow_path(geojson_path)
+    if not os.path.exists(path):
+        logger.warning(f"No Arrow copy at {path}; parsing {geojson_path}")
+    elif not os.path.exists(geojson_path) or os.path.getmtime(path) >= os.path.getmtime(geojson_path):
+        return gpd.read_feather(path, memory_map=True)
+    else:
+        logger.warning(f"Arrow copy {path} is older than {geojson_path}; parsing the GeoJSON")
+    return gpd.read_file(geojson_path)
@@ -1,34 +1,50 @@
 from rest_framework_gis.serializers import GeoFeatureModelSerializer 
 from rest_framework import viewsets,serializers
 
-from .models import AffectedPopulation, ImpactedGDP, AffectedCrops, AffectedRoads, DisplacedPopulation, AffectedLivestock, AffectedGrazingLand, SectorData,SectorForecast,WaterBodies
+from .simplify import SERVED_GEOMETRY, SIMPLIFIED_GEOMETRY_FIELDS
+from .models import AffectedPopulation, ImpactedGDP, AffectedCrops, AffectedRoads, DisplacedPopulation, AffectedLivestock, AffectedGrazingLand, SectorData,SectorForecast,WaterBodies,AdminUnit,ImpactValue,SectorForecastRun
 
-class AffectedPopulationSerializer(GeoFeatureModelSerializer):
+class SimplifiedGeoFeatureSerializer(GeoFeatureModelSerializer):
+    """
+    Serialize a polygon layer with the geometry column chosen by the view.
+
+    The view passes ``geometry_field`` in the context when a simplified copy
+    of ``geom`` was requested, and its queryset then carries the geometry to
+    send as ``SERVED_GEOMETRY`` (already falling back to ``geom`` in SQL).
+    The copies are never emitted as properties.
+    """
+    def to_representation(self, instance):
+        if self.context.get('geometry_field'):
+            instance.geom = getattr(instance, SERVED_GEOMETRY)
+        return super().to_representation(instance)
+
+
+class AffectedPopulationSerializer(SimplifiedGeoFeatureSerializer):
     class Meta:
         model = AffectedPopulation
         geo_field = 'geom'
-        fields = '__all__'
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
 
 
-class ImpactedGDPSerializer(GeoFeatureModelSerializer):
+class ImpactedGDPSerializer(SimplifiedGeoFeatureSerializer):
     class Meta:
         model = ImpactedGDP
         geo_field = 'geom'
-        fields = '__all__'  
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
 
 
-class AffectedCropsSerializer(GeoFeatureModelSerializer):
+class AffectedCropsSerializer(SimplifiedGeoFeatureSerializer):
     class Meta:
         model = AffectedCrops
         geo_field = 'geom'
-        fields = '__all__'
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
 
 
-class AffectedRoadsSerializer(GeoFeatureModelSerializer):    
+class AffectedRoadsSerializer(SimplifiedGeoFeatureSerializer):    
     class Meta:
         model = AffectedRoads
         geo_field = 'geom'
-        fields = '__all__'
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
 
 class SectorDataSerializer(GeoFeatureModelSerializer):
     class Meta:
@@ -44,30 +60,72 @@ class SectorForecastSerializer(serializers.ModelSerializer):
         model = SectorForecast
         fields = ['id', 'sector', 'model_type', 'time_point', 'forecast_value']
 
-class DisplacedPopulationSerializer(GeoFeatureModelSerializer):
+class SectorForecastCompactSerializer(serializers.ModelSerializer):
+    sector_id = serializers.IntegerField(read_only=True)
+    sec_code = serializers.IntegerField(source='sector.sec_code', read_only=True)
+
+    class Meta:
+        model = SectorForecast
+        fields = ['id', 'sector_id', 'sec_code', 'model_type', 'time_point', 'forecast_value']
+
+
+class SectorMetadataSerializer(serializers.ModelSerializer):
+    # Side table for the compact forecast list; lat/lon stand in for the geometry
+    class Meta:
+        model = SectorData
+        exclude = ['geom']
+
+class DisplacedPopulationSerializer(SimplifiedGeoFeatureSerializer):
     class Meta:
         model = DisplacedPopulation
         geo_field = 'geom'
-        fields = '__all__'
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
 
 
-class AffectedLivestockSerializer(GeoFeatureModelSerializer):
+class AffectedLivestockSerializer(SimplifiedGeoFeatureSerializer):
     class Meta:
         model = AffectedLivestock
         geo_field = 'geom'
-        fields = '__all__'
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
 
 
-class AffectedGrazingLandSerializer(GeoFeatureModelSerializer):
+class AffectedGrazingLandSerializer(SimplifiedGeoFeatureSerializer):
     class Meta:
         model = AffectedGrazingLand
         geo_field = 'geom'
-        fields = '__all__'
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
 
 
-class WaterBodiesSerializer(GeoFeatureModelSerializer):
+class WaterBodiesSerializer(SimplifiedGeoFeatureSerializer):
     class Meta:
         model = WaterBodies
         geo_field = 'geom'
-        fields = '__all__'
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
+
+
+class AdminUnitSerializer(SimplifiedGeoFeatureSerializer):
+    class Meta:
+        model = AdminUnit
+        geo_field = 'geom'
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
 
+
+class ImpactValueSerializer(serializers.ModelSerializer):
+    # Admin unit names inline; the geometry is served once by the adminUnits endpoint
+    gid_0 = serializers.CharField(source='admin_unit.gid_0', read_only=True)
+    name_1 = serializers.CharField(source='admin_unit.name_1', read_only=True)
+
+    class Meta:
+        model = ImpactValue
+        fields = [
+            'id', 'indicator', 'forecast_date', 'admin_unit', 'gid_0', 'name_1',
+            'lack_cc', 'stock', 'flood_tot', 'flood_perc',
+        ]
+
+
+class SectorForecastRunSerializer(serializers.ModelSerializer):
+    sec_code = serializers.IntegerField(source='sector.sec_code', read_only=True)
+
+    class Meta:
+        model = SectorForecastRun
+        fields = ['id', 'sector', 'sec_code', 'model_type', 'run_time', 'start_time', 'step', 'values']
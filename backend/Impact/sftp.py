@@ -0,0 +1,294 @@
+"""
+Pooled, concurrent SFTP downloads shared by the sync commands.
+
+Each pooled session runs on its own SSH transport (TCP connection), so
+several files transfer in parallel instead of paying the link latency one
+file at a time. Transports use a larger flow-control window and ``get``
+keeps several read requests in flight per file.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import paramiko
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# SSH flow-control window and packet size of every pooled transport/channel
+WINDOW_SIZE = 16 * 1024 * 1024
+MAX_PACKET_SIZE = 32 * 1024
+# Outstanding read requests per file while prefetching
+PREFETCH_REQUESTS = 64
+KEEPALIVE_SECONDS = 30
+
+
+@dataclass
+class Transfer:
+    """Outcome of one download; ``error`` is set when it failed."""
+    remote_path: str
+    local_path: str
+    size: int = 0
+    seconds: float = 0.0
+    error: Exception = None
+    cached: bool = False
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def rate(self):
+        """Throughput in bytes per second."""
+        return self.size / self.seconds if self.seconds > 0 else 0.0
+
+    def describe(self):
+        if self.cached:
+            return f"{os.path.basename(self.remote_path)}: {self.size / 1e6:.2f} MB unchanged, reused cached copy"
+        return f"{os.path.basename(self.remote_path)}: {self.size / 1e6:.2f} MB in {self.seconds:.2f}s ({self.rate / 1e6:.2f} MB/s)"
+
+
+def summarize(transfers, elapsed):
+    """One-line aggregate throughput of a batch of transfers."""
+    done = [t for t in transfers if t.ok]
+    fetched = [t for t in done if not t.cached]
+    total = sum(t.size for t in fetched)
+    rate = total / elapsed if elapsed > 0 else 0.0
+    summary = (
+        f"{len(done)}/{len(transfers)} files, {total / 1e6:.2f} MB in {elapsed:.2f}s "
+        f"({rate / 1e6:.2f} MB/s)"
+    )
+    if len(fetched) < len(done):
+        summary += f", {len(done) - len(fetched)} reused from cache"
+    return summary
+
+
+class SFTPPool:
+    """
+    Up to ``size`` SFTP sessions opened on demand and reused across downloads.
+
+    Connection settings default to the ``SFTP_*`` environment variables; the
+    pool size to ``SFTP_POOL_SIZE``. Use as a context manager so every
+    transport is closed.
+    """
+
+    def __init__(self, host=None, port=None, username=None, password=None, size=None):
+        self.host = host or config('SFTP_HOST')
+        self.port = int(port or config('SFTP_PORT', default=22))
+        self.username = username or config('SFTP_USERNAME')
+        self.password = password or config('SFTP_PASSWORD')
+        self.size = max(1, int(size or config('SFTP_POOL_SIZE', default=4, cast=int)))
+        self._idle = []
+        self._sessions = []
+        # Guards both lists; notified whenever a session is returned or a slot frees up
+        self._available = threading.Condition()
+
+    def open(self):
+        """Connect the first session now to fail early on bad credentials or an unreachable host."""
+        self._release(self._acquire())
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _connect(self):
+        try:
+            transport = paramiko.Transport(
+                (self.host, self.port),
+                default_window_size=WINDOW_SIZE,
+                default_max_packet_size=MAX_PACKET_SIZE,
+            )
+            transport.connect(username=self.username, password=self.password)
+            transport.set_keepalive(KEEPALIVE_SECONDS)
+            return paramiko.SFTPClient.from_transport(
+                transport, window_size=WINDOW_SIZE, max_packet_size=MAX_PACKET_SIZE,
+            )
+        except Exception as e:
+            raise Exception(f"Failed to connect to SFTP server: {str(e)}")
+
+    def _acquire(self):
+        """Take an idle session, or claim a free slot and connect; waits while all are busy."""
+        with self._available:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if len(self._sessions) < self.size:
+                    # Reserve the slot before connecting outside the lock
+                    self._sessions.append(None)
+                    break
+                self._available.wait()
+        try:
+            sftp = self._connect()
+        except Exception:
+            with self._available:
+                if None in self._sessions:
+                    self._sessions.remove(None)
+                self._available.notify()
+            raise
+        with self._available:
+            if None in self._sessions:
+                self._sessions[self._sessions.index(None)] = sftp
+        return sftp
+
+    def _release(self, sftp):
+        with self._available:
+            self._idle.append(sftp)
+            self._available.notify()
+
+    def _discard(self, sftp):
+        """Drop a session whose transport died and wake a waiter to reconnect in its slot."""
+        with self._available:
+            if sftp in self._sessions:
+                self._sessions.remove(sftp)
+            self._available.notify()
+        try:
+            sftp.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def session(self):
+        """Borrow one ``paramiko.SFTPClient`` from the pool."""
+        sftp = self._acquire()
+        try:
+            yield sftp
+        except Exception:
+            # Missing files and the like leave the session usable; a dead transport does not
+            channel = sftp.get_channel()
+            if channel is None or not channel.get_transport().is_active():
+                self._discard(sftp)
+                sftp = None
+            raise
+        finally:
+            if sftp is not None:
+                self._release(sftp)
+
+    def close(self):
+        with self._available:
+            sessions, self._sessions = [sftp for sftp in self._sessions if sftp is not None], []
+            self._idle = []
+            self._available.notify_all()
+        for sftp in sessions:
+            try:
+                channel = sftp.get_channel()
+                sftp.close()
+                if channel is not None:
+                    channel.get_transport().close()
+            except Exception:
+                pass
+
+    def stat(self, remote_path):
+        with self.session() as sftp:
+            return sftp.stat(remote_path)
+
+    def exists(self, remote_path):
+        try:
+            self.stat(remote_path)
+            return True
+        except IOError:
+            return False
+
+    def listdir(self, remote_path):
+        with self.session() as sftp:
+            return sftp.listdir(remote_path)
+
+    def download(self, remote_path, local_path):
+        """
+        Fetch one file with pipelined reads and return its ``Transfer``.
+
+        The file is written next to ``local_path`` and renamed into place, so
+        a failed transfer never leaves a truncated file behind. Errors are
+        raised, not recorded.
+        """
+        partial = f"{local_path}.part"
+        start = time.monotonic()
+        try:
+            with self.session() as sftp:
+                sftp.get(
+                    remote_path, partial, prefetch=True,
+                    max_concurrent_prefetch_requests=PREFETCH_REQUESTS,
+                )
+            os.replace(partial, local_path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        transfer = Transfer(remote_path, local_path, os.path.getsize(local_path), time.monotonic() - start)
+        logger.info(f"Downloaded {transfer.describe()}")
+        return transfer
+
+    def _download_recorded(self, remote_path, local_path, cache=None):
+        try:
+            if cache is not None:
+                return cache.fetch(self, remote_path, local_path)
+            return self.download(remote_path, local_path)
+        except Exception as e:
+            return Transfer(remote_path, local_path, error=e)
+
+    def download_many(self, pairs, cache=None):
+        """
+        Download ``(remote_path, local_path)`` pairs concurrently over the pool.
+
+        Returns one ``Transfer`` per pair, in input order, with failures
+        recorded in ``error`` rather than raised, plus the wall-clock time.
+        With a ``DownloadCache``, unchanged files are copied from it instead.
+        """
+        pairs = list(pairs)
+        start = time.monotonic()
+        if not pairs:
+            return [], 0.0
+        with ThreadPoolExecutor(max_workers=min(self.size, len(pairs))) as executor:
+            transfers = list(executor.map(lambda pair: self._download_recorded(*pair, cache=cache), pairs))
+        elapsed = time.monotonic() - start
+        logger.info(f"SFTP batch: {summarize(transfers, elapsed)}")
+        return transfers, elapsed
+
+
+class RemoteManifest:
+    """
+    Index of remote directories, each listed once with ``listdir_attr``.
+
+    Lookups are answered from the listing, so checking which files exist
+    costs one round trip per directory instead of one per file.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._listings = {}
+
+    def listing(self, directory):
+        """``name -> SFTPAttributes`` of ``directory``, or None when it does not exist."""
+        if directory not in self._listings:
+            try:
+                with self.pool.session() as sftp:
+                    entries = sftp.listdir_attr(directory)
+                self._listings[directory] = {entry.filename: entry for entry in entries}
+            except IOError:
+                self._listings[directory] = None
+        return self._listings[directory]
+
+    def exists(self, directory):
+        return self.listing(directory) is not None
+
+    def attrs(self, directory, name):
+        return (self.listing(directory) or {}).get(name)
+
+    def has(self, directory, name, nonempty=True):
+        attrs = self.attrs(directory, name)
+        return attrs is not None and (not nonempty or attrs.st_size > 0)
+
+    def first_complete(self, candidates, required):
+        """
+        Return the first ``(directory, base_name)`` candidate with every
+        ``required`` extension present and non-empty, or None.
+        """
+        for directory, base_name in candidates:
+            if all(self.has(directory, f"{base_name}{ext}") for ext in required):
+                return directory, base_name
+        return None
@@ -0,0 +1,74 @@
+"""
+Precomputed, zoom-dependent simplified geometries for the polygon layers.
+
+Each polygon layer stores topology-preserving simplified copies of ``geom``
+(see ``SIMPLIFIED_GEOMETRY_TOLERANCES``) that are refreshed once after every
+load, so API requests only pick a column instead of simplifying per request.
+"""
+from django.contrib.gis.db.models import MultiPolygonField
+from django.db.models import F, Func, Value
+
+from Impact.models import SIMPLIFIED_GEOMETRY_TOLERANCES
+
+SIMPLIFIED_GEOMETRY_FIELDS = list(SIMPLIFIED_GEOMETRY_TOLERANCES)
+
+# Annotation carrying the geometry a simplified response sends
+SERVED_GEOMETRY = 'served_geom'
+
+# Highest zoom level each simplified column is used for; beyond that, full geometry
+ZOOM_GEOMETRY_FIELDS = [
+    (5, 'geom_coarse'),
+    (8, 'geom_medium'),
+    (11, 'geom_fine'),
+]
+
+# Values accepted by ``?simplify=``
+SIMPLIFY_LEVELS = {
+    'coarse': 'geom_coarse',
+    'medium': 'geom_medium',
+    'fine': 'geom_fine',
+    'none': None,
+}
+
+
+class SimplifyPreserveTopology(Func):
+    function = 'ST_SimplifyPreserveTopology'
+
+
+class Multi(Func):
+    function = 'ST_Multi'
+
+
+def geometry_field_for_zoom(zoom):
+    """Return the geometry column to serve at ``zoom``, or None for full resolution."""
+    for max_zoom, field in ZOOM_GEOMETRY_FIELDS:
+        if zoom <= max_zoom:
+            return field
+    return None
+
+
+def geometry_field_from_params(params):
+    """
+    Resolve ``simplify=`` or ``zoom=`` query parameters to a geometry column.
+
+    ``simplify`` wins over ``zoom``; unknown or malformed values fall back to
+    full resolution.
+    """
+    level = params.get('simplify')
+    if level:
+        return SIMPLIFY_LEVELS.get(level.lower())
+    try:
+        return geometry_field_for_zoom(int(params['zoom']))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def refresh_simplified_geometries(model):
+    """Recompute every simplified geometry column of ``model`` in one UPDATE."""
+    return model.objects.update(**{
+        field: Multi(
+            SimplifyPreserveTopology(F('geom'), Value(tolerance)),
+            output_field=MultiPolygonField(srid=4326),
+        )
+        for field, tolerance in SIMPLIFIED_GEOMETRY_TOLERANCES.items()
+    })
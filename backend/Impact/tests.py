@@ -1,3 +1,571 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
 
-# Create your tests here.
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio
+import shapely
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rasterio.transform import Affine, from_origin
+
+from Impact.download_cache import DownloadCache
+from Impact.forecast_bundle import build_bundle
+from Impact.forecast_ingest import build_forecast_runs, explode_forecasts, run_time_map, sector_id_map
+from Impact.impact_store import store_admin_units
+from Impact.management.commands.merge_jsonFiles import Command as MergeJsonCommand
+from Impact.models import AdminUnit, SectorData, SectorForecast, SectorForecastRun
+from Impact.raster_mosaic import Grid, mosaic
+from Impact.response_cache import FORECAST, SECTORS, bump_data_version, get_data_state
+from Impact.section_json import SERIES_COLUMNS, format_series, parse_series
+from Impact.sftp import SFTPPool
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SectorForecastQueryCountTests(TestCase):
+    """Pin the number of SQL statements per forecast list request."""
+
+    def setUp(self):
+        cache.clear()
+        # Load the data-version registry into the cache, as a running server has
+        get_data_state(FORECAST)
+        get_data_state(SECTORS)
+
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        for code in range(1, 4):
+            sector = SectorData.objects.create(
+                sec_code=code, sec_name=f'Section {code}', basin='Nile', domain='IGAD',
+                admin_b_l1='Kenya', sec_rs='RS', area=10.0, lat=0.5, lon=36.0,
+                q_thr1=1.0, q_thr2=2.0, q_thr3=3.0, geom=Point(36.0, 0.5, srid=4326),
+            )
+            SectorForecast.objects.bulk_create([
+                SectorForecast(
+                    sector=sector, model_type=model_type,
+                    time_point=start + timedelta(hours=3 * step), forecast_value=float(step),
+                )
+                for model_type in ('GFS', 'ICON')
+                for step in range(4)
+            ])
+
+    def test_list_joins_sectors_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('SectorForecast-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 24)
+
+    def test_compact_list_serves_sectors_once(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('SectorForecast-list'), {'compact': 'true'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['forecasts']), 24)
+        self.assertEqual(len(data['sectors']), 3)
+        self.assertEqual(set(data['forecasts'][0]), {
+            'id', 'sector_id', 'sec_code', 'model_type', 'time_point', 'forecast_value',
+        })
+        self.assertNotIn('geom', data['sectors'][0])
+
+    def test_cached_list_skips_database(self):
+        self.client.get(reverse('SectorForecast-list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('SectorForecast-list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get_returns_not_modified(self):
+        response = self.client.get(reverse('SectorForecast-list'))
+        etag = response['ETag']
+        self.assertEqual(response['X-Data-Version'], str(get_data_state(FORECAST)[0]))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('SectorForecast-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_bump_changes_etag(self):
+        etag = self.client.get(reverse('SectorForecast-list'))['ETag']
+        bump_data_version(FORECAST)
+        response = self.client.get(reverse('SectorForecast-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class UnreachableCache(LocMemCache):
+    """Cache backend failing like RedisCache does when Redis is down."""
+
+    def get(self, *args, **kwargs):
+        raise ConnectionError('cache is down')
+
+    def set(self, *args, **kwargs):
+        raise ConnectionError('cache is down')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'Impact.tests.UnreachableCache'}})
+class CacheOutageTests(TestCase):
+    """Read endpoints keep answering from the database when the cache is down."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SectorData.objects.create(
+            sec_code=7, sec_name='Section 7', basin='Nile', domain='IGAD',
+            admin_b_l1='Kenya', sec_rs='RS', area=10.0, lat=0.5, lon=36.0,
+            q_thr1=1.0, q_thr2=2.0, q_thr3=3.0, geom=Point(36.0, 0.5, srid=4326),
+        )
+
+    def test_list_is_served_without_cache(self):
+        response = self.client.get(reverse('SectorForecast-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+
+    def test_bump_survives_cache_outage(self):
+        version = get_data_state(FORECAST)[0]
+        self.assertEqual(bump_data_version(FORECAST), version + 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ForecastArchiveTests(TestCase):
+    """Select archived runs by issue time."""
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sector = SectorData.objects.create(
+            sec_code=7, sec_name='Section 7', basin='Nile', domain='IGAD',
+            admin_b_l1='Kenya', sec_rs='RS', area=10.0, lat=0.5, lon=36.0,
+            q_thr1=1.0, q_thr2=2.0, q_thr3=3.0, geom=Point(36.0, 0.5, srid=4326),
+        )
+        cls.issued = timezone.make_aware(datetime(2024, 5, 1))
+        for days, value in ((0, 1.0), (1, 2.0), (2, 3.0)):
+            run_time = cls.issued + timedelta(days=days)
+            SectorForecastRun.objects.create(
+                sector=cls.sector, model_type='GFS', run_time=run_time,
+                start_time=run_time, step=timedelta(hours=3), values=[value, value],
+            )
+
+    def test_issued_selects_one_day(self):
+        response = self.client.get(reverse('forecastRuns-list'), {'issued': '2024-05-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([run['values'] for run in response.json()['results']], [[2.0, 2.0]])
+
+    def test_range_is_inclusive(self):
+        response = self.client.get(reverse('forecastRuns-list'), {'from': '2024-05-02', 'to': '2024-05-03'})
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_hydrograph_uses_archived_run(self):
+        url = reverse('sectors-hydrograph', kwargs={'sec_code': 7})
+        self.assertEqual(self.client.get(url).json()['gfs'], [3.0, 3.0])
+        self.assertEqual(self.client.get(url, {'issued': '2024-05-01'}).json()['gfs'], [1.0, 1.0])
+
+    def test_sector_edit_refreshes_hydrograph(self):
+        url = reverse('sectors-hydrograph', kwargs={'sec_code': 7})
+        etag = self.client.get(url)['ETag']
+        SectorData.objects.filter(pk=self.sector.pk).update(q_thr3=30.0)
+        bump_data_version(SECTORS)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['thresholds'], [1.0, 2.0, 30.0])
+
+    def test_invalid_issued_is_rejected(self):
+        response = self.client.get(reverse('forecastRuns-list'), {'issued': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ForecastIngestTests(TestCase):
+    """Reshape merged forecast frames into long-format rows."""
+
+    TIMES = '2024-05-01 00:00,2024-05-01 03:00,2024-05-01 06:00,2024-05-01 09:00'
+
+    def frame(self, gfs, icon, sec_code=7, **columns):
+        return pd.DataFrame({
+            'SEC_CODE': [sec_code],
+            'time_period': [self.TIMES],
+            'time_series_discharge_simulated-gfs': [gfs],
+            'time_series_discharge_simulated-icon': [icon],
+            **{name: [value] for name, value in columns.items()},
+        })
+
+    def series(self, frame, model_type):
+        rows = frame[frame['model_type'] == model_type].sort_values('time_point')
+        return [(t.hour, v) for t, v in zip(rows['time_point'], rows['forecast_value'])]
+
+    def test_gap_keeps_later_values_on_their_time(self):
+        frame = explode_forecasts(self.frame(np.array([1.0, np.nan, 3.0, 4.0]), '5,,7,8'), {7: 70})
+        self.assertEqual(self.series(frame, 'GFS'), [(0, 1.0), (6, 3.0), (9, 4.0)])
+        self.assertEqual(self.series(frame, 'ICON'), [(0, 5.0), (6, 7.0), (9, 8.0)])
+
+    def test_sector_id_map_keys_ids_by_code(self):
+        sector = SectorData.objects.create(
+            sec_code=7, sec_name='Section 7', basin='Nile', domain='IGAD',
+            admin_b_l1='Kenya', sec_rs='RS', area=10.0, lat=0.5, lon=36.0,
+            q_thr1=1.0, q_thr2=2.0, q_thr3=3.0, geom=Point(36.0, 0.5, srid=4326),
+        )
+        self.assertEqual(sector_id_map(), {7: sector.id})
+
+    def test_unknown_codes_are_dropped(self):
+        gdf = pd.concat([self.frame('1,2,3,4', '5,6,7,8'), self.frame('1,2,3,4', '5,6,7,8', sec_code=9)])
+        with self.assertLogs('Impact.forecast_ingest', 'WARNING') as logs:
+            frame = explode_forecasts(gdf.reset_index(drop=True), {7: 70})
+        self.assertEqual(set(frame['sector_id']), {70})
+        self.assertEqual(len(frame), 8)
+        self.assertIn('9', logs.output[0])
+
+    def test_series_are_cut_to_the_time_axis(self):
+        frame = explode_forecasts(self.frame('1,2,3,4,5', '5,6,7'), {7: 70})
+        self.assertEqual(self.series(frame, 'GFS'), [(0, 1.0), (3, 2.0), (6, 3.0)])
+        self.assertEqual(self.series(frame, 'ICON'), [(0, 5.0), (3, 6.0), (6, 7.0)])
+
+    def test_runs_pack_gaps_as_null(self):
+        frame = explode_forecasts(self.frame('1,,3,4', '5,6,7,8'), {7: 70})
+        runs = {run.model_type: run for run in build_forecast_runs(frame, pd.Series(dtype=object))}
+        self.assertEqual(runs['GFS'].values, [1.0, None, 3.0, 4.0])
+        self.assertEqual(runs['ICON'].values, [5.0, 6.0, 7.0, 8.0])
+        self.assertEqual(runs['GFS'].step, timedelta(hours=3))
+        # Without a run time the run is keyed on the start of its series
+        self.assertEqual(runs['GFS'].start_time, timezone.make_aware(datetime(2024, 5, 1)))
+        self.assertEqual(runs['GFS'].run_time, runs['GFS'].start_time)
+
+    def test_run_time_map_uses_sector_ids(self):
+        gdf = self.frame('1,2,3,4', '5,6,7,8', time_run='2024-04-30 12:00')
+        run_times = run_time_map(gdf, {7: 70})
+        self.assertEqual(list(run_times.index), [70])
+        runs = build_forecast_runs(explode_forecasts(gdf, {7: 70}), run_times)
+        self.assertEqual({run.run_time for run in runs}, {timezone.make_aware(datetime(2024, 4, 30, 12))})
+
+
+class RasterMosaicTests(SimpleTestCase):
+    """Merge alert rasters onto their union grid."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def raster(self, name, data, transform, nodata=None):
+        path = os.path.join(self.directory.name, name)
+        data = np.asarray(data, dtype='uint8')
+        with rasterio.open(
+            path, 'w', driver='GTiff', width=data.shape[1], height=data.shape[0], count=1,
+            dtype='uint8', crs='EPSG:4326', transform=transform, nodata=nodata,
+        ) as dst:
+            dst.write(data, 1)
+        return path
+
+    def merge(self, *paths, **options):
+        path = mosaic(list(paths), os.path.join(self.directory.name, 'mosaic.tif'), block_size=16, **options)
+        with rasterio.open(path) as merged:
+            return merged.bounds, merged.read(1), merged.nodata
+
+    def test_offset_rasters_span_their_union(self):
+        west = self.raster('west.tif', np.full((2, 2), 1), from_origin(0, 2, 1, 1))
+        east = self.raster('east.tif', [[3, 3], [2, 0]], from_origin(1, 3, 1, 1))
+        with rasterio.open(west) as w, rasterio.open(east) as e:
+            self.assertEqual(Grid.union([w, e]).bounds, (0.0, 0.0, 3.0, 3.0))
+        bounds, data, _ = self.merge(west, east)
+        self.assertEqual(tuple(bounds), (0.0, 0.0, 3.0, 3.0))
+        # The higher alert wins where they overlap, and zero never overrides an alert
+        np.testing.assert_array_equal(data, [[0, 3, 3], [1, 2, 0], [1, 1, 0]])
+
+    def test_bottom_up_source_is_flipped(self):
+        north_up = self.raster('north_up.tif', [[1, 0], [0, 0]], from_origin(0, 2, 1, 1))
+        # First row is the southern one
+        bottom_up = self.raster('bottom_up.tif', [[0, 0], [0, 2]], Affine(1, 0, 0, 0, 1, 0))
+        bounds, data, _ = self.merge(north_up, bottom_up)
+        self.assertEqual(tuple(bounds), (0.0, 0.0, 2.0, 2.0))
+        np.testing.assert_array_equal(data, [[1, 2], [0, 0]])
+
+    def test_nonzero_nodata_is_not_a_value(self):
+        alerts = self.raster('alerts.tif', [[255, 2], [0, 255]], from_origin(0, 2, 1, 1), nodata=255)
+        other = self.raster('other.tif', [[1, 255, 255]], from_origin(0, 3, 1, 1), nodata=255)
+        _, data, nodata = self.merge(alerts, other)
+        self.assertEqual(nodata, 255)
+        # Pixels covered only by zeros are 0, pixels nobody covers stay nodata
+        np.testing.assert_array_equal(data, [[1, 255, 255], [255, 2, 255], [0, 255, 255]])
+
+
+class SectionJoinTests(SimpleTestCase):
+    """Join parsed section files onto the section shapefile."""
+
+    def sections(self):
+        return gpd.GeoDataFrame(
+            {'SEC_NAME': ['A', 'B'], 'SEC_CODE': [1, 2]},
+            geometry=gpd.points_from_xy([36.0, 37.0], [0.5, 1.0]), crs='EPSG:4326',
+        )
+
+    def join(self, *batches):
+        return MergeJsonCommand().join_sections(iter(batches), self.sections(), date(2024, 5, 1), False)
+
+    def test_missing_series_is_written_as_null(self):
+        gfs, icon = SERIES_COLUMNS['GFS'], SERIES_COLUMNS['ICON']
+        merged = self.join(
+            [{'section_name': 'A', gfs: parse_series('1,2'), icon: parse_series('3,')}],
+            [{'section_name': 'B', gfs: parse_series('5,6')}],
+        )
+        self.assertEqual(merged[gfs].map(format_series).tolist(), ['1.0,2.0', '5.0,6.0'])
+        self.assertEqual(merged[icon].map(format_series).tolist(), ['3.0,', None])
+
+    def test_shapefile_columns_win_and_unknown_sections_are_dropped(self):
+        merged = self.join([{'section_name': 'A', 'SEC_CODE': 99}], [{'section_name': 'Z'}])
+        self.assertEqual(merged[['section_name', 'SEC_CODE']].values.tolist(), [['A', 1]])
+
+
+class ForecastBundleTests(SimpleTestCase):
+    """Slim bundle served to the map client."""
+
+    def test_missing_series_is_null(self):
+        gfs, icon = SERIES_COLUMNS['GFS'], SERIES_COLUMNS['ICON']
+        frame = pd.DataFrame([
+            {'SEC_NAME': 'A', gfs: parse_series('1.234,2'), icon: parse_series('3,')},
+            {'SEC_NAME': 'B', gfs: parse_series('5,6')},
+        ])
+        gdf = gpd.GeoDataFrame(frame, geometry=gpd.points_from_xy([36.123456, 37.0], [0.5, 1.0]), crs='EPSG:4326')
+        features = json.loads(build_bundle(gdf))['features']
+        self.assertEqual([f['properties'][gfs] for f in features], ['1.23,2.0', '5.0,6.0'])
+        self.assertEqual([f['properties'][icon] for f in features], ['3.0,', None])
+        self.assertEqual(features[0]['geometry']['coordinates'], [36.12346, 0.5])
+
+
+class ImpactStoreTests(TestCase):
+    """Admin units shared by the impact layers."""
+
+    def layer(self, name_0, size=1.0):
+        square = shapely.MultiPolygon([shapely.box(36.0, 0.0, 36.0 + size, size)])
+        return pd.DataFrame([{
+            'gid_0': 'KEN', 'name_0': name_0, 'name_1': 'Nairobi', 'engtype_1': 'County', 'cod': 'KE047',
+            'geom': shapely.to_wkb(shapely.set_srid(square, 4326), hex=True, include_srid=True),
+        }])
+
+    def test_units_are_stored_once_and_the_first_layer_wins(self):
+        self.assertEqual(store_admin_units([self.layer('Kenya'), self.layer('Kenia', size=2.0)]), 1)
+        unit = AdminUnit.objects.get()
+        self.assertEqual(unit.name_0, 'Kenya')
+        self.assertEqual(unit.geom.extent, (36.0, 0.0, 37.0, 1.0))
+        self.assertIsNotNone(unit.geom_fine)
+
+    def test_unchanged_units_are_not_rewritten(self):
+        store_admin_units([self.layer('Kenya')])
+        self.assertEqual(store_admin_units([self.layer('Kenya')]), 0)
+        self.assertEqual(store_admin_units([self.layer('Kenia')]), 1)
+        self.assertEqual(AdminUnit.objects.get().name_0, 'Kenia')
+
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+    def close(self):
+        self.active = False
+
+
+class FakeChannel:
+    def __init__(self, transport):
+        self.transport = transport
+
+    def get_transport(self):
+        return self.transport
+
+
+class FakeSFTPClient:
+    """Stands in for ``paramiko.SFTPClient``, serving files from a local directory."""
+
+    def __init__(self, root):
+        self.root = root
+        self.transport = FakeTransport()
+        self.closed = False
+        self.gets = []
+
+    def get_channel(self):
+        return FakeChannel(self.transport)
+
+    def close(self):
+        self.closed = True
+
+    def stat(self, remote_path):
+        return os.stat(os.path.join(self.root, remote_path))
+
+    def get(self, remote_path, local_path, **kwargs):
+        self.gets.append(remote_path)
+        shutil.copyfile(os.path.join(self.root, remote_path), local_path)
+
+
+class FakeSFTPPool(SFTPPool):
+    """An ``SFTPPool`` whose sessions are ``FakeSFTPClient``s; ``failures`` connects raise first."""
+
+    def __init__(self, root, size=2, failures=0):
+        super().__init__('sftp.test', 22, 'user', 'secret', size=size)
+        self.root = root
+        self.failures = failures
+        self.clients = []
+
+    def _connect(self):
+        if self.failures:
+            self.failures -= 1
+            raise Exception("Failed to connect to SFTP server: unreachable")
+        client = FakeSFTPClient(self.root)
+        self.clients.append(client)
+        return client
+
+
+class SFTPPoolTests(SimpleTestCase):
+    """Session slots of the SFTP pool."""
+
+    def setUp(self):
+        self.pool = FakeSFTPPool(root=tempfile.gettempdir(), size=2)
+
+    def test_released_sessions_are_reused(self):
+        with self.pool.session() as first:
+            pass
+        with self.pool.session() as second:
+            self.assertIs(second, first)
+        self.assertEqual(len(self.pool.clients), 1)
+
+    def test_acquire_waits_for_a_free_slot(self):
+        first, second = self.pool._acquire(), self.pool._acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(self.pool._acquire()))
+        waiter.start()
+        waiter.join(0.2)
+        # Both slots are busy, so no third session is opened
+        self.assertTrue(waiter.is_alive())
+        self.pool._release(second)
+        waiter.join(5)
+        self.assertEqual(acquired, [second])
+        self.assertEqual(len(self.pool.clients), 2)
+
+    def test_failed_connect_frees_its_slot(self):
+        pool = FakeSFTPPool(root=tempfile.gettempdir(), size=1, failures=1)
+        with self.assertRaises(Exception):
+            pool._acquire()
+        self.assertEqual(pool._sessions, [])
+        self.assertIs(pool._acquire(), pool.clients[0])
+
+    def test_dead_session_is_discarded(self):
+        with self.assertRaises(IOError):
+            with self.pool.session() as dead:
+                dead.transport.active = False
+                raise IOError("Socket is closed")
+        self.assertTrue(dead.closed)
+        self.assertEqual((self.pool._sessions, self.pool._idle), ([], []))
+        with self.pool.session() as sftp:
+            self.assertIsNot(sftp, dead)
+
+    def test_live_session_survives_an_error(self):
+        with self.assertRaises(IOError):
+            with self.pool.session() as sftp:
+                raise IOError("No such file")
+        self.assertEqual(self.pool._idle, [sftp])
+        self.assertFalse(sftp.closed)
+
+    def test_discard_wakes_a_waiter(self):
+        first, second = self.pool._acquire(), self.pool._acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(self.pool._acquire()))
+        waiter.start()
+        self.pool._discard(first)
+        waiter.join(5)
+        # The waiter reconnects in the freed slot
+        self.assertEqual(acquired, [self.pool.clients[2]])
+        self.assertEqual(self.pool._sessions, [second, self.pool.clients[2]])
+
+    def test_close_closes_idle_and_busy_sessions(self):
+        busy, idle = self.pool._acquire(), self.pool._acquire()
+        self.pool._release(idle)
+        self.pool.close()
+        for sftp in (busy, idle):
+            self.assertTrue(sftp.closed)
+            self.assertFalse(sftp.transport.is_active())
+        self.assertEqual((self.pool._sessions, self.pool._idle), ([], []))
+
+
+class DownloadCacheTests(SimpleTestCase):
+    """Reuse of unchanged SFTP downloads."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.remote, self.local = os.path.join(directory.name, 'remote'), os.path.join(directory.name, 'local')
+        os.makedirs(self.remote)
+        os.makedirs(self.local)
+        self.pool = FakeSFTPPool(self.remote)
+        self.cache = DownloadCache(os.path.join(directory.name, 'cache'), max_bytes=1024, verify=False)
+
+    def publish(self, name, content, mtime=1_700_000_000):
+        path = os.path.join(self.remote, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        os.utime(path, (mtime, mtime))
+
+    def fetch(self, name, cache=None):
+        local_path = os.path.join(self.local, name)
+        transfer = (cache or self.cache).fetch(self.pool, name, local_path)
+        with open(local_path, 'rb') as f:
+            return transfer, f.read()
+
+    def downloads(self):
+        return sum(len(client.gets) for client in self.pool.clients)
+
+    def test_unchanged_file_is_reused(self):
+        self.publish('alerts.tif', b'alerts')
+        first, _ = self.fetch('alerts.tif')
+        second, content = self.fetch('alerts.tif')
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(content, b'alerts')
+        self.assertEqual(self.downloads(), 1)
+
+    def test_changed_file_is_fetched_again(self):
+        self.publish('alerts.tif', b'alerts')
+        self.fetch('alerts.tif')
+        self.publish('alerts.tif', b'alerts', mtime=1_700_003_600)
+        transfer, _ = self.fetch('alerts.tif')
+        self.assertFalse(transfer.cached)
+        self.publish('alerts.tif', b'new alerts', mtime=1_700_003_600)
+        transfer, content = self.fetch('alerts.tif')
+        self.assertFalse(transfer.cached)
+        self.assertEqual(content, b'new alerts')
+        self.assertEqual(self.downloads(), 3)
+
+    def test_missing_blob_is_a_miss(self):
+        self.publish('alerts.tif', b'alerts')
+        self.fetch('alerts.tif')
+        for name in os.listdir(self.cache.objects_dir):
+            os.remove(os.path.join(self.cache.objects_dir, name))
+        transfer, content = self.fetch('alerts.tif')
+        self.assertFalse(transfer.cached)
+        self.assertEqual(content, b'alerts')
+
+    def test_corrupted_blob_fails_verification(self):
+        self.publish('alerts.tif', b'alerts')
+        self.fetch('alerts.tif')
+        (name,) = os.listdir(self.cache.objects_dir)
+        with open(os.path.join(self.cache.objects_dir, name), 'wb') as f:
+            f.write(b'ALERTS')
+        # Same size, so only verification catches it
+        self.assertTrue(self.fetch('alerts.tif')[0].cached)
+        verified = DownloadCache(self.cache.directory, max_bytes=1024, verify=True)
+        transfer, content = self.fetch('alerts.tif', cache=verified)
+        self.assertFalse(transfer.cached)
+        self.assertEqual(content, b'alerts')
+
+    def test_least_recently_used_blobs_are_evicted(self):
+        for name, mtime in (('old.tif', 1_700_000_000), ('new.tif', 1_700_000_100)):
+            self.publish(name, name.encode() * 80, mtime=mtime)
+        self.fetch('old.tif')
+        old_blob = os.path.join(self.cache.objects_dir, os.listdir(self.cache.objects_dir)[0])
+        os.utime(old_blob, (0, 0))
+        # Both blobs together exceed max_bytes, so the older one goes
+        self.fetch('new.tif')
+        self.assertFalse(os.path.exists(old_blob))
+        self.assertEqual(list(self.cache._read_index()), [DownloadCache.key('new.tif', self.pool.stat('new.tif'))])
+        self.assertFalse(self.fetch('old.tif')[0].cached)
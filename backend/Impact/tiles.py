@@ -0,0 +1,150 @@
+"""
+Mapbox Vector Tiles rendered by PostGIS for the impact, sector and waterbody layers.
+"""
+import math
+
+from django.db import connection
+
+from Impact.models import (
+    AffectedPopulation, ImpactedGDP, AffectedCrops, AffectedRoads,
+    DisplacedPopulation, AffectedLivestock, AffectedGrazingLand,
+    SectorData, WaterBodies,
+)
+from Impact.response_cache import IMPACT, SECTORS, WATERBODIES, cache_get, cache_set, tile_cache_key
+from Impact.simplify import geometry_field_for_zoom
+
+MAX_ZOOM = 22
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+IMPACT_ATTRIBUTES = ['gid_0', 'name_0', 'name_1', 'engtype_1', 'cod', 'stock', 'flood_tot', 'flood_perc']
+
+# Layer name (matching the API route) -> (model, attributes that may be requested, default attributes)
+TILE_LAYERS = {
+    'affectedPop': (AffectedPopulation, IMPACT_ATTRIBUTES + ['lack_cc'], IMPACT_ATTRIBUTES),
+    'affectedGDP': (ImpactedGDP, IMPACT_ATTRIBUTES + ['lack_cc'], IMPACT_ATTRIBUTES),
+    'affectedCrops': (AffectedCrops, IMPACT_ATTRIBUTES + ['lack_cc'], IMPACT_ATTRIBUTES),
+    'affectedRoads': (AffectedRoads, IMPACT_ATTRIBUTES + ['lack_cc'], IMPACT_ATTRIBUTES),
+    'displacedPop': (DisplacedPopulation, IMPACT_ATTRIBUTES + ['lack_cc'], IMPACT_ATTRIBUTES),
+    'affectedLivestock': (AffectedLivestock, IMPACT_ATTRIBUTES + ['lack_cc'], IMPACT_ATTRIBUTES),
+    'affectedGrazingLand': (AffectedGrazingLand, IMPACT_ATTRIBUTES + ['lack_cc'], IMPACT_ATTRIBUTES),
+    'sectorData': (
+        SectorData,
+        ['sec_code', 'sec_name', 'basin', 'domain', 'admin_b_l1', 'admin_b_l2', 'admin_b_l3',
+         'sec_rs', 'area', 'q_thr1', 'q_thr2', 'q_thr3', 'cat'],
+        ['sec_code', 'sec_name', 'basin', 'q_thr1', 'q_thr2', 'q_thr3'],
+    ),
+    'waterbodies': (
+        WaterBodies,
+        ['af_wtr_id', 'sqkm', 'name_of_wa', 'type_of_wa', 'shape_area', 'shape_len'],
+        ['name_of_wa', 'type_of_wa', 'sqkm'],
+    ),
+}
+
+
+# Layer name -> dataset whose version keys its cached tiles
+TILE_DATASETS = {layer: IMPACT for layer in TILE_LAYERS}
+TILE_DATASETS.update({'sectorData': SECTORS, 'waterbodies': WATERBODIES})
+
+# Region pre-seeded by warm_tile_cache (min lon, min lat, max lon, max lat)
+WARM_BOUNDS = (21.0, -12.0, 52.0, 24.0)
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_attributes(layer, fields=None):
+    """
+    Return the attribute columns to encode for ``layer``.
+
+    ``fields`` is a list of requested names; anything not allowed for the
+    layer is ignored, and an empty selection falls back to the defaults.
+    """
+    _, allowed, defaults = TILE_LAYERS[layer]
+    selected = [f for f in (fields or []) if f in allowed]
+    return selected or list(defaults)
+
+
+def render_tile(layer, z, x, y, fields=None):
+    """
+    Render one MVT tile of ``layer`` with ``ST_AsMVT``.
+
+    Polygon layers use the precomputed simplified geometry for the zoom
+    level, and the dated impact layers show their latest forecast date.
+    Features are found through the spatial index on ``geom``. Returns the encoded tile as bytes (empty when nothing intersects).
+    """
+    model, _, _ = TILE_LAYERS[layer]
+    quote = connection.ops.quote_name
+    attributes = tile_attributes(layer, fields)
+
+    geometry = 'geom'
+    if hasattr(model, 'geom_coarse'):
+        geometry = geometry_field_for_zoom(z) or 'geom'
+
+    table = quote(model._meta.db_table)
+    latest = ''
+    if hasattr(model, 'forecast_date'):
+        latest = f"AND t.forecast_date = (SELECT max(forecast_date) FROM {table})"
+
+    columns = ', '.join(f"t.{quote(name)}" for name in attributes)
+    sql = f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(%s, %s, %s) AS geom
+        ),
+        features AS (
+            SELECT ST_AsMVTGeom(
+                       ST_Transform(COALESCE(t.{quote(geometry)}, t.geom), 3857),
+                       bounds.geom, {TILE_EXTENT}, {TILE_BUFFER}, true
+                   ) AS geom,
+                   {columns}
+            FROM {table} AS t, bounds
+            WHERE t.geom && ST_Transform(bounds.geom, 4326) {latest}
+        )
+        SELECT ST_AsMVT(features.*, %s, {TILE_EXTENT}, 'geom')
+        FROM features
+        WHERE features.geom IS NOT NULL
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [z, x, y, layer])
+        tile = cursor.fetchone()[0]
+    return bytes(tile) if tile else b''
+
+
+def get_tile(layer, z, x, y, fields=None):
+    """Return a tile from the versioned cache, rendering and storing it on a miss."""
+    attributes = tile_attributes(layer, fields)
+    key = tile_cache_key(TILE_DATASETS[layer], layer, z, x, y, attributes)
+    tile = cache_get(key)
+    if tile is None:
+        tile = render_tile(layer, z, x, y, attributes)
+        cache_set(key, tile)
+    return tile
+
+
+def _tile_range(z, bounds):
+    """Inclusive x/y tile ranges covering ``bounds`` at zoom ``z``."""
+    min_lon, min_lat, max_lon, max_lat = bounds
+    n = 2 ** z
+
+    def tile_x(lon):
+        return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+    def tile_y(lat):
+        lat = math.radians(lat)
+        return min(n - 1, max(0, int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)))
+
+    return range(tile_x(min_lon), tile_x(max_lon) + 1), range(tile_y(max_lat), tile_y(min_lat) + 1)
+
+
+def warm_tile_cache(max_zoom, layers=None, bounds=WARM_BOUNDS):
+    """Pre-render the default tiles of ``layers`` for zooms 0..max_zoom over ``bounds``."""
+    count = 0
+    for layer in layers or TILE_LAYERS:
+        for z in range(max_zoom + 1):
+            xs, ys = _tile_range(z, bounds)
+            for x in xs:
+                for y in ys:
+                    get_tile(layer, z, x, y)
+                    count += 1
+    return count
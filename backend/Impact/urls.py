@@ -11,6 +11,12 @@ from .views import (
     AffectedGrazingLandViewSet,
     SectorDataViewSet,
     SectorForecastViewSet,
+    SectorHydrographViewSet,
+    WaterbodiesViewSet,
+    AdminUnitViewSet,
+    ImpactValueViewSet,
+    SectorForecastRunViewSet,
+    vector_tile,
 )
 
 # Create a router and register viewsets
@@ -39,6 +45,15 @@ router.register(r'affectedGrazingLand', AffectedGrazingLandViewSet, basename='af
 #  Registering the ViewSet for sector data
 router.register(r'sectorData', SectorDataViewSet, basename='sectorData')
 router.register(r'SectorForecast', SectorForecastViewSet, basename='SectorForecast')
+# Registering the ViewSet for waterbodies
+router.register(r'waterbodies', WaterbodiesViewSet, basename='waterbodies')
+# Per-sector hydrograph: /api/sectors/{sec_code}/hydrograph/
+router.register(r'sectors', SectorHydrographViewSet, basename='sectors')
+# Normalized impact store: admin units once, dated values of every indicator
+router.register(r'adminUnits', AdminUnitViewSet, basename='adminUnits')
+router.register(r'impactValues', ImpactValueViewSet, basename='impactValues')
+# Archived forecast runs; ?issued= or ?from=&to= select by issue time
+router.register(r'forecastRuns', SectorForecastRunViewSet, basename='forecastRuns')
 
 
 # URL patterns list for the Impact app. All URLs for the app will be handled by the viewsets registered above.
@@ -47,4 +62,6 @@ urlpatterns = [
     # This means that for each registered ViewSet, Django will generate the appropriate URL patterns for CRUD operations (GET, POST, PUT, DELETE).
     # The '' (empty string) as the URL pattern means that all the API routes for this app will be prefixed with `/api/` in the main URL configuration.
     path('', include(router.urls)),  # This includes all the registered router URLs
+    # Mapbox Vector Tiles rendered by PostGIS, e.g. /api/tiles/affectedPop/5/19/15.mvt
+    path('tiles/<str:layer>/<int:z>/<int:x>/<int:y>.mvt', vector_tile, name='vector-tile'),
 ]
\ No newline at end of file
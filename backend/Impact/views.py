@@ -1,78 +1,354 @@
+from django.contrib.gis.db.models import MultiPolygonField
+from django.db.models import F, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import condition, require_GET
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
 from drf_spectacular.openapi import AutoSchema
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
+from .filters import (
+    BBoxFilter, FORECAST_RUN_FILTERSET_FIELDS, IMPACT_FILTERSET_FIELDS, IMPACT_VALUE_FILTERSET_FIELDS,
+    ISSUED_PARAMS, IssuedFilter, filter_issued,
+)
+from .hydrograph import sector_hydrograph
+from .pagination import ForecastRunCursorPagination, GeoJsonCursorPagination, ImpactValueCursorPagination
+from .simplify import SERVED_GEOMETRY, SIMPLIFIED_GEOMETRY_FIELDS, geometry_field_from_params
+from .response_cache import (
+    FORECAST, IMPACT, SECTORS, WATERBODIES, bump_data_version, cache_get, cache_set, data_etag,
+    get_data_version, last_updated, response_cache_key,
+)
+from .tiles import TILE_DATASETS, TILE_LAYERS, get_tile, valid_tile
+from .renderers import HydrographFloat32Renderer
 from .serializers import (
     AffectedPopulationSerializer, ImpactedGDPSerializer, AffectedCropsSerializer,
     AffectedRoadsSerializer, DisplacedPopulationSerializer, AffectedLivestockSerializer,
-    AffectedGrazingLandSerializer, SectorDataSerializer,SectorForecastSerializer,WaterBodiesSerializer
+    AffectedGrazingLandSerializer, SectorDataSerializer,SectorForecastSerializer,WaterBodiesSerializer,
+    SectorForecastCompactSerializer, SectorMetadataSerializer, AdminUnitSerializer, ImpactValueSerializer,
+    SectorForecastRunSerializer,
 )
 from Impact.models import (
     AffectedPopulation, ImpactedGDP, AffectedCrops, AffectedGrazingLand,
-    AffectedLivestock, AffectedRoads, DisplacedPopulation, SectorData,SectorForecast,WaterBodies
+    AffectedLivestock, AffectedRoads, DisplacedPopulation, SectorData,SectorForecast,WaterBodies,
+    AdminUnit, ImpactValue, SectorForecastRun,
 )
 
-@extend_schema(tags=['affected-population'])
-class AffectedPopulationViewSet(viewsets.ModelViewSet):
+ISSUED_SCHEMA_PARAMETERS = [
+    OpenApiParameter('issued', OpenApiTypes.STR, description='Issue date (YYYY-MM-DD) or exact issue time'),
+    OpenApiParameter('from', OpenApiTypes.STR, description='Earliest issue date/time, inclusive'),
+    OpenApiParameter('to', OpenApiTypes.STR, description='Latest issue date/time, inclusive'),
+]
+
+
+def conditional_response(request, dataset, build, variant='', related=()):
+    """
+    Answer ``If-None-Match``/``If-Modified-Since`` from the data-version registry.
+
+    A matching request gets a 304 before ``build()`` runs, so neither the
+    database nor the serializer is touched. Other responses carry ``ETag``,
+    ``Last-Modified`` and ``X-Data-Version`` (the version of ``dataset``);
+    the ETag and Last-Modified also follow the ``related`` datasets.
+    """
+    etag = data_etag(dataset, variant, related)
+    updated_at = last_updated(dataset, related)
+    response = condition(
+        etag_func=lambda request: etag,
+        last_modified_func=lambda request: updated_at,
+    )(lambda request: build())(request)
+    response['X-Data-Version'] = str(get_data_version(dataset))
+    return response
+
+
+class CachedResponseMixin:
+    """
+    Cache list responses under the current version of ``data_dataset`` and
+    answer conditional GETs for list and detail views from the same version.
+    Views whose responses embed rows of other datasets list them in
+    ``related_datasets`` so a refresh of those invalidates the responses too.
+
+    Writes through the API bump the version like an ingest run does.
+    """
+    data_dataset = None
+    related_datasets = ()
+
+    def cached_response(self, request, build):
+        """Return the cached data for this request, or call ``build()`` and cache its data."""
+        def cached_build():
+            key = response_cache_key(self.data_dataset, request, self.related_datasets)
+            data = cache_get(key)
+            if data is not None:
+                return Response(data)
+            response = build()
+            if response.status_code == 200:
+                cache_set(key, response.data)
+            return response
+
+        variant = getattr(request.accepted_renderer, 'format', '')
+        return conditional_response(request, self.data_dataset, cached_build, variant, self.related_datasets)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        variant = getattr(request.accepted_renderer, 'format', '')
+        return conditional_response(
+            request, self.data_dataset,
+            lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs),
+            variant, self.related_datasets,
+        )
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        bump_data_version(self.data_dataset)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        bump_data_version(self.data_dataset)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        bump_data_version(self.data_dataset)
+
+
+class SimplifiedGeometryMixin:
+    """
+    Serve precomputed simplified geometries for ``?simplify=coarse|medium|fine``
+    or ``?zoom=<level>``, loading only the geometry that is sent.
+
+    The simplified column is read as ``SERVED_GEOMETRY``, coalesced in SQL
+    with ``geom`` for rows whose copy has not been computed yet, so every
+    geometry column itself stays deferred.
+    """
+    def get_geometry_field(self):
+        return geometry_field_from_params(self.request.query_params)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        geometry_field = self.get_geometry_field()
+        if geometry_field:
+            return queryset.defer('geom', *SIMPLIFIED_GEOMETRY_FIELDS).annotate(**{
+                SERVED_GEOMETRY: Coalesce(
+                    F(geometry_field), F('geom'), output_field=MultiPolygonField(srid=4326),
+                ),
+            })
+        return queryset.defer(*SIMPLIFIED_GEOMETRY_FIELDS)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['geometry_field'] = self.get_geometry_field()
+        return context
+
+
+class ImpactLayerViewSet(CachedResponseMixin, SimplifiedGeometryMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Base for the impact layer endpoints, read from the ``impact_<indicator>``
+    views of the impact store: cursor pagination, simplified geometries and
+    ``bbox=``, ``gid_0=``, ``name_1=`` and ``flood_perc__gte=`` filters.
+    Without ``issued=``/``from=``/``to=`` the latest forecast date is served.
+    """
     schema = AutoSchema()
+    data_dataset = IMPACT
+    pagination_class = GeoJsonCursorPagination
+    filter_backends = [BBoxFilter, DjangoFilterBackend, IssuedFilter]
+    filterset_fields = IMPACT_FILTERSET_FIELDS
+    bbox_filter_field = 'geom'
+    bbox_filter_include_overlapping = True
+    issued_field = 'forecast_date'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if any(self.request.query_params.get(param) for param in ISSUED_PARAMS):
+            return queryset
+        latest = queryset.model.objects.order_by('-forecast_date').values('forecast_date')[:1]
+        return queryset.filter(forecast_date=Subquery(latest))
+
+    @extend_schema(parameters=ISSUED_SCHEMA_PARAMETERS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+@extend_schema(tags=['affected-population'])
+class AffectedPopulationViewSet(ImpactLayerViewSet):
     queryset = AffectedPopulation.objects.all()
     serializer_class = AffectedPopulationSerializer
 
 @extend_schema(tags=['impacted-gdp'])
-class ImpactedGDPViewSet(viewsets.ModelViewSet):
-    schema = AutoSchema()
+class ImpactedGDPViewSet(ImpactLayerViewSet):
     queryset = ImpactedGDP.objects.all()
     serializer_class = ImpactedGDPSerializer
 
 @extend_schema(tags=['affected-crops'])
-class AffectedCropsViewSet(viewsets.ModelViewSet):
-    schema = AutoSchema()
+class AffectedCropsViewSet(ImpactLayerViewSet):
     queryset = AffectedCrops.objects.all()
     serializer_class = AffectedCropsSerializer
 
 @extend_schema(tags=['affected-roads'])
-class AffectedRoadsViewSet(viewsets.ModelViewSet):
-    schema = AutoSchema()
+class AffectedRoadsViewSet(ImpactLayerViewSet):
     queryset = AffectedRoads.objects.all()
     serializer_class = AffectedRoadsSerializer
 
 @extend_schema(tags=['displaced-population'])
-class DisplacedPopulationViewSet(viewsets.ModelViewSet):
-    schema = AutoSchema()
+class DisplacedPopulationViewSet(ImpactLayerViewSet):
     queryset = DisplacedPopulation.objects.all()
     serializer_class = DisplacedPopulationSerializer
 
 @extend_schema(tags=['affected-livestock'])
-class AffectedLivestockViewSet(viewsets.ModelViewSet):
-    schema = AutoSchema()
+class AffectedLivestockViewSet(ImpactLayerViewSet):
     queryset = AffectedLivestock.objects.all()
     serializer_class = AffectedLivestockSerializer
 
 @extend_schema(tags=['affected-grazing-land'])
-class AffectedGrazingLandViewSet(viewsets.ModelViewSet):
-    schema = AutoSchema()
+class AffectedGrazingLandViewSet(ImpactLayerViewSet):
     queryset = AffectedGrazingLand.objects.all()
     serializer_class = AffectedGrazingLandSerializer
 
 
 @extend_schema(tags=['sector-data'])
-class SectorDataViewSet(viewsets.ModelViewSet):
+class SectorDataViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     schema = AutoSchema()
+    data_dataset = SECTORS
     queryset = SectorData.objects.all()
     serializer_class = SectorDataSerializer
 
 @extend_schema(tags=['sector-forecast'])
-class SectorForecastViewSet(viewsets.ReadOnlyModelViewSet):
+class SectorForecastViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     schema = AutoSchema()
-    queryset = SectorForecast.objects.all()
+    data_dataset = FORECAST
+    # Rows carry their sector's fields (nested, or in the compact side table)
+    related_datasets = (SECTORS,)
+    queryset = SectorForecast.objects.select_related('sector')
     serializer_class = SectorForecastSerializer
 
+    @extend_schema(parameters=[
+        OpenApiParameter(
+            'compact', OpenApiTypes.BOOL,
+            description='Return sector_id/sec_code per row plus a one-off sectors side table',
+        ),
+    ])
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('compact', '').lower() not in ('1', 'true', 'yes'):
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(request, lambda: self.compact_list(request))
+
+    def compact_list(self, request):
+        forecasts = self.filter_queryset(self.get_queryset()).only(
+            'id', 'sector_id', 'sector__sec_code', 'model_type', 'time_point', 'forecast_value',
+        )
+        forecast_data = SectorForecastCompactSerializer(forecasts, many=True).data
+        sector_ids = {row['sector_id'] for row in forecast_data}
+        sectors = SectorData.objects.filter(id__in=sector_ids).defer('geom').order_by('id')
+        return Response({
+            'sectors': SectorMetadataSerializer(sectors, many=True).data,
+            'forecasts': forecast_data,
+        })
+
+
+@extend_schema(tags=['sector-forecast'])
+class SectorHydrographViewSet(CachedResponseMixin, viewsets.GenericViewSet):
+    schema = AutoSchema()
+    data_dataset = FORECAST
+    # The hydrograph carries the sector's alert thresholds
+    related_datasets = (SECTORS,)
+    queryset = SectorData.objects.all()
+    lookup_field = 'sec_code'
+    lookup_value_regex = r'-?\d+'
+
+    @extend_schema(
+        description=(
+            'Latest GFS/ICON discharge series and alert thresholds for one sector. '
+            'Use ?format=f32 for the packed float32 encoding and ?issued= (or ?from=&to=) '
+            'for the latest archived runs issued in that window.'
+        ),
+        parameters=ISSUED_SCHEMA_PARAMETERS,
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(
+        detail=True,
+        methods=['get'],
+        renderer_classes=[JSONRenderer, BrowsableAPIRenderer, HydrographFloat32Renderer],
+    )
+    def hydrograph(self, request, sec_code=None):
+        return self.cached_response(request, lambda: self.build_hydrograph(sec_code))
+
+    def build_hydrograph(self, sec_code):
+        # sec_code is not unique in SectorData, so take the first match
+        sector = self.get_queryset().filter(sec_code=sec_code).order_by('id').first()
+        if sector is None:
+            raise Http404(f"No sector with code {sec_code}")
+        runs = None
+        if any(self.request.query_params.get(param) for param in ISSUED_PARAMS):
+            runs = filter_issued(SectorForecastRun.objects.all(), 'run_time', self.request.query_params)
+        return Response(sector_hydrograph(sector, runs))
+
 
 @extend_schema(tags=['waterbodies'])
-class WaterbodiesViewSet(viewsets.ReadOnlyModelViewSet):
+class WaterbodiesViewSet(CachedResponseMixin, SimplifiedGeometryMixin, viewsets.ReadOnlyModelViewSet):
     schema = AutoSchema()
+    data_dataset = WATERBODIES
     queryset = WaterBodies.objects.all()
     serializer_class = WaterBodiesSerializer
 
 
+@extend_schema(tags=['impact-store'])
+class AdminUnitViewSet(CachedResponseMixin, SimplifiedGeometryMixin, viewsets.ReadOnlyModelViewSet):
+    schema = AutoSchema()
+    data_dataset = IMPACT
+    queryset = AdminUnit.objects.all()
+    serializer_class = AdminUnitSerializer
+    pagination_class = GeoJsonCursorPagination
+
+
+@extend_schema(tags=['impact-store'])
+class ImpactValueViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
+    """Dated indicator values of every layer; ``?indicator__in=population,gdp`` spans indicators."""
+    schema = AutoSchema()
+    data_dataset = IMPACT
+    queryset = ImpactValue.objects.select_related('admin_unit').defer(
+        'admin_unit__geom', *(f'admin_unit__{f}' for f in SIMPLIFIED_GEOMETRY_FIELDS),
+    )
+    serializer_class = ImpactValueSerializer
+    pagination_class = ImpactValueCursorPagination
+    filter_backends = [DjangoFilterBackend, IssuedFilter]
+    filterset_fields = IMPACT_VALUE_FILTERSET_FIELDS
+    issued_field = 'forecast_date'
+
+    @extend_schema(parameters=ISSUED_SCHEMA_PARAMETERS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+@extend_schema(tags=['sector-forecast'])
+class SectorForecastRunViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
+    """Archived forecast runs, one packed series per sector, model and issue time."""
+    schema = AutoSchema()
+    data_dataset = FORECAST
+    related_datasets = (SECTORS,)
+    queryset = SectorForecastRun.objects.select_related('sector').only(
+        'id', 'sector_id', 'sector__sec_code', 'model_type', 'run_time', 'start_time', 'step', 'values',
+    )
+    serializer_class = SectorForecastRunSerializer
+    pagination_class = ForecastRunCursorPagination
+    filter_backends = [DjangoFilterBackend, IssuedFilter]
+    filterset_fields = FORECAST_RUN_FILTERSET_FIELDS
+    issued_field = 'run_time'
+
+    @extend_schema(parameters=ISSUED_SCHEMA_PARAMETERS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+@require_GET
+def vector_tile(request, layer, z, x, y):
+    """Mapbox Vector Tile for one layer; ``?fields=a,b`` selects the encoded attributes."""
+    if layer not in TILE_LAYERS or not valid_tile(z, x, y):
+        raise Http404("Unknown layer or tile")
+    fields = [f for f in request.GET.get('fields', '').split(',') if f]
+    return conditional_response(
+        request, TILE_DATASETS[layer],
+        lambda: HttpResponse(get_tile(layer, z, x, y, fields), content_type='application/vnd.mapbox-vector-tile'),
+        variant='mvt',
+    )
@@ -30,6 +30,7 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'rest_framework_gis',
+    'django_filters',
     'corsheaders', 
     'rest_framework.authtoken',
     'drf_spectacular',
@@ -192,6 +193,26 @@ CELERY_BEAT_SCHEDULE = {
         'args': ('sync_tiffs',),
     },
 }
+# Response and vector tile cache. Entries are keyed by data version (see
+# Impact.response_cache); the Redis server bounds memory with LRU eviction.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default='redis://redis:6379/1'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=60 * 60 * 48, cast=int),
+        'KEY_PREFIX': 'floodwatch',
+    }
+}
+# Highest zoom pre-seeded into the tile cache after an impact ingest; -1 disables warm-up
+TILE_CACHE_WARM_MAX_ZOOM = config('TILE_CACHE_WARM_MAX_ZOOM', default=-1, cast=int)
+
+# Days of archived impact values and forecast runs to keep; 0 keeps everything
+IMPACT_RETENTION_DAYS = config('IMPACT_RETENTION_DAYS', default=730, cast=int)
+FORECAST_RETENTION_DAYS = config('FORECAST_RETENTION_DAYS', default=730, cast=int)
+
+# Shared volume where merge_jsonFiles writes the merged forecast files the loaders read
+TIMESERIES_OUTPUT_DIR = config('TIMESERIES_OUTPUT_DIR', default='/etc/mapserver/data/timeseries_data')
+
 # DRF Spectacular settings
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Flood Watch System API',
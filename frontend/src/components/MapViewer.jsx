@@ -40,7 +40,7 @@ const MAP_CONFIG = {
 
 // Define the GeoJSON path based on environment
 const GEOJSON_PATH = process.env.NODE_ENV === "production"
-  ? "/timeseries_data/merged_data.geojson"
+  ? "/timeseries_data/merged_data.min.geojson"
   : "/merged_data.geojson";
 
 // Configuration for monitoring stations